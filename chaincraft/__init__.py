@@ -10,6 +10,7 @@ __author__ = "Chaincraft Contributors"
 __email__ = "chaincraft@example.com"
 
 from .node import ChaincraftNode
+from .async_node import AsyncChaincraftNode
 from .shared_object import SharedObject, SharedObjectException
 from .shared_message import SharedMessage
 from .index_helper import IndexHelper
@@ -17,6 +18,7 @@ from . import crypto_primitives
 
 __all__ = [
     "ChaincraftNode",
+    "AsyncChaincraftNode",
     "SharedObject",
     "SharedObjectException",
     "SharedMessage",
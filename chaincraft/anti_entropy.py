@@ -0,0 +1,230 @@
+# anti_entropy.py
+
+"""
+Merkle-range reconciliation of message stores. A node with a
+PrefixMerkleTree compares it with a random peer's every
+ANTI_ENTROPY_INTERVAL seconds, and both send only the messages the other
+is missing.
+"""
+
+import json
+import re
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+HEX_DIGITS: str = "0123456789abcdef"
+
+# Wire form of a node summary: [count, digest hex], or 0 for an empty node
+Summary = Any
+
+
+class PrefixMerkleTree:
+    """
+    Merkle tree over a set of message hashes, bucketed by hex prefix.
+
+    Level d has one node per d-character prefix of the (hex) message hash,
+    down to `depth`, whose nodes are the buckets holding the hashes. A node's
+    summary is the number of hashes below it and the XOR of those hashes, so
+    adding or removing a hash touches depth + 1 nodes and nothing has to be
+    rehashed. Empty nodes are not stored.
+
+    Two nodes reconcile top-down: each side sends the summaries of the
+    prefixes it was asked about, the other answers with the children of the
+    prefixes whose summaries differ, and at bucket level with the bucket's
+    hashes. Matching subtrees are never descended into, so the work and bytes
+    grow with the number of differences, not with the store size.
+    """
+
+    def __init__(self, depth: int = 4) -> None:
+        if not 1 <= depth <= 8:
+            raise ValueError("depth must be between 1 and 8")
+        self.depth: int = depth
+        # prefix -> [count, xor of the hashes below it]
+        self.nodes: Dict[str, List[int]] = {}
+        self.buckets: Dict[str, Set[str]] = {}
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self.lock:
+            node = self.nodes.get("")
+            return node[0] if node else 0
+
+    def __contains__(self, message_hash: str) -> bool:
+        with self.lock:
+            bucket = self.buckets.get(message_hash[: self.depth])
+            return bucket is not None and message_hash in bucket
+
+    def add(self, message_hash: str) -> bool:
+        """
+        Add a hash. Returns False if it is already present or not a hex hash.
+        """
+        with self.lock:
+            return self._add(message_hash)
+
+    def update(self, message_hashes: Iterable[str]) -> None:
+        with self.lock:
+            for message_hash in message_hashes:
+                self._add(message_hash)
+
+    def remove(self, message_hash: str) -> bool:
+        """
+        Remove a hash. Returns False if it was not present.
+        """
+        key: str = message_hash[: self.depth]
+        with self.lock:
+            bucket: Optional[Set[str]] = self.buckets.get(key)
+            if bucket is None or message_hash not in bucket:
+                return False
+            bucket.discard(message_hash)
+            if not bucket:
+                del self.buckets[key]
+            value: int = int(message_hash[-16:], 16)
+            for level in range(self.depth + 1):
+                node = self.nodes[key[:level]]
+                node[0] -= 1
+                node[1] ^= value
+                if not node[0]:
+                    del self.nodes[key[:level]]
+        return True
+
+    def summary(self, prefix: str = "") -> Summary:
+        """
+        Wire summary of the node at prefix: [count, digest] or 0 if empty.
+        """
+        with self.lock:
+            return self._summary(prefix)
+
+    def bucket(self, prefix: str) -> List[str]:
+        with self.lock:
+            return sorted(self.buckets.get(prefix, ()))
+
+    def respond(
+        self, summaries: Dict[str, Summary]
+    ) -> Tuple[Dict[str, Summary], Dict[str, List[str]]]:
+        """
+        Compare a peer's summaries with ours. Returns the summaries of the
+        children of every differing inner node (all 16, empty ones as 0, so
+        the peer also notices subtrees only it has) and the contents of
+        every differing bucket. Malformed prefixes are ignored.
+        """
+        children: Dict[str, Summary] = {}
+        buckets: Dict[str, List[str]] = {}
+        with self.lock:
+            for prefix, theirs in summaries.items():
+                if not _is_prefix(prefix, self.depth):
+                    continue
+                if self._summary(prefix) == theirs:
+                    continue
+                if len(prefix) == self.depth:
+                    buckets[prefix] = sorted(self.buckets.get(prefix, ()))
+                else:
+                    for digit in HEX_DIGITS:
+                        children[prefix + digit] = self._summary(prefix + digit)
+        return children, buckets
+
+    def compare_bucket(
+        self, prefix: str, their_hashes: Iterable[str]
+    ) -> Tuple[List[str], List[str]]:
+        """
+        Compare a peer's bucket with ours: returns (hashes we are missing,
+        hashes the peer is missing).
+        """
+        theirs: Set[str] = {
+            h
+            for h in their_hashes
+            if _is_hash(h, self.depth) and h[: self.depth] == prefix
+        }
+        with self.lock:
+            ours: Set[str] = self.buckets.get(prefix, set())
+            return sorted(theirs - ours), sorted(ours - theirs)
+
+    def _add(self, message_hash: str) -> bool:
+        # Local hashes come from hash_message, so only a cheap check here
+        if len(message_hash) <= self.depth:
+            return False
+        try:
+            # Digests are the XOR of the low 64 bits of each hash
+            value: int = int(message_hash[-16:], 16)
+        except ValueError:
+            return False
+        key: str = message_hash[: self.depth]
+        bucket: Set[str] = self.buckets.setdefault(key, set())
+        if message_hash in bucket:
+            return False
+        bucket.add(message_hash)
+        for level in range(self.depth + 1):
+            node = self.nodes.get(key[:level])
+            if node is None:
+                self.nodes[key[:level]] = [1, value]
+            else:
+                node[0] += 1
+                node[1] ^= value
+        return True
+
+    def _summary(self, prefix: str) -> Summary:
+        node = self.nodes.get(prefix)
+        if node is None:
+            return 0
+        return [node[0], format(node[1], "016x")]
+
+
+_HEX_PATTERN = re.compile(r"[0-9a-f]*")
+
+
+def _is_prefix(prefix: Any, depth: int) -> bool:
+    return (
+        isinstance(prefix, str)
+        and len(prefix) <= depth
+        and _HEX_PATTERN.fullmatch(prefix) is not None
+    )
+
+
+def _is_hash(message_hash: Any, depth: int) -> bool:
+    return (
+        isinstance(message_hash, str)
+        and len(message_hash) > depth
+        and _HEX_PATTERN.fullmatch(message_hash) is not None
+    )
+
+
+def simulate_reconciliation(
+    tree_a: PrefixMerkleTree, tree_b: PrefixMerkleTree
+) -> Dict[str, int]:
+    """
+    Run the reconciliation exchange between two trees in memory, the way two
+    nodes would, and report the messages, round trips and JSON bytes it took
+    and the differences found. The trees are not modified.
+    """
+    pending: Dict[str, Summary] = {"": tree_a.summary()}
+    messages: int = 1
+    sent_bytes: int = len(json.dumps(pending))
+    missing_a: Set[str] = set()
+    missing_b: Set[str] = set()
+    # (responder, receiver, receiver's missing set, responder's missing set)
+    sides = (
+        (tree_b, tree_a, missing_a, missing_b),
+        (tree_a, tree_b, missing_b, missing_a),
+    )
+    turn: int = 0
+    while pending:
+        responder, receiver, receiver_missing, responder_missing = sides[turn]
+        children, buckets = responder.respond(pending)
+        if not children and not buckets:
+            break
+        messages += 1
+        sent_bytes += len(json.dumps({"tree": children, "buckets": buckets}))
+        for prefix, hashes in buckets.items():
+            # Comparing one bucket tells the receiver both directions
+            missing, extra = receiver.compare_bucket(prefix, hashes)
+            receiver_missing.update(missing)
+            responder_missing.update(extra)
+        pending = children
+        turn = 1 - turn
+
+    return {
+        "messages": messages,
+        "round_trips": (messages + 1) // 2,
+        "bytes": sent_bytes,
+        "missing_a": len(missing_a),
+        "missing_b": len(missing_b),
+    }
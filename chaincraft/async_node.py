@@ -0,0 +1,283 @@
+# async_node.py
+
+import asyncio
+import random
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .node import ChaincraftNode
+from .shared_message import SharedMessage
+from .shared_object import SharedObject
+
+_background_loop: Optional[asyncio.AbstractEventLoop] = None
+_background_lock = threading.Lock()
+
+
+def get_background_loop() -> asyncio.AbstractEventLoop:
+    """
+    Return the process-wide event loop used by the synchronous API of
+    AsyncChaincraftNode, starting it in a daemon thread on first use.
+    """
+    global _background_loop
+    with _background_lock:
+        if _background_loop is None or _background_loop.is_closed():
+            loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=loop.run_forever, name="chaincraft-loop", daemon=True
+            ).start()
+            _background_loop = loop
+        return _background_loop
+
+
+class _NodeDatagramProtocol(asyncio.DatagramProtocol):
+    """
+    Feed datagrams received on the endpoint into the node.
+    """
+
+    def __init__(self, node: "AsyncChaincraftNode") -> None:
+        self.node = node
+
+    def datagram_received(self, data: bytes, addr: Tuple[str, int]) -> None:
+        self.node._on_datagram(data, addr)
+
+    def error_received(self, exc: Exception) -> None:
+        if self.node.debug:
+            print(f"Node {self.node.port}: Datagram error: {exc}")
+
+
+class AsyncChaincraftNode(ChaincraftNode):
+    """
+    ChaincraftNode running on a single asyncio event loop.
+
+    Receiving is done by a datagram endpoint and gossip / merkelized checks are
+    loop timers, so no per-node threads are created and all state is only
+    touched from the loop thread. The synchronous API of ChaincraftNode keeps
+    working from any thread (calls are marshalled onto the loop); inside a
+    coroutine use the *_async variants instead.
+
+    validation_workers, receive_processes and precheck_processes are not
+    supported, since they would touch node state off the loop or block it;
+    metrics_port serves metrics as with ChaincraftNode.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        if kwargs.get("transport") or kwargs.get("sync_transport"):
+            raise ValueError("AsyncChaincraftNode uses its own datagram endpoint")
+        for option in ("validation_workers", "receive_processes", "precheck_processes"):
+            if kwargs.get(option):
+                raise ValueError(f"AsyncChaincraftNode does not support {option}")
+        super().__init__(*args, **kwargs)
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.endpoint: Optional[asyncio.DatagramTransport] = None
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+
+    # Lifecycle
+
+    def start(self) -> None:
+        """
+        Start the node on the shared background event loop.
+        """
+        if self.is_running:
+            return
+        self._run_sync(get_background_loop(), self.start_async)
+
+    async def start_async(self) -> None:
+        """
+        Bind the datagram endpoint on the running loop and schedule the timers.
+        """
+        if self.is_running:
+            return
+
+        self.loop = asyncio.get_running_loop()
+        await self._bind_endpoint()
+        self.is_running = True
+
+        # sqlite3 connections are tied to the thread that opened them
+        if self.index_helper:
+            self.index_helper.close()
+            self.index_helper.initialize_database()
+
+        self._schedule("gossip", self._gossip_tick)
+        self._schedule("merkelized", self._merkelized_tick)
+        if self.metrics is not None and self.metrics_port is not None:
+            self.metrics.serve(self.host, self.metrics_port)
+
+    async def _bind_endpoint(self) -> None:
+        """
+        Create the UDP endpoint on host/port (retry on a random port if needed).
+        """
+        max_retries: int = 10
+        for _ in range(max_retries):
+            try:
+                self.endpoint, _ = await self.loop.create_datagram_endpoint(
+                    lambda: _NodeDatagramProtocol(self),
+                    local_addr=(self.host, self.port),
+                )
+                self.socket = self.endpoint.get_extra_info("socket")
+                print(f"Node started on {self.host}:{self.port}")
+                return
+            except OSError:
+                if self.use_fixed_address:
+                    raise
+                self.port = random.randint(5000, 9000)
+
+        raise OSError("Failed to bind to a port after multiple attempts")
+
+    def close(self) -> None:
+        """
+        Stop the node and release the endpoint and storage.
+        """
+        if self.loop is None or not self.loop.is_running():
+            self._shutdown()
+        else:
+            self._call_on_loop(self._shutdown)
+
+    async def close_async(self) -> None:
+        await self._run_async(self._shutdown)
+
+    def _shutdown(self) -> None:
+        self.is_running = False
+        for handle in self._timers.values():
+            handle.cancel()
+        self._timers.clear()
+        self._stop_workers()
+        if self.endpoint:
+            self.endpoint.close()
+            self.endpoint = None
+        if self.persistent:
+            self.db.close()
+        if self.index_helper:
+            self.index_helper.close()
+
+    # Timers and I/O
+
+    def _schedule(self, name: str, callback: Callable[[], None]) -> None:
+        self._timers[name] = self.loop.call_later(self.gossip_interval, callback)
+
+    def _gossip_tick(self) -> None:
+        if not self.is_running:
+            return
+        try:
+            self.gossip_round()
+        except Exception as e:
+            print(f"Error in gossip: {e}")
+        self._schedule("gossip", self._gossip_tick)
+
+    def _merkelized_tick(self) -> None:
+        if not self.is_running:
+            return
+        try:
+            self.check_merkelized_round()
+        except Exception as e:
+            print(f"Error checking merkelized objects: {e}")
+        self._schedule("merkelized", self._merkelized_tick)
+
+    def _on_datagram(self, data: bytes, addr: Tuple[str, int]) -> None:
+        if not self.is_running:
+            return
+        try:
+            self._receive_datagram(data, addr)
+        except Exception as e:
+            if self.debug:
+                print(f"Node {self.port}: Error processing datagram: {e}")
+
+    def _send_datagram(self, data: bytes, addr: Tuple[str, int]) -> None:
+        """
+        Queue a datagram on the endpoint, keeping the wire counters up to date.
+        """
+        if self.endpoint is None:
+            raise OSError("Node is not running")
+        self.endpoint.sendto(data, addr)
+        self.bytes_sent += len(data)
+        self.datagrams_sent += 1
+
+    # Loop marshalling
+
+    def _on_loop_thread(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            return False
+
+    def _call_on_loop(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Run func on the node's loop and return its result, blocking the caller
+        if it is on another thread.
+        """
+        if self.loop is None or self._on_loop_thread():
+            return func(*args, **kwargs)
+
+        async def call() -> Any:
+            return func(*args, **kwargs)
+
+        return self._run_sync(self.loop, call)
+
+    @staticmethod
+    def _run_sync(loop: asyncio.AbstractEventLoop, coro_func: Callable[[], Any]) -> Any:
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            raise RuntimeError(
+                "Blocking call made from the node's event loop; use the *_async API"
+            )
+        return asyncio.run_coroutine_threadsafe(coro_func(), loop).result()
+
+    async def _run_async(
+        self, func: Callable[..., Any], *args: Any, **kwargs: Any
+    ) -> Any:
+        if self.loop is None or self._on_loop_thread():
+            return func(*args, **kwargs)
+
+        async def call() -> Any:
+            return func(*args, **kwargs)
+
+        future = asyncio.run_coroutine_threadsafe(call(), self.loop)
+        return await asyncio.wrap_future(future)
+
+    # Public API (sync variants are safe to call from any thread)
+
+    def connect_to_peer(self, host: str, port: int, discovery: bool = False) -> None:
+        self._call_on_loop(super().connect_to_peer, host, port, discovery)
+
+    async def connect_to_peer_async(
+        self, host: str, port: int, discovery: bool = False
+    ) -> None:
+        await self._run_async(super().connect_to_peer, host, port, discovery)
+
+    def create_shared_message(self, data: Any) -> Tuple[str, SharedMessage]:
+        return self._call_on_loop(super().create_shared_message, data)
+
+    async def create_shared_message_async(self, data: Any) -> Tuple[str, SharedMessage]:
+        return await self._run_async(super().create_shared_message, data)
+
+    def search_messages(
+        self,
+        message_type: str,
+        field: str,
+        value: str,
+        page: int = 1,
+        page_size: int = 10,
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        return self._call_on_loop(
+            super().search_messages, message_type, field, value, page, page_size
+        )
+
+    async def search_messages_async(
+        self,
+        message_type: str,
+        field: str,
+        value: str,
+        page: int = 1,
+        page_size: int = 10,
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        return await self._run_async(
+            super().search_messages, message_type, field, value, page, page_size
+        )
+
+    def add_shared_object(self, shared_object: SharedObject) -> None:
+        self._call_on_loop(super().add_shared_object, shared_object)
+
+    async def add_shared_object_async(self, shared_object: SharedObject) -> None:
+        await self._run_async(super().add_shared_object, shared_object)
@@ -0,0 +1,21 @@
+"""
+Repeatable benchmark scenarios with JSON results and a regression check
+against a stored baseline:
+
+    python -m chaincraft.bench run -o results.json
+    python -m chaincraft.bench compare baseline.json results.json
+"""
+
+from .compare import Comparison, compare, format_comparison
+from .runner import load_results, run_benchmarks, save_results
+from .scenarios import SCENARIOS
+
+__all__ = [
+    "SCENARIOS",
+    "Comparison",
+    "compare",
+    "format_comparison",
+    "load_results",
+    "run_benchmarks",
+    "save_results",
+]
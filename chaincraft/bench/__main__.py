@@ -0,0 +1,80 @@
+# bench/__main__.py
+
+import argparse
+import sys
+from typing import List, Optional
+
+from .compare import compare, format_comparison
+from .runner import load_results, run_benchmarks, save_results
+from .scenarios import SCENARIOS
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Entry point for python -m chaincraft.bench / chaincraft-bench."""
+    parser = argparse.ArgumentParser(
+        prog="chaincraft-bench", description="Chaincraft benchmarks"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Run benchmark scenarios")
+    run.add_argument(
+        "-s",
+        "--scenario",
+        action="append",
+        choices=sorted(SCENARIOS),
+        help="Scenario to run (repeatable, default: all)",
+    )
+    run.add_argument(
+        "-q", "--quick", action="store_true", help="Smaller workloads (smoke test)"
+    )
+    run.add_argument(
+        "-r", "--repeat", type=int, default=3, help="Runs per scenario (default: 3)"
+    )
+    run.add_argument("-o", "--output", help="Write the results to this JSON file")
+    run.add_argument("-b", "--baseline", help="Compare with this results file")
+    run.add_argument(
+        "-t",
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Relative slowdown flagged as a regression (default: 0.1)",
+    )
+
+    cmp = commands.add_parser("compare", help="Compare two results files")
+    cmp.add_argument("baseline", help="Baseline results file")
+    cmp.add_argument("current", help="Current results file")
+    cmp.add_argument(
+        "-t",
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Relative slowdown flagged as a regression (default: 0.1)",
+    )
+
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        results = run_benchmarks(args.scenario, args.quick, args.repeat)
+        if args.output:
+            save_results(results, args.output)
+        for scenario, metrics in results["scenarios"].items():
+            for metric, data in metrics.items():
+                print(f"{scenario:<12} {metric:<24} {data['value']:>12.4g}")
+        if not args.baseline:
+            return 0
+        baseline = load_results(args.baseline)
+    else:
+        baseline = load_results(args.baseline)
+        results = load_results(args.current)
+
+    comparisons = compare(baseline, results, args.threshold)
+    print(format_comparison(comparisons))
+    regressions: int = sum(c.regression for c in comparisons)
+    if regressions:
+        print(f"{regressions} regression(s) beyond {args.threshold:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
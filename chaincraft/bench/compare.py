@@ -0,0 +1,58 @@
+# bench/compare.py
+
+from typing import Any, Dict, List, NamedTuple
+
+from .scenarios import HIGHER
+
+
+class Comparison(NamedTuple):
+    scenario: str
+    metric: str
+    baseline: float
+    current: float
+    # Relative change, positive when the current run is better
+    improvement: float
+    regression: bool
+
+
+def compare(
+    baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = 0.1
+) -> List[Comparison]:
+    """
+    Compare the metrics present in both results. A metric regressed if it
+    got worse by more than `threshold` (0.1 = 10%) relative to the
+    baseline.
+    """
+    comparisons: List[Comparison] = []
+    for scenario, metrics in current["scenarios"].items():
+        baseline_metrics: Dict[str, Any] = baseline["scenarios"].get(scenario, {})
+        for metric, data in metrics.items():
+            if metric not in baseline_metrics:
+                continue
+            old: float = baseline_metrics[metric]["value"]
+            new: float = data["value"]
+            gain: float = new - old if data["better"] == HIGHER else old - new
+            if old == 0:
+                improvement: float = 0.0 if gain == 0 else gain * float("inf")
+            else:
+                improvement = gain / abs(old)
+            comparisons.append(
+                Comparison(
+                    scenario, metric, old, new, improvement, improvement < -threshold
+                )
+            )
+    return comparisons
+
+
+def format_comparison(comparisons: List[Comparison]) -> str:
+    lines: List[str] = [
+        f"{'scenario':<12} {'metric':<24} {'baseline':>12} {'current':>12} "
+        f"{'change':>8}"
+    ]
+    for c in comparisons:
+        flag: str = "  REGRESSION" if c.regression else ""
+        lines.append(
+            f"{c.scenario:<12} {c.metric:<24} {c.baseline:>12.4g} {c.current:>12.4g} "
+            f"{c.improvement:>+8.1%}{flag}"
+        )
+    return "\n".join(lines)
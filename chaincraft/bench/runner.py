@@ -0,0 +1,67 @@
+# bench/runner.py
+
+import json
+import platform
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from .. import __version__
+from .scenarios import HIGHER, SCENARIOS, Metrics
+
+# Bumped when the results layout changes
+RESULTS_FORMAT: int = 1
+
+
+def run_benchmarks(
+    scenarios: Optional[Sequence[str]] = None,
+    quick: bool = False,
+    repeat: int = 3,
+) -> Dict[str, Any]:
+    """
+    Run the named scenarios (all by default) `repeat` times each and return
+    the results: per scenario, the best value of each metric over the runs
+    (the highest rate, the lowest time), which is the least disturbed by
+    other load on the machine.
+    """
+    names: List[str] = list(scenarios or SCENARIOS)
+    unknown: List[str] = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        raise ValueError(f"Unknown scenarios: {', '.join(unknown)}")
+
+    results: Dict[str, Metrics] = {}
+    for name in names:
+        runs: List[Metrics] = [SCENARIOS[name](quick) for _ in range(repeat)]
+        results[name] = {
+            metric: {
+                "value": best([run[metric]["value"] for run in runs], data["better"]),
+                "better": data["better"],
+            }
+            for metric, data in runs[0].items()
+        }
+    return {
+        "format": RESULTS_FORMAT,
+        "version": __version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created": time.time(),
+        "quick": quick,
+        "repeat": repeat,
+        "scenarios": results,
+    }
+
+
+def best(values: List[float], better: str) -> float:
+    return max(values) if better == HIGHER else min(values)
+
+
+def save_results(results: Dict[str, Any], path: str) -> None:
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+
+def load_results(path: str) -> Dict[str, Any]:
+    with open(path) as f:
+        results: Dict[str, Any] = json.load(f)
+    if results.get("format") != RESULTS_FORMAT:
+        raise ValueError(f"{path} is not a benchmark results file")
+    return results
@@ -0,0 +1,294 @@
+# bench/scenarios.py
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from ..crypto_primitives.pow import ProofOfWorkPrimitive
+from ..crypto_primitives.sign import ECDSASignaturePrimitive
+from ..crypto_primitives.vrf import ECDSAVRFPrimitive
+from ..index_helper import IndexHelper
+from ..node import ChaincraftNode
+from ..shared_message import SharedMessage
+from ..shared_object import SharedObject
+from ..simulator import LinkConfig, Simulator, default_node
+from ..log_store import LogStore
+from ..store import DURABILITY_FULL, DURABILITY_NORMAL, MessageStore, SQLiteStore
+
+HIGHER: str = "higher"
+LOWER: str = "lower"
+
+# metric name -> {"value": float, "better": HIGHER or LOWER}
+Metrics = Dict[str, Dict[str, Any]]
+
+
+def metric(value: float, better: str) -> Dict[str, Any]:
+    return {"value": value, "better": better}
+
+
+def rate(count: int, function: Callable[[], Any]) -> float:
+    """
+    Run function count times and return the calls per second.
+    """
+    start: float = time.perf_counter()
+    for _ in range(count):
+        function()
+    return count / (time.perf_counter() - start)
+
+
+def ingest(quick: bool = False) -> Metrics:
+    """
+    Single-node ingest: unique messages received, decoded, stored and
+    relayed (to no peers), plus the rate at which duplicates are dropped.
+    """
+    count: int = 2000 if quick else 20000
+    node: ChaincraftNode = ChaincraftNode(persistent=False)
+    datagrams: List[bytes] = [
+        node.compress_message(json.dumps({"message_type": "bench", "n": i}))
+        for i in range(count)
+    ]
+    peer = ("127.0.0.1", 7001)
+    start: float = time.perf_counter()
+    for data in datagrams:
+        node._receive_view(memoryview(data), peer)
+    unique: float = count / (time.perf_counter() - start)
+    start = time.perf_counter()
+    for data in datagrams:
+        node._receive_view(memoryview(data), peer)
+    duplicates: float = count / (time.perf_counter() - start)
+    return {
+        "messages_per_second": metric(unique, HIGHER),
+        "duplicates_per_second": metric(duplicates, HIGHER),
+    }
+
+
+def propagation(quick: bool = False) -> Metrics:
+    """
+    Propagation of 10 messages over a simulated network with 10 ms links:
+    virtual latency percentiles and bytes sent (deterministic for a given
+    version) and the wall-clock time the simulation took.
+    """
+    num_nodes: int = 30 if quick else 100
+    simulator: Simulator = Simulator(
+        num_nodes, degree=6, link=LinkConfig(latency=0.01, jitter=0.005), seed=1
+    )
+    start: float = time.perf_counter()
+    hashes: List[str] = []
+    for i in range(10):
+        hashes.append(simulator.publish({"n": i}, origin=i % num_nodes))
+        simulator.run(0.1)
+    simulator.run(5.0)
+    elapsed: float = time.perf_counter() - start
+    reports: List[Dict[str, float]] = [simulator.report(h) for h in hashes]
+    return {
+        "p50_seconds": metric(max(r["p50"] for r in reports), LOWER),
+        "p99_seconds": metric(max(r["p99"] for r in reports), LOWER),
+        "coverage": metric(min(r["coverage"] for r in reports), HIGHER),
+        "bytes_sent": metric(simulator.network.bytes_sent, LOWER),
+        "wall_seconds": metric(elapsed, LOWER),
+    }
+
+
+class HashChain(SharedObject):
+    """
+    Merkelized chain of hashes, each the SHA-256 of the previous one.
+    """
+
+    def __init__(self) -> None:
+        self.chain: List[str] = [hashlib.sha256(b"genesis").hexdigest()]
+
+    @staticmethod
+    def next_hash(previous: str) -> str:
+        return hashlib.sha256(previous.encode()).hexdigest()
+
+    def extend(self) -> str:
+        return self.next_hash(self.chain[-1])
+
+    def is_valid(self, message: SharedMessage) -> bool:
+        return message.data in self.chain or message.data == self.extend()
+
+    def add_message(self, message: SharedMessage) -> None:
+        if message.data == self.extend():
+            self.chain.append(message.data)
+
+    def is_merkelized(self) -> bool:
+        return True
+
+    def get_latest_digest(self) -> str:
+        return self.chain[-1]
+
+    def has_digest(self, hash_digest: str) -> bool:
+        return hash_digest in self.chain
+
+    def is_valid_digest(self, hash_digest: str) -> bool:
+        return hash_digest in self.chain
+
+    def add_digest(self, hash_digest: str) -> bool:
+        if hash_digest != self.extend():
+            return False
+        self.chain.append(hash_digest)
+        return True
+
+    def gossip_object(self, digest) -> List[SharedMessage]:
+        return self.get_messages_since_digest(digest)
+
+    def get_messages_since_digest(self, digest: str) -> List[SharedMessage]:
+        if digest not in self.chain:
+            return []
+        index: int = self.chain.index(digest)
+        return [SharedMessage(data=h) for h in self.chain[index + 1 :]]
+
+
+def catch_up(quick: bool = False) -> Metrics:
+    """
+    A fresh node joins a peer holding a chain of blocks and catches up
+    (simulated network with 5 ms links).
+    """
+    length: int = 100 if quick else 500
+
+    def factory(index: int, **kwargs: Any) -> ChaincraftNode:
+        return default_node(index, shared_objects=[HashChain()], **kwargs)
+
+    simulator: Simulator = Simulator(
+        2, degree=1, link=LinkConfig(latency=0.005), seed=2, node_factory=factory
+    )
+    leader, fresh = simulator.nodes
+    peers = (leader.peers, fresh.peers)
+    leader.peers, fresh.peers = [], []
+    chain: HashChain = leader.shared_objects[0]
+    for _ in range(length):
+        leader.create_shared_message(chain.extend())
+    leader.peers, fresh.peers = peers
+
+    target: int = len(chain.chain)
+    behind: HashChain = fresh.shared_objects[0]
+    start: float = time.perf_counter()
+    joined: float = simulator.network.now
+    while len(behind.chain) < target and simulator.network.now - joined < 600:
+        simulator.run(0.1)
+    return {
+        "virtual_seconds": metric(simulator.network.now - joined, LOWER),
+        "wall_seconds": metric(time.perf_counter() - start, LOWER),
+        "blocks": metric(len(behind.chain) - 1, HIGHER),
+    }
+
+
+def index(quick: bool = False) -> Metrics:
+    """
+    SQLite index: messages indexed per second and field queries per second.
+    """
+    count: int = 1000 if quick else 10000
+    with tempfile.TemporaryDirectory() as directory:
+        helper: IndexHelper = IndexHelper(0)
+        helper.db_name = os.path.join(directory, "bench_index.db")
+        helper.initialize_database()
+        try:
+            helper.set_indexed_fields("User", ["username", "group"])
+            messages: List[str] = [
+                SharedMessage(
+                    data={"message_type": "User", "username": f"u{i}", "group": i % 50}
+                ).to_json()
+                for i in range(count)
+            ]
+            start: float = time.perf_counter()
+            for message in messages:
+                helper.index_message(
+                    hashlib.sha256(message.encode()).hexdigest(), message
+                )
+            inserts: float = count / (time.perf_counter() - start)
+            queries: float = rate(
+                count // 10,
+                lambda: helper.search_messages("User", "group", "7"),
+            )
+        finally:
+            helper.close()
+    return {
+        "inserts_per_second": metric(inserts, HIGHER),
+        "queries_per_second": metric(queries, HIGHER),
+    }
+
+
+def store(quick: bool = False) -> Metrics:
+    """
+    Persistent writes: messages created per second on an SQLiteStore with
+    group commit and with a commit per message, and on a LogStore.
+    """
+    count: int = 2000 if quick else 20000
+    results: Metrics = {}
+    with tempfile.TemporaryDirectory() as directory:
+        stores: List[Tuple[str, Callable[[], MessageStore], int]] = [
+            (
+                f"sqlite_{DURABILITY_NORMAL}",
+                lambda: SQLiteStore(os.path.join(directory, "normal.db")),
+                count,
+            ),
+            (
+                f"sqlite_{DURABILITY_FULL}",
+                lambda: SQLiteStore(
+                    os.path.join(directory, "full.db"), DURABILITY_FULL
+                ),
+                200,
+            ),
+            ("log", lambda: LogStore(os.path.join(directory, "log")), count),
+        ]
+        for name, open_store, writes in stores:
+            node: ChaincraftNode = ChaincraftNode(store=open_store())
+            try:
+                numbers = iter(range(writes))
+                results[f"{name}_writes_per_second"] = metric(
+                    rate(
+                        writes,
+                        lambda: node.create_shared_message(
+                            {"message_type": "bench", "n": next(numbers)}
+                        ),
+                    ),
+                    HIGHER,
+                )
+            finally:
+                node.close()
+    return results
+
+
+def crypto(quick: bool = False) -> Metrics:
+    """
+    Operations per second of the crypto primitives.
+    """
+    count: int = 50 if quick else 500
+    data: bytes = b"chaincraft benchmark"
+    ecdsa: ECDSASignaturePrimitive = ECDSASignaturePrimitive()
+    ecdsa.generate_key()
+    signature: bytes = ecdsa.sign(data)
+    vrf: ECDSAVRFPrimitive = ECDSAVRFPrimitive()
+    vrf.generate_key()
+    proof: bytes = vrf.sign(data)
+    pow_: ProofOfWorkPrimitive = ProofOfWorkPrimitive(difficulty=2**8)
+    challenges: List[str] = [f"challenge {i}" for i in range(count)]
+    solved: List[Any] = []
+    return {
+        "ecdsa_sign_per_second": metric(rate(count, lambda: ecdsa.sign(data)), HIGHER),
+        "ecdsa_verify_per_second": metric(
+            rate(count, lambda: ecdsa.verify(data, signature)), HIGHER
+        ),
+        "vrf_verify_per_second": metric(
+            rate(count, lambda: vrf.verify(data, proof)), HIGHER
+        ),
+        "pow_solve_per_second": metric(
+            rate(
+                count, lambda: solved.append(pow_.create_proof(challenges[len(solved)]))
+            ),
+            HIGHER,
+        ),
+    }
+
+
+SCENARIOS: Dict[str, Callable[[bool], Metrics]] = {
+    "ingest": ingest,
+    "propagation": propagation,
+    "catch_up": catch_up,
+    "index": index,
+    "store": store,
+    "crypto": crypto,
+}
@@ -0,0 +1,33 @@
+# buffer_ring.py
+
+from typing import List
+
+
+class BufferRing:
+    """
+    Preallocated receive buffers handed out round-robin.
+
+    The receive loop reads each datagram into the next slot instead of
+    allocating a new bytes object per datagram. A view returned by next()
+    stays valid until the ring wraps around, i.e. for `slots` more
+    receives; anything that has to outlive that must be copied.
+    """
+
+    def __init__(self, slots: int = 8, slot_size: int = 65535) -> None:
+        if slots < 1:
+            raise ValueError("slots must be positive")
+        self.slot_size: int = slot_size
+        self.buffers: List[bytearray] = [bytearray(slot_size) for _ in range(slots)]
+        self.views: List[memoryview] = [memoryview(buffer) for buffer in self.buffers]
+        self.index: int = 0
+
+    def __len__(self) -> int:
+        return len(self.buffers)
+
+    def next(self) -> memoryview:
+        """
+        Return a writable view of the next free slot.
+        """
+        view: memoryview = self.views[self.index]
+        self.index = (self.index + 1) % len(self.views)
+        return view
@@ -0,0 +1,239 @@
+# codec.py
+
+"""
+Wire encodings. A node uses its codec ("json" or "binary") towards peers
+that announced support for it during discovery. Message hashes are always
+taken over the canonical JSON bytes, so they do not depend on the codec or
+compression used on a link.
+"""
+
+import json
+import re
+import struct
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Tuple
+
+# Binary messages are framed so they can never be mistaken for JSON or zlib.
+# The frame carries the canonical message hash, so duplicates can be dropped
+# without decoding the body.
+BINARY: bytes = b"\xccB"
+BINARY_HEADER = struct.Struct("!2s32s")  # magic, sha256 of the canonical bytes
+
+_NONE = 0x00
+_FALSE = 0x01
+_TRUE = 0x02
+_INT = 0x03
+_FLOAT = 0x04
+_STR = 0x05
+_HEX = 0x06
+_LIST = 0x07
+_DICT = 0x08
+
+_FLOAT_STRUCT = struct.Struct("!d")
+# Lowercase, even-length hex round-trips exactly through bytes.hex()
+_HEX_PATTERN = re.compile(r"(?:[0-9a-f]{2})+")
+
+
+class Codec(ABC):
+    """
+    Turns message data (JSON-compatible values) into bytes and back.
+    """
+
+    name: str = ""
+
+    @abstractmethod
+    def encode(self, data: Any) -> bytes:
+        pass
+
+    @abstractmethod
+    def decode(self, payload: bytes) -> Any:
+        pass
+
+
+class JSONCodec(Codec):
+    """
+    The original text encoding: json.dumps / json.loads.
+    """
+
+    name = "json"
+
+    def encode(self, data: Any) -> bytes:
+        return json.dumps(data).encode()
+
+    def decode(self, payload: bytes) -> Any:
+        return json.loads(payload)
+
+
+class BinaryCodec(Codec):
+    """
+    Compact type-tagged, length-prefixed encoding.
+
+    Each value is a one-byte tag followed by its payload: zigzag varints for
+    integers, 8-byte doubles, varint-length-prefixed UTF-8 for strings and
+    dict keys, and varint counts for lists and dicts. Strings that are
+    lowercase hex (hashes, signatures, keys) are stored as raw bytes, halving
+    their size. Dict order is preserved, so decoding and re-serializing with
+    json.dumps gives back the original JSON text.
+    """
+
+    name = "binary"
+
+    def encode(self, data: Any) -> bytes:
+        out = bytearray()
+        self._encode_value(data, out)
+        return bytes(out)
+
+    def decode(self, payload: bytes) -> Any:
+        value, offset = self._decode_value(payload, 0)
+        if offset != len(payload):
+            raise ValueError("Trailing bytes after binary message")
+        return value
+
+    def _encode_value(self, value: Any, out: bytearray) -> None:
+        if value is None:
+            out.append(_NONE)
+        elif value is True:
+            out.append(_TRUE)
+        elif value is False:
+            out.append(_FALSE)
+        elif isinstance(value, int):
+            out.append(_INT)
+            _write_varint(_zigzag(value), out)
+        elif isinstance(value, float):
+            out.append(_FLOAT)
+            out += _FLOAT_STRUCT.pack(value)
+        elif isinstance(value, str):
+            if _HEX_PATTERN.fullmatch(value):
+                raw: bytes = bytes.fromhex(value)
+                out.append(_HEX)
+            else:
+                raw = value.encode()
+                out.append(_STR)
+            _write_varint(len(raw), out)
+            out += raw
+        elif isinstance(value, (list, tuple)):
+            out.append(_LIST)
+            _write_varint(len(value), out)
+            for item in value:
+                self._encode_value(item, out)
+        elif isinstance(value, dict):
+            out.append(_DICT)
+            _write_varint(len(value), out)
+            for key, item in value.items():
+                if not isinstance(key, str):
+                    raise TypeError(f"Dict keys must be str, got {type(key)}")
+                raw = key.encode()
+                _write_varint(len(raw), out)
+                out += raw
+                self._encode_value(item, out)
+        else:
+            raise TypeError(f"Cannot encode {type(value)}")
+
+    def _decode_value(self, payload: bytes, offset: int) -> Tuple[Any, int]:
+        # Ordered by how common each type is in our messages
+        try:
+            tag: int = payload[offset]
+        except IndexError:
+            raise ValueError("Truncated binary message") from None
+        offset += 1
+        if tag == _STR or tag == _HEX:
+            raw, offset = _read_bytes(payload, offset)
+            return (raw.hex() if tag == _HEX else raw.decode()), offset
+        if tag == _DICT:
+            count, offset = _read_varint(payload, offset)
+            result: Dict[str, Any] = {}
+            for _ in range(count):
+                raw, offset = _read_bytes(payload, offset)
+                result[raw.decode()], offset = self._decode_value(payload, offset)
+            return result, offset
+        if tag == _INT:
+            encoded, offset = _read_varint(payload, offset)
+            return (encoded >> 1) ^ -(encoded & 1), offset
+        if tag == _FLOAT:
+            end: int = offset + _FLOAT_STRUCT.size
+            if end > len(payload):
+                raise ValueError("Truncated float")
+            return _FLOAT_STRUCT.unpack_from(payload, offset)[0], end
+        if tag == _LIST:
+            count, offset = _read_varint(payload, offset)
+            items: List[Any] = []
+            for _ in range(count):
+                item, offset = self._decode_value(payload, offset)
+                items.append(item)
+            return items, offset
+        if tag == _NONE:
+            return None, offset
+        if tag == _TRUE:
+            return True, offset
+        if tag == _FALSE:
+            return False, offset
+        raise ValueError(f"Unknown type tag {tag}")
+
+
+def _zigzag(value: int) -> int:
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def _write_varint(value: int, out: bytearray) -> None:
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(payload: bytes, offset: int) -> Tuple[int, int]:
+    try:
+        byte: int = payload[offset]
+    except IndexError:
+        raise ValueError("Truncated varint") from None
+    if byte < 0x80:
+        return byte, offset + 1
+    result: int = 0
+    shift: int = 0
+    while True:
+        if offset >= len(payload):
+            raise ValueError("Truncated varint")
+        byte = payload[offset]
+        offset += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, offset
+        shift += 7
+
+
+def _read_bytes(payload: bytes, offset: int) -> Tuple[bytes, int]:
+    length, offset = _read_varint(payload, offset)
+    end: int = offset + length
+    if end > len(payload):
+        raise ValueError("Truncated string")
+    return payload[offset:end], end
+
+
+def encode_binary_frame(message_hash: str, payload: bytes) -> bytes:
+    """
+    Wrap a BinaryCodec payload in a BINARY frame carrying the message hash.
+    """
+    return BINARY_HEADER.pack(BINARY, bytes.fromhex(message_hash)) + payload
+
+
+def decode_binary_frame(frame: bytes) -> Tuple[str, bytes]:
+    """
+    Split a BINARY frame into (message hash, BinaryCodec payload).
+    """
+    if len(frame) < BINARY_HEADER.size:
+        raise ValueError("Truncated binary frame")
+    _, digest = BINARY_HEADER.unpack_from(frame)
+    return digest.hex(), frame[BINARY_HEADER.size :]
+
+
+CODECS: Dict[str, Codec] = {codec.name: codec for codec in (JSONCodec(), BinaryCodec())}
+
+
+def get_codec(name: str) -> Codec:
+    """
+    Look up a codec by name. Raises ValueError for unknown names.
+    """
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise ValueError(f"Unknown codec: {name}") from None
@@ -0,0 +1,284 @@
+# compression.py
+
+"""
+Compression on the wire. With use_compression, messages go to peers as
+zlib DEFLATED frames when that makes them smaller, unless a peer's
+handshake says it cannot decode them; every node decodes them.
+dictionary_compression instead compresses per peer with a trained preset
+dictionary (DictionaryCompressor) and replaces use_compression.
+"""
+
+import hashlib
+import re
+import struct
+import threading
+import zlib
+from collections import Counter, OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .codec import BINARY
+
+COMPRESSED: bytes = b"\xccZ"
+DICTIONARY_ID_SIZE: int = 4
+COMPRESSED_HEADER = struct.Struct("!2s4s")  # magic, dictionary id, then deflate
+
+# A message compressed with plain zlib. Like BINARY frames it carries the hash
+# of the canonical (uncompressed JSON) bytes, so duplicates are dropped
+# before inflating and the message ID does not depend on compression.
+DEFLATED: bytes = b"\xccD"
+DEFLATED_HEADER = struct.Struct("!2s32s")  # magic, sha256, then zlib stream
+
+# Frames that hold a whole message and go through the decode stage
+MESSAGE_FRAMES: Tuple[bytes, ...] = (BINARY, DEFLATED)
+# First byte of plain zlib streams, sent by nodes without DEFLATED frames
+ZLIB_HEADER: bytes = b"\x78"
+
+# Keys with their colon, and short string values such as message types
+_TOKEN_PATTERN = re.compile(r'"[^"\\]{1,48}"\s*:\s*|"[A-Za-z_][^"\\]{0,31}"')
+
+
+def dictionary_id(dictionary: bytes) -> bytes:
+    """
+    Version tag of a dictionary: identical dictionaries get identical ids.
+    """
+    return hashlib.sha256(dictionary).digest()[:DICTIONARY_ID_SIZE]
+
+
+def train_dictionary(samples: Iterable[str], max_size: int = 8192) -> bytes:
+    """
+    Build a zlib preset dictionary from sample messages.
+
+    Deflate finds matches anywhere in the dictionary but codes close matches
+    more cheaply, so the most valuable content goes last: frequent keys and
+    short values first, followed by a few whole recent messages that carry the
+    usual field order and repeated values (public keys, addresses).
+    """
+    samples = list(samples)
+    counts: Counter = Counter()
+    for sample in samples:
+        counts.update(_TOKEN_PATTERN.findall(sample))
+
+    tokens: List[str] = [
+        token
+        for token, count in sorted(counts.items(), key=lambda item: item[1])
+        if count > 1
+    ]
+    token_part: bytes = "".join(tokens).encode()[-max_size // 2 :]
+
+    tail: bytes = b""
+    for sample in reversed(samples):
+        encoded: bytes = sample.encode()
+        if len(tail) + len(encoded) > max_size - len(token_part):
+            break
+        tail = encoded + tail
+    return (token_part + tail)[-max_size:]
+
+
+def encode_deflated_frame(message_hash: str, data: bytes, level: int = 6) -> bytes:
+    """
+    Compress a message into a DEFLATED frame carrying its hash.
+    """
+    return DEFLATED_HEADER.pack(DEFLATED, bytes.fromhex(message_hash)) + zlib.compress(
+        data, level
+    )
+
+
+def decode_deflated_frame(frame: bytes) -> Tuple[str, bytes]:
+    """
+    Split a DEFLATED frame into (message hash, zlib stream).
+    """
+    if len(frame) < DEFLATED_HEADER.size:
+        raise ValueError("Truncated deflated frame")
+    _, digest = DEFLATED_HEADER.unpack_from(frame)
+    return digest.hex(), frame[DEFLATED_HEADER.size :]
+
+
+def inflate(data: bytes, max_size: int) -> bytes:
+    """
+    Decompress a zlib stream of at most max_size bytes. Raises ValueError if
+    it inflates to more and zlib.error if it is corrupt or incomplete.
+    """
+    decompressor = zlib.decompressobj()
+    inflated: bytes = decompressor.decompress(data, max_size)
+    if not decompressor.eof:
+        if len(inflated) >= max_size:
+            raise ValueError("Compressed message exceeds max_size")
+        raise zlib.error("Incomplete compressed message")
+    return inflated
+
+
+class DictionaryCompressor:
+    """
+    Per-peer zlib compression with a trained, versioned preset dictionary.
+
+    The node trains a dictionary once `train_after` messages are stored and
+    offers it to each peer; messages to a peer are only compressed with a
+    dictionary that peer has acknowledged. Frames are COMPRESSED + dictionary
+    id + raw deflate. When compression does not make a message smaller, the
+    plain encoding is sent instead.
+
+    Because the wire bytes now differ per peer, message hashes in this mode
+    are computed over the plain encoding, which is also what uncompressed
+    nodes hash.
+
+    Dictionaries larger than `max_dictionary_size` are refused, and at most
+    `max_dictionaries` are kept: the least recently used one (never the
+    active one) is evicted to make room.
+    """
+
+    def __init__(
+        self,
+        dictionary_size: int = 8192,
+        train_after: int = 64,
+        sample_size: int = 256,
+        level: int = 6,
+        max_message_size: int = 16 * 1024 * 1024,
+        max_dictionary_size: int = 64 * 1024,
+        max_dictionaries: int = 16,
+    ) -> None:
+        self.dictionary_size: int = dictionary_size
+        self.train_after: int = train_after
+        self.sample_size: int = sample_size
+        self.level: int = level
+        self.max_message_size: int = max_message_size
+        self.max_dictionary_size: int = max_dictionary_size
+        self.max_dictionaries: int = max_dictionaries
+
+        # Dictionaries we can decode with (ours and the ones peers sent us),
+        # least recently used first
+        self.dictionaries: "OrderedDict[bytes, bytes]" = OrderedDict()
+        self.active_id: Optional[bytes] = None
+        # Dictionary id each peer acknowledged for decoding our messages
+        self.peer_dictionaries: Dict[Tuple[str, int], bytes] = {}
+        self.lock = threading.Lock()
+
+        self.raw_bytes: int = 0
+        self.wire_bytes: int = 0
+        self.compressed_messages: int = 0
+        self.fallbacks: int = 0
+        self.unknown_dictionary: int = 0
+
+    def needs_training(self, stored_messages: int) -> bool:
+        return self.active_id is None and stored_messages >= self.train_after
+
+    def train(self, samples: Iterable[str]) -> bytes:
+        """
+        Train a new dictionary from samples, make it active and return its id.
+        """
+        dictionary: bytes = train_dictionary(samples, self.dictionary_size)
+        return self.set_dictionary(dictionary)
+
+    def set_dictionary(self, dictionary: bytes) -> bytes:
+        """
+        Install a dictionary as the active one (e.g. shipped with a release).
+        """
+        dict_id: bytes = self.add_dictionary(dictionary)
+        with self.lock:
+            self.active_id = dict_id
+        return dict_id
+
+    def add_dictionary(self, dictionary: bytes) -> bytes:
+        """
+        Make a dictionary available for decoding and return its id. Raises
+        ValueError if it is larger than max_dictionary_size.
+        """
+        if len(dictionary) > self.max_dictionary_size:
+            raise ValueError("Dictionary exceeds max_dictionary_size")
+        dict_id: bytes = dictionary_id(dictionary)
+        with self.lock:
+            self.dictionaries[dict_id] = dictionary
+            self.dictionaries.move_to_end(dict_id)
+            for old_id in list(self.dictionaries):
+                if len(self.dictionaries) <= self.max_dictionaries:
+                    break
+                if old_id != dict_id and old_id != self.active_id:
+                    del self.dictionaries[old_id]
+        return dict_id
+
+    def active_dictionary(self) -> Optional[Tuple[bytes, bytes]]:
+        with self.lock:
+            if self.active_id is None:
+                return None
+            return self.active_id, self.dictionaries[self.active_id]
+
+    def acknowledge(self, peer: Tuple[str, int], dict_id: Optional[bytes]) -> None:
+        """
+        Record which dictionary a peer can decode (None: it has none of ours).
+        """
+        with self.lock:
+            if dict_id is None or dict_id not in self.dictionaries:
+                self.peer_dictionaries.pop(peer, None)
+            else:
+                self.peer_dictionaries[peer] = dict_id
+
+    def peers_to_offer(self, peers: Iterable[Tuple[str, int]]) -> List[Tuple[str, int]]:
+        with self.lock:
+            if self.active_id is None:
+                return []
+            return [p for p in peers if self.peer_dictionaries.get(p) != self.active_id]
+
+    def encode(self, data: bytes, peer: Tuple[str, int]) -> bytes:
+        """
+        Encode a plain message for a peer, compressing only if it helps.
+        """
+        with self.lock:
+            dict_id: Optional[bytes] = self.peer_dictionaries.get(peer)
+            dictionary: Optional[bytes] = self.dictionaries.get(dict_id)
+        self.raw_bytes += len(data)
+        if dictionary is None:
+            self.wire_bytes += len(data)
+            return data
+
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, -15, zdict=dictionary)
+        frame: bytes = (
+            COMPRESSED_HEADER.pack(COMPRESSED, dict_id)
+            + compressor.compress(data)
+            + compressor.flush()
+        )
+        if len(frame) >= len(data):
+            self.fallbacks += 1
+            self.wire_bytes += len(data)
+            return data
+        self.compressed_messages += 1
+        self.wire_bytes += len(frame)
+        return frame
+
+    def decode(self, frame: bytes, max_size: Optional[int] = None) -> Optional[bytes]:
+        """
+        Decode a COMPRESSED frame of at most max_size decoded bytes (default
+        max_message_size). Returns None if the dictionary is unknown.
+        Raises zlib.error / ValueError on corrupt or oversized frames.
+        """
+        if max_size is None:
+            max_size = self.max_message_size
+        if len(frame) < COMPRESSED_HEADER.size:
+            raise ValueError("Truncated compressed frame")
+        _, dict_id = COMPRESSED_HEADER.unpack_from(frame)
+        with self.lock:
+            dictionary: Optional[bytes] = self.dictionaries.get(dict_id)
+            if dictionary is not None:
+                self.dictionaries.move_to_end(dict_id)
+        if dictionary is None:
+            self.unknown_dictionary += 1
+            return None
+
+        decompressor = zlib.decompressobj(-15, zdict=dictionary)
+        data: bytes = decompressor.decompress(frame[COMPRESSED_HEADER.size :], max_size)
+        if not decompressor.eof:
+            if len(data) >= max_size:
+                raise ValueError("Compressed message exceeds max_size")
+            raise zlib.error("Incomplete compressed frame")
+        return data
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Return byte counters and the overall wire/raw ratio.
+        """
+        return {
+            "raw_bytes": self.raw_bytes,
+            "wire_bytes": self.wire_bytes,
+            "ratio": self.raw_bytes / self.wire_bytes if self.wire_bytes else 1.0,
+            "compressed_messages": self.compressed_messages,
+            "fallbacks": self.fallbacks,
+            "unknown_dictionary": self.unknown_dictionary,
+        }
@@ -0,0 +1,277 @@
+# fragmentation.py
+
+"""
+Fragmentation of messages larger than a node's max_datagram_size: they are
+sent as FRAGMENT frames and reassembled by the receiver, which asks for lost
+fragments with FRAGMENT_NACK frames.
+"""
+
+import hashlib
+import struct
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+# Frames start with a byte that can never begin a JSON text or a zlib stream
+FRAME_MAGIC: int = 0xCC
+FRAGMENT: bytes = b"\xccF"
+FRAGMENT_NACK: bytes = b"\xccN"
+
+MESSAGE_ID_SIZE: int = 8
+FRAGMENT_HEADER = struct.Struct("!2s8sHH")  # magic, message id, index, count
+NACK_HEADER = struct.Struct("!2s8s")  # magic, message id, then uint16 indices
+MAX_FRAGMENTS: int = 4096
+# Bytes charged per partial message on top of its chunks, so partials made of
+# empty fragments still count against ReassemblyBuffer.max_bytes
+PARTIAL_OVERHEAD: int = 128
+
+
+def fragment_message_id(data: bytes) -> bytes:
+    """
+    Derive a message id from the payload, so rebroadcasts reuse the same id.
+    """
+    return hashlib.sha256(data).digest()[:MESSAGE_ID_SIZE]
+
+
+def split_message(data: bytes, max_datagram_size: int) -> List[bytes]:
+    """
+    Split a payload into FRAGMENT frames no larger than max_datagram_size.
+    """
+    chunk_size: int = max_datagram_size - FRAGMENT_HEADER.size
+    if chunk_size <= 0:
+        raise ValueError("max_datagram_size is smaller than the fragment header")
+
+    count: int = (len(data) + chunk_size - 1) // chunk_size
+    if count > MAX_FRAGMENTS:
+        raise ValueError(f"Message needs {count} fragments, limit is {MAX_FRAGMENTS}")
+
+    message_id: bytes = fragment_message_id(data)
+    return [
+        FRAGMENT_HEADER.pack(FRAGMENT, message_id, index, count)
+        + data[index * chunk_size : (index + 1) * chunk_size]
+        for index in range(count)
+    ]
+
+
+def encode_nack(message_id: bytes, missing: List[int]) -> bytes:
+    """
+    Build a FRAGMENT_NACK frame asking for the given fragment indices.
+    """
+    return NACK_HEADER.pack(FRAGMENT_NACK, message_id) + struct.pack(
+        f"!{len(missing)}H", *missing
+    )
+
+
+def decode_nack(frame: bytes) -> Tuple[bytes, List[int]]:
+    """
+    Parse a FRAGMENT_NACK frame into (message id, missing indices).
+    """
+    _, message_id = NACK_HEADER.unpack_from(frame)
+    body: bytes = frame[NACK_HEADER.size :]
+    count: int = len(body) // 2
+    return message_id, list(struct.unpack(f"!{count}H", body[: count * 2]))
+
+
+class _PartialMessage:
+    def __init__(self, count: int, now: float) -> None:
+        self.count: int = count
+        self.chunks: Dict[int, bytes] = {}
+        self.size: int = PARTIAL_OVERHEAD
+        self.first_seen: float = now
+        self.last_seen: float = now
+        self.nack_sent_at: float = 0.0
+        self.nacks_sent: int = 0
+
+    def missing(self) -> List[int]:
+        return [i for i in range(self.count) if i not in self.chunks]
+
+
+class ReassemblyBuffer:
+    """
+    Collects FRAGMENT frames per (sender, message id) until a message is complete.
+
+    Partial messages expire after `timeout` seconds, the total buffered payload
+    (plus PARTIAL_OVERHEAD per partial) is capped at `max_bytes` and the number
+    of partials at `max_partials` (oldest partial messages are evicted first),
+    and messages that stall for `nack_delay` seconds are reported by
+    pending_nacks(), at most `max_nacks` times each, so the node can ask the
+    sender for the missing fragments.
+    """
+
+    def __init__(
+        self,
+        timeout: float = 10.0,
+        max_bytes: int = 8 * 1024 * 1024,
+        nack_delay: float = 0.5,
+        max_partials: int = 1024,
+        max_nacks: int = 3,
+    ) -> None:
+        self.timeout: float = timeout
+        self.max_bytes: int = max_bytes
+        self.nack_delay: float = nack_delay
+        self.max_partials: int = max_partials
+        self.max_nacks: int = max_nacks
+        self.buffered_bytes: int = 0
+        self.partials: "OrderedDict[Tuple[Tuple[str, int], bytes], _PartialMessage]" = (
+            OrderedDict()
+        )
+        # Recently completed messages, so stray resent fragments are ignored
+        # instead of opening a new partial message (and NACKing the rest)
+        self.completed: "OrderedDict[Tuple[Tuple[str, int], bytes], float]" = (
+            OrderedDict()
+        )
+        self.completed_ttl: float = 2 * nack_delay
+        self.lock = threading.Lock()
+
+        self.expired: int = 0
+        self.evicted: int = 0
+
+    def add(
+        self, frame: bytes, addr: Tuple[str, int], now: Optional[float] = None
+    ) -> Optional[bytes]:
+        """
+        Add a FRAGMENT frame. Returns the reassembled payload once the last
+        missing fragment arrives, otherwise None.
+        """
+        now = time.time() if now is None else now
+        if len(frame) < FRAGMENT_HEADER.size:
+            return None
+        _, message_id, index, count = FRAGMENT_HEADER.unpack_from(frame)
+        if count == 0 or count > MAX_FRAGMENTS or index >= count:
+            return None
+
+        chunk: bytes = frame[FRAGMENT_HEADER.size :]
+        key = ((addr[0], addr[1]), message_id)
+        with self.lock:
+            while self.completed:
+                oldest_key, completed_at = next(iter(self.completed.items()))
+                if now - completed_at <= self.completed_ttl:
+                    break
+                del self.completed[oldest_key]
+            if key in self.completed:
+                return None
+            partial = self.partials.get(key)
+            if partial is None:
+                partial = self.partials[key] = _PartialMessage(count, now)
+                self.buffered_bytes += partial.size
+            elif partial.count != count:
+                return None
+            if index in partial.chunks:
+                return None
+
+            partial.chunks[index] = chunk
+            partial.size += len(chunk)
+            partial.last_seen = now
+            self.buffered_bytes += len(chunk)
+
+            if len(partial.chunks) == partial.count:
+                self._discard(key)
+                self.completed[key] = now
+                data: bytes = b"".join(partial.chunks[i] for i in range(partial.count))
+                if fragment_message_id(data) != message_id:
+                    return None
+                return data
+
+            while self.partials and (
+                self.buffered_bytes > self.max_bytes
+                or len(self.partials) > self.max_partials
+            ):
+                oldest_key = next(iter(self.partials))
+                self._discard(oldest_key)
+                self.evicted += 1
+            return None
+
+    def pending_nacks(
+        self, now: Optional[float] = None
+    ) -> List[Tuple[Tuple[str, int], bytes, List[int]]]:
+        """
+        Expire old partial messages and return (sender, message id, missing
+        indices) for the ones that stalled long enough to ask for a resend.
+        """
+        now = time.time() if now is None else now
+        nacks: List[Tuple[Tuple[str, int], bytes, List[int]]] = []
+        with self.lock:
+            for key, partial in list(self.partials.items()):
+                if now - partial.first_seen > self.timeout:
+                    self._discard(key)
+                    self.expired += 1
+                elif (
+                    partial.nacks_sent < self.max_nacks
+                    and now - partial.last_seen >= self.nack_delay
+                    and now - partial.nack_sent_at >= self.nack_delay
+                ):
+                    partial.nack_sent_at = now
+                    partial.nacks_sent += 1
+                    nacks.append((key[0], key[1], partial.missing()))
+        return nacks
+
+    def _discard(self, key: Tuple[Tuple[str, int], bytes]) -> None:
+        partial = self.partials.pop(key, None)
+        if partial is not None:
+            self.buffered_bytes -= partial.size
+
+
+class FragmentCache:
+    """
+    Keeps the fragments of recently sent large messages so that NACKed
+    fragments can be resent without re-encoding. Bounded by total bytes.
+    Entries are per destination peer and fragment size: a NACK is only
+    answered for fragments that were sent to the address it came from, so
+    a spoofed NACK cannot make the node send them to a third party.
+    """
+
+    def __init__(self, max_bytes: int = 8 * 1024 * 1024) -> None:
+        self.max_bytes: int = max_bytes
+        self.size: int = 0
+        self.entries: "OrderedDict[Tuple[Tuple[str, int], bytes, int], List[bytes]]" = (
+            OrderedDict()
+        )
+        self.lock = threading.Lock()
+
+    def fragments_for(
+        self, data: bytes, max_datagram_size: int, peer: Tuple[str, int]
+    ) -> List[bytes]:
+        """
+        Return the fragments of data sent to peer, splitting and caching it
+        if needed.
+        """
+        key: Tuple[Tuple[str, int], bytes, int] = (
+            peer,
+            fragment_message_id(data),
+            max_datagram_size,
+        )
+        with self.lock:
+            fragments = self.entries.get(key)
+            if fragments is not None:
+                self.entries.move_to_end(key)
+                return fragments
+
+        fragments = split_message(data, max_datagram_size)
+        with self.lock:
+            self.entries[key] = fragments
+            self.size += sum(len(f) for f in fragments)
+            while self.size > self.max_bytes and len(self.entries) > 1:
+                _, dropped = self.entries.popitem(last=False)
+                self.size -= sum(len(f) for f in dropped)
+        return fragments
+
+    def get(
+        self,
+        peer: Tuple[str, int],
+        message_id: bytes,
+        indices: List[int],
+        max_datagram_size: int,
+    ) -> List[bytes]:
+        """
+        Return the cached fragments with the given indices that were sent to
+        peer (if still cached). Each fragment is returned at most once, so a
+        NACK never yields more fragments than the message has.
+        """
+        with self.lock:
+            fragments = self.entries.get((peer, message_id, max_datagram_size))
+            if fragments is None:
+                return []
+            return [
+                fragments[i] for i in sorted(set(indices)) if 0 <= i < len(fragments)
+            ]
@@ -0,0 +1,224 @@
+# gossip.py
+
+"""
+Gossip strategies pick the peers a new message is pushed to, its hop limit
+and whether gossip rounds rebroadcast the store or run push-pull exchanges.
+Nodes flood to every peer except the sender by default.
+"""
+
+import random
+import struct
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+# Hop-limited envelope around a pushed message: magic, remaining hops
+TTL_ENVELOPE: bytes = b"\xccT"
+TTL_HEADER = struct.Struct("!2sB")
+
+Peer = Tuple[str, int]
+
+
+def wrap_ttl(data: bytes, ttl: int) -> bytes:
+    return TTL_HEADER.pack(TTL_ENVELOPE, max(0, min(ttl, 255))) + data
+
+
+def unwrap_ttl(frame: bytes) -> Tuple[int, bytes]:
+    if len(frame) < TTL_HEADER.size:
+        raise ValueError("Truncated TTL envelope")
+    _, ttl = TTL_HEADER.unpack_from(frame)
+    return ttl, frame[TTL_HEADER.size :]
+
+
+class GossipStrategy:
+    """
+    Decides which peers a new message is pushed to and how far it travels.
+
+    The base strategy is plain flooding: every new message goes to every
+    peer except the one it came from, without a hop limit, and the node keeps
+    its periodic rebroadcast of the whole store.
+    """
+
+    name: str = "flood"
+    # Hop limit put on messages we originate (None: no TTL envelope)
+    ttl: Optional[int] = None
+    # Whether gossip rounds keep rebroadcasting the whole store
+    periodic_rebroadcast: bool = True
+    # Peers contacted per push-pull round (0: no pull rounds), and how many
+    # of the most recent hashes a pull request carries
+    pull_fanout: int = 0
+    pull_window: int = 256
+
+    def __init__(self, seed: Optional[int] = None) -> None:
+        self.rng = random.Random(seed)
+
+    def relay_targets(
+        self, peers: Sequence[Peer], origin: Optional[Peer] = None
+    ) -> List[Peer]:
+        """
+        Return the peers a new message should be pushed to.
+        """
+        return [peer for peer in peers if peer != origin]
+
+    def next_ttl(self, received_ttl: Optional[int]) -> Optional[int]:
+        """
+        TTL for relaying a message that arrived with received_ttl (None if it
+        had no envelope). Returns 0 when the message must not be relayed.
+        """
+        if received_ttl is None:
+            return self.ttl
+        return received_ttl - 1
+
+    def pull_targets(self, peers: Sequence[Peer]) -> List[Peer]:
+        """
+        Return the peers to run a push-pull exchange with this round.
+        """
+        if not self.pull_fanout or not peers:
+            return []
+        return self.rng.sample(list(peers), min(self.pull_fanout, len(peers)))
+
+
+class FloodStrategy(GossipStrategy):
+    pass
+
+
+class FanoutStrategy(GossipStrategy):
+    """
+    Push each new message to `fanout` random peers (never back to the
+    sender) and stop after `ttl` hops. No periodic rebroadcast.
+    """
+
+    name = "fanout"
+    periodic_rebroadcast = False
+
+    def __init__(self, fanout: int = 3, ttl: int = 6, seed: Optional[int] = None):
+        super().__init__(seed)
+        self.fanout: int = fanout
+        self.ttl = ttl
+
+    def relay_targets(
+        self, peers: Sequence[Peer], origin: Optional[Peer] = None
+    ) -> List[Peer]:
+        candidates: List[Peer] = [peer for peer in peers if peer != origin]
+        if len(candidates) <= self.fanout:
+            return candidates
+        return self.rng.sample(candidates, self.fanout)
+
+
+class PushPullStrategy(FanoutStrategy):
+    """
+    Fanout push for fast initial spread, plus pull rounds: every gossip round
+    the node sends its recent hashes to `pull_fanout` random peers, which
+    answer with an inventory of the recent messages it is missing. Pull picks
+    up the stragglers a limited push leaves behind.
+    """
+
+    name = "push-pull"
+
+    def __init__(
+        self,
+        fanout: int = 2,
+        ttl: int = 4,
+        pull_fanout: int = 1,
+        pull_window: int = 256,
+        seed: Optional[int] = None,
+    ):
+        super().__init__(fanout, ttl, seed)
+        self.pull_fanout = pull_fanout
+        self.pull_window = pull_window
+
+
+STRATEGIES: Dict[str, type] = {
+    FloodStrategy.name: FloodStrategy,
+    FanoutStrategy.name: FanoutStrategy,
+    PushPullStrategy.name: PushPullStrategy,
+}
+
+
+def random_topology(num_nodes: int, degree: int, rng: random.Random) -> List[List[int]]:
+    """
+    Connected random graph: a ring plus random links up to `degree` each.
+    """
+    neighbours: List[Set[int]] = [set() for _ in range(num_nodes)]
+    for i in range(num_nodes):
+        j = (i + 1) % num_nodes
+        if i != j:
+            neighbours[i].add(j)
+            neighbours[j].add(i)
+    for i in range(num_nodes):
+        while len(neighbours[i]) < min(degree, num_nodes - 1):
+            j = rng.randrange(num_nodes)
+            if j != i:
+                neighbours[i].add(j)
+                neighbours[j].add(i)
+    return [sorted(n) for n in neighbours]
+
+
+def simulate_propagation(
+    strategy: GossipStrategy,
+    num_nodes: int,
+    degree: int = 8,
+    max_rounds: int = 100,
+    seed: int = 0,
+) -> Dict[str, float]:
+    """
+    Round-based simulation of one message spreading from node 0.
+
+    Each round, nodes that received the message in the previous round push
+    it according to the strategy, and (for push-pull) every node runs a pull
+    exchange with random neighbours. Returns the rounds until every node had
+    it (or max_rounds), the payload sends, how many of them were redundant,
+    control sends (pull requests) and the final coverage.
+    """
+    rng = random.Random(seed)
+    strategy.rng = random.Random(seed + 1)
+    topology = random_topology(num_nodes, degree, rng)
+    peers_of = [[(str(j), j) for j in topology[i]] for i in range(num_nodes)]
+
+    has: List[bool] = [False] * num_nodes
+    has[0] = True
+    # node -> (ttl it holds the message with, peer it came from)
+    frontier: Dict[int, Tuple[Optional[int], Optional[Peer]]] = {
+        0: (strategy.ttl, None)
+    }
+    sends: int = 0
+    redundant: int = 0
+    control: int = 0
+    rounds: int = 0
+
+    while rounds < max_rounds and not all(has):
+        rounds += 1
+        next_frontier: Dict[int, Tuple[Optional[int], Optional[Peer]]] = {}
+        for node, (ttl, origin) in frontier.items():
+            if ttl is not None and ttl <= 0:
+                continue
+            for peer in strategy.relay_targets(peers_of[node], origin):
+                target: int = peer[1]
+                sends += 1
+                if has[target] or target in next_frontier:
+                    redundant += 1
+                    continue
+                next_frontier[target] = (strategy.next_ttl(ttl), (str(node), node))
+
+        if strategy.pull_fanout:
+            for node in range(num_nodes):
+                for peer in strategy.pull_targets(peers_of[node]):
+                    control += 1
+                    if has[peer[1]] and not has[node] and node not in next_frontier:
+                        sends += 1
+                        # Pulled payloads carry no envelope, so they are
+                        # pushed on with a fresh TTL, as in the node
+                        next_frontier[node] = (strategy.next_ttl(None), peer)
+
+        for node in next_frontier:
+            has[node] = True
+        frontier = next_frontier
+        if not frontier and not strategy.pull_fanout:
+            break
+
+    return {
+        "nodes": num_nodes,
+        "rounds": rounds if all(has) else float("inf"),
+        "coverage": sum(has) / num_nodes,
+        "sends": sends,
+        "redundant_sends": redundant,
+        "control_sends": control,
+    }
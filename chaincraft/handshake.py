@@ -0,0 +1,87 @@
+# handshake.py
+
+"""
+Capability handshake. Discovery messages carry the node's Capabilities
+(codecs, compression, max_datagram_size, features); each link uses what
+both ends support, and datagrams to a peer never exceed its
+max_datagram_size.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence
+
+PROTOCOL_VERSION: int = 1
+
+# Compression schemes a node can decode (DEFLATED frames)
+COMPRESSIONS: List[str] = ["zlib"]
+
+# Optional exchanges a peer takes part in
+FEATURE_ANTI_ENTROPY: str = "anti_entropy"
+FEATURE_SKETCH: str = "sketch"
+
+
+class Capabilities:
+    """
+    What a node can handle on its links, announced with PEER_DISCOVERY:
+    the protocol version, the codecs and compression schemes it can
+    decode, the largest datagram it accepts and the optional features it
+    runs. Each side sends its own; every link then uses what both ends
+    support.
+    """
+
+    def __init__(
+        self,
+        version: int = PROTOCOL_VERSION,
+        codecs: Sequence[str] = ("json",),
+        compression: Sequence[str] = (),
+        max_datagram_size: Optional[int] = None,
+        features: Sequence[str] = (),
+    ) -> None:
+        self.version: int = version
+        self.codecs: List[str] = list(codecs)
+        self.compression: List[str] = list(compression)
+        self.max_datagram_size: Optional[int] = max_datagram_size
+        self.features: List[str] = list(features)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "codecs": self.codecs,
+            "compression": self.compression,
+            "max_datagram_size": self.max_datagram_size,
+            "features": self.features,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Any) -> Optional["Capabilities"]:
+        """
+        Parse a peer's announcement, or None if it is malformed. Unknown
+        fields (from newer versions) are ignored.
+        """
+        if not isinstance(data, dict):
+            return None
+        version: Any = data.get("version")
+        mtu: Any = data.get("max_datagram_size")
+        if not isinstance(version, int) or version < 1:
+            return None
+        if mtu is not None and (not isinstance(mtu, int) or mtu < 64):
+            return None
+        return cls(
+            version,
+            _strings(data.get("codecs")) or ["json"],
+            _strings(data.get("compression")),
+            mtu,
+            _strings(data.get("features")),
+        )
+
+    @classmethod
+    def legacy(cls, codecs: Any) -> "Capabilities":
+        """
+        Capabilities of a peer that only announced its codecs (version 0).
+        """
+        return cls(0, _strings(codecs) or ["json"])
+
+
+def _strings(values: Any) -> List[str]:
+    if not isinstance(values, list):
+        return []
+    return [value for value in values if isinstance(value, str)]
@@ -1,6 +1,7 @@
 import sqlite3
 import json
 import os
+import threading
 from typing import Dict, List, Tuple, Any, Optional
 
 
@@ -22,12 +23,15 @@ class IndexHelper:
         self.sqlite_conn = None
         self.indexed_fields = {}
         self.db_name = f"node_{node_port}_index.db"
+        # Messages are indexed by the receiving thread and removed by the
+        # compactor, so the connection is shared between threads
+        self.lock = threading.Lock()
 
     def initialize_database(self) -> None:
         """
         Initialize the SQLite database for indexing messages.
         """
-        self.sqlite_conn = sqlite3.connect(self.db_name)
+        self.sqlite_conn = sqlite3.connect(self.db_name, check_same_thread=False)
         cursor = self.sqlite_conn.cursor()
 
         # Create tables for message types and their indexed fields
@@ -156,6 +160,10 @@ class IndexHelper:
         if not self.sqlite_conn:
             return
 
+        with self.lock:
+            self._index_message(message_hash, message_str)
+
+    def _index_message(self, message_hash: str, message_str: str) -> None:
         try:
             message_data = json.loads(message_str)
 
@@ -219,6 +227,38 @@ class IndexHelper:
             if self.debug:
                 print(f"Error indexing message: {e}")
 
+    def remove_messages(self, message_hashes: List[str]) -> None:
+        """
+        Remove messages and their field values from the index.
+
+        Args:
+            message_hashes: The hashes of the messages to remove
+        """
+        if not self.sqlite_conn or not message_hashes:
+            return
+
+        with self.lock:
+            try:
+                cursor = self.sqlite_conn.cursor()
+                for message_hash in message_hashes:
+                    cursor.execute(
+                        """
+                    DELETE FROM field_values WHERE message_id IN (
+                        SELECT id FROM indexed_messages WHERE message_hash = ?
+                    )
+                    """,
+                        (message_hash,),
+                    )
+                    cursor.execute(
+                        "DELETE FROM indexed_messages WHERE message_hash = ?",
+                        (message_hash,),
+                    )
+                self.sqlite_conn.commit()
+
+            except Exception as e:
+                if self.debug:
+                    print(f"Error removing messages from index: {e}")
+
     def search_messages(
         self,
         message_type: str,
@@ -0,0 +1,541 @@
+# log_store.py
+
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+import zlib
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .store import (
+    DURABILITY_FULL,
+    DURABILITY_LEVELS,
+    DURABILITY_NORMAL,
+    DURABILITY_OFF,
+    Key,
+    MessageStore,
+)
+
+# crc32, flags, key length, value length
+RECORD = struct.Struct("<IBHI")
+PUT: int = 0
+DELETE: int = 1
+
+# magic, capacity, used slots, live keys, clean, last segment, its size
+INDEX_HEADER = struct.Struct("<8sQQQQIQ")
+INDEX_MAGIC: bytes = b"CCLOGIX1"
+# key digest, segment, offset
+SLOT = struct.Struct("<32sIQ")
+EMPTY: int = 0
+REMOVED: int = 0xFFFFFFFF
+
+SEGMENT_NAME = re.compile(r"^(\d{8})\.log$")
+HEX_HASH = re.compile(r"^[0-9a-f]{64}$")
+
+
+def key_digest(key: str) -> bytes:
+    """
+    The 32 bytes a key is indexed by: the message hash itself, or the
+    SHA-256 of other keys (PEERS, BANNED_PEERS).
+    """
+    if HEX_HASH.match(key):
+        return bytes.fromhex(key)
+    return hashlib.sha256(b"key:" + key.encode()).digest()
+
+
+class HashIndex:
+    """
+    Open-addressing (linear probing) hash table from 32-byte key digests to
+    (segment, offset), kept in a memory-mapped file. Digests are SHA-256
+    outputs, so their first 8 bytes are used as the hash directly. The
+    table doubles when it is 70% full (removed slots included).
+    """
+
+    MAX_LOAD: float = 0.7
+
+    def __init__(self, path: str, capacity: int = 1024) -> None:
+        self.path: str = path
+        exists: bool = os.path.exists(path)
+        if not exists:
+            self._create(path, capacity)
+        self.file = open(path, "r+b")
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        magic, self.capacity, self.used, self.live, clean, last_segment, last_size = (
+            INDEX_HEADER.unpack_from(self.map, 0)
+        )
+        if magic != INDEX_MAGIC:
+            raise ValueError(f"{path} is not a log store index")
+        # Where the log ended when the index was last closed cleanly
+        self.clean_end: Optional[Tuple[int, int]] = (
+            (last_segment, last_size) if exists and clean else None
+        )
+        self._write_header(False)
+
+    @staticmethod
+    def _create(path: str, capacity: int) -> None:
+        with open(path, "wb") as f:
+            f.write(INDEX_HEADER.pack(INDEX_MAGIC, capacity, 0, 0, 0, 0, 0))
+            f.truncate(INDEX_HEADER.size + capacity * SLOT.size)
+
+    def _write_header(self, clean: bool, end: Tuple[int, int] = (0, 0)) -> None:
+        INDEX_HEADER.pack_into(
+            self.map,
+            0,
+            INDEX_MAGIC,
+            self.capacity,
+            self.used,
+            self.live,
+            int(clean),
+            end[0],
+            end[1],
+        )
+
+    def _probe(self, digest: bytes) -> Iterator[int]:
+        slot: int = int.from_bytes(digest[:8], "little") % self.capacity
+        for _ in range(self.capacity):
+            yield INDEX_HEADER.size + slot * SLOT.size
+            slot = (slot + 1) % self.capacity
+
+    def get(self, digest: bytes) -> Optional[Tuple[int, int]]:
+        for position in self._probe(digest):
+            stored, segment, offset = SLOT.unpack_from(self.map, position)
+            if segment == EMPTY:
+                return None
+            if segment != REMOVED and stored == digest:
+                return segment, offset
+        return None
+
+    def put(self, digest: bytes, segment: int, offset: int) -> None:
+        free: Optional[int] = None
+        for position in self._probe(digest):
+            stored, stored_segment, _ = SLOT.unpack_from(self.map, position)
+            if stored_segment == EMPTY:
+                break
+            if stored_segment == REMOVED:
+                if free is None:
+                    free = position
+            elif stored == digest:
+                SLOT.pack_into(self.map, position, digest, segment, offset)
+                return
+        if free is None:
+            free = position
+            self.used += 1
+        SLOT.pack_into(self.map, free, digest, segment, offset)
+        self.live += 1
+        if self.used > self.capacity * self.MAX_LOAD:
+            self._grow()
+
+    def remove(self, digest: bytes) -> bool:
+        for position in self._probe(digest):
+            stored, segment, _ = SLOT.unpack_from(self.map, position)
+            if segment == EMPTY:
+                return False
+            if segment != REMOVED and stored == digest:
+                SLOT.pack_into(self.map, position, b"", REMOVED, 0)
+                self.live -= 1
+                return True
+        return False
+
+    def items(self) -> Iterator[Tuple[bytes, int, int]]:
+        for slot in range(self.capacity):
+            digest, segment, offset = SLOT.unpack_from(
+                self.map, INDEX_HEADER.size + slot * SLOT.size
+            )
+            if segment not in (EMPTY, REMOVED):
+                yield digest, segment, offset
+
+    def _grow(self) -> None:
+        entries: List[Tuple[bytes, int, int]] = list(self.items())
+        self.map.close()
+        self.file.close()
+        self._create(self.path, self.capacity * 2)
+        self.file = open(self.path, "r+b")
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        self.capacity *= 2
+        self.used = self.live = 0
+        for digest, segment, offset in entries:
+            self.put(digest, segment, offset)
+        self._write_header(False)
+
+    def close(self, end: Tuple[int, int]) -> None:
+        self._write_header(True, end)
+        self.map.flush()
+        self.map.close()
+        self.file.close()
+
+
+class LogStore(MessageStore):
+    """
+    Log-structured store in `directory`: messages are appended to numbered
+    segment files (each record is a CRC32 header, the key and the message's
+    canonical wire bytes), and a memory-mapped HashIndex maps each key to
+    the segment and offset of its latest record.
+
+    Writes are sequential appends, made with os.write so that they reach
+    the OS before returning; once the active segment reaches
+    `segment_size` bytes it is sealed and read through mmap from then on.
+    Overwritten and deleted records become garbage; every
+    `compact_interval` seconds a background thread rewrites the live
+    records of sealed segments that are at least `compact_ratio` garbage
+    to the active segment and deletes them.
+
+    durability: "full" fsyncs the active segment after every write,
+    "normal" when a segment is sealed and on close (appends survive a
+    crash of the process, not of the machine), "off" never. A torn record
+    at the end of the log is truncated when the store is opened; the index
+    is rebuilt from the segments unless it was closed cleanly.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        durability: str = DURABILITY_NORMAL,
+        segment_size: int = 64 * 1024 * 1024,
+        compact_interval: Optional[float] = 60.0,
+        compact_ratio: float = 0.5,
+    ) -> None:
+        if durability not in DURABILITY_LEVELS:
+            raise ValueError(f"Unknown durability level: {durability}")
+        os.makedirs(directory, exist_ok=True)
+        self.directory: str = directory
+        self.durability: str = durability
+        self.segment_size: int = segment_size
+        self.compact_ratio: float = compact_ratio
+        self.lock = threading.RLock()
+        self.compact_lock = threading.Lock()
+        # segment -> mmap of the sealed segments
+        self.sealed: Dict[int, mmap.mmap] = {}
+        # segment -> bytes of records that are no longer live
+        self.garbage: Dict[int, int] = {}
+        self.active: int = 0
+        self.active_fd: int = -1
+        self.active_size: int = 0
+        self.compactions: int = 0
+        self._open()
+        self.closed = threading.Event()
+        self.compactor: Optional[threading.Thread] = None
+        if compact_interval is not None:
+            self.compactor = threading.Thread(
+                target=self._compact_periodically, args=(compact_interval,), daemon=True
+            )
+            self.compactor.start()
+
+    # Opening and recovery
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"{segment:08d}.log")
+
+    def _segments(self) -> List[int]:
+        return sorted(
+            int(match.group(1))
+            for match in map(SEGMENT_NAME.match, os.listdir(self.directory))
+            if match
+        )
+
+    def _open(self) -> None:
+        segments: List[int] = self._segments() or [1]
+        self.active = segments[-1]
+        self.active_fd = os.open(
+            self._segment_path(self.active), os.O_RDWR | os.O_CREAT | os.O_APPEND
+        )
+        self.active_size = self._recover_tail()
+        for segment in segments[:-1]:
+            self._map(segment)
+
+        index_path: str = os.path.join(self.directory, "index")
+        stats_path: str = os.path.join(self.directory, "garbage.json")
+        self.index = HashIndex(index_path) if os.path.exists(index_path) else None
+        if (
+            self.index is not None
+            and self.index.clean_end == (self.active, self.active_size)
+            and os.path.exists(stats_path)
+        ):
+            with open(stats_path) as f:
+                self.garbage = {int(k): v for k, v in json.load(f).items()}
+        else:
+            if self.index is not None:
+                self.index.map.close()
+                self.index.file.close()
+                os.remove(index_path)
+            self.index = HashIndex(index_path)
+            self._rebuild_index(segments)
+        if os.path.exists(stats_path):
+            os.remove(stats_path)
+
+    def _recover_tail(self) -> int:
+        """
+        Truncate the active segment after its last complete record.
+        """
+        size: int = os.fstat(self.active_fd).st_size
+        data: bytes = os.pread(self.active_fd, size, 0)
+        end: int = 0
+        for _, _, _, record_end in self._records(data):
+            end = record_end
+        if end != size:
+            os.ftruncate(self.active_fd, end)
+        return end
+
+    def _rebuild_index(self, segments: List[int]) -> None:
+        self.garbage = {}
+        for segment in segments:
+            data = self._segment_data(segment)
+            for flags, key, offset, end in self._records(data):
+                digest: bytes = key_digest(key)
+                previous: Optional[Tuple[int, int]] = self.index.get(digest)
+                if previous is not None:
+                    self._add_garbage(*previous)
+                if flags == DELETE:
+                    self.index.remove(digest)
+                    self.garbage[segment] = self.garbage.get(segment, 0) + end - offset
+                else:
+                    self.index.put(digest, segment, offset)
+
+    @staticmethod
+    def _records(data, verify: bool = True) -> Iterator[Tuple[int, str, int, int]]:
+        """
+        (flags, key, offset, end) of the complete records in data; the value
+        is data[end - value size:end]. With verify, stops at the first
+        record whose CRC does not match.
+        """
+        offset: int = 0
+        while offset + RECORD.size <= len(data):
+            crc, flags, key_size, value_size = RECORD.unpack_from(data, offset)
+            start: int = offset + RECORD.size
+            end: int = start + key_size + value_size
+            if end > len(data):
+                return
+            if verify and zlib.crc32(data[offset + 4 : end]) != crc:
+                return
+            key: str = data[start : start + key_size].decode()
+            yield flags, key, offset, end
+            offset = end
+
+    def _map(self, segment: int) -> None:
+        with open(self._segment_path(segment), "rb") as f:
+            if os.fstat(f.fileno()).st_size:
+                self.sealed[segment] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self.sealed[segment] = b""
+
+    def _segment_data(self, segment: int):
+        if segment == self.active:
+            return os.pread(self.active_fd, self.active_size, 0)
+        return self.sealed[segment]
+
+    # Reads
+
+    def _read(self, segment: int, offset: int) -> bytes:
+        if segment == self.active:
+            header: bytes = os.pread(self.active_fd, RECORD.size, offset)
+            _, _, key_size, value_size = RECORD.unpack(header)
+            return os.pread(self.active_fd, value_size, offset + RECORD.size + key_size)
+        data = self.sealed[segment]
+        _, _, key_size, value_size = RECORD.unpack_from(data, offset)
+        start: int = offset + RECORD.size + key_size
+        return data[start : start + value_size]
+
+    def raw(self, key: Key) -> bytes:
+        """
+        The stored wire bytes of a message, without decoding them.
+        """
+        key = key.decode() if isinstance(key, bytes) else key
+        with self.lock:
+            location: Optional[Tuple[int, int]] = self.index.get(key_digest(key))
+            if location is None:
+                raise KeyError(key)
+            return self._read(*location)
+
+    def __getitem__(self, key: Key) -> str:
+        return self.raw(key).decode()
+
+    def __contains__(self, key: object) -> bool:
+        if isinstance(key, bytes):
+            key = key.decode()
+        if not isinstance(key, str):
+            return False
+        with self.lock:
+            return self.index.get(key_digest(key)) is not None
+
+    def __len__(self) -> int:
+        return self.index.live
+
+    def __iter__(self) -> Iterator[str]:
+        # Keys in the order their latest records were written
+        with self.lock:
+            keys: List[str] = []
+            for segment in sorted(self.sealed) + [self.active]:
+                for flags, key, offset, _ in self._records(
+                    self._segment_data(segment), verify=False
+                ):
+                    if flags == PUT and self.index.get(key_digest(key)) == (
+                        segment,
+                        offset,
+                    ):
+                        keys.append(key)
+        return iter(keys)
+
+    # Writes
+
+    def _append(self, flags: int, key: str, value: bytes) -> int:
+        key_bytes: bytes = key.encode()
+        body: bytes = struct.pack("<BHI", flags, len(key_bytes), len(value))
+        body += key_bytes + value
+        offset: int = self.active_size
+        os.write(self.active_fd, struct.pack("<I", zlib.crc32(body)) + body)
+        if self.durability == DURABILITY_FULL:
+            os.fsync(self.active_fd)
+        self.active_size += RECORD.size + len(key_bytes) + len(value)
+        return offset
+
+    def _add_garbage(self, segment: int, offset: int) -> None:
+        if segment == self.active:
+            header: bytes = os.pread(self.active_fd, RECORD.size, offset)
+        else:
+            header = self.sealed[segment][offset : offset + RECORD.size]
+        _, _, key_size, value_size = RECORD.unpack(header)
+        self.garbage[segment] = (
+            self.garbage.get(segment, 0) + RECORD.size + key_size + value_size
+        )
+
+    def _seal_if_full(self) -> None:
+        if self.active_size < self.segment_size:
+            return
+        if self.durability != DURABILITY_OFF:
+            os.fsync(self.active_fd)
+        os.close(self.active_fd)
+        self._map(self.active)
+        self.active += 1
+        self.active_fd = os.open(
+            self._segment_path(self.active), os.O_RDWR | os.O_CREAT | os.O_APPEND
+        )
+        self.active_size = 0
+
+    def __setitem__(self, key: Key, value: Key) -> None:
+        key = key.decode() if isinstance(key, bytes) else key
+        value = value.encode() if isinstance(value, str) else value
+        digest: bytes = key_digest(key)
+        with self.lock:
+            previous: Optional[Tuple[int, int]] = self.index.get(digest)
+            if previous is not None:
+                self._add_garbage(*previous)
+            offset: int = self._append(PUT, key, value)
+            self.index.put(digest, self.active, offset)
+            self._seal_if_full()
+
+    def __delitem__(self, key: Key) -> None:
+        key = key.decode() if isinstance(key, bytes) else key
+        digest: bytes = key_digest(key)
+        with self.lock:
+            previous: Optional[Tuple[int, int]] = self.index.get(digest)
+            if previous is None:
+                raise KeyError(key)
+            self._add_garbage(*previous)
+            self.index.remove(digest)
+            offset: int = self._append(DELETE, key, b"")
+            # The tombstone itself is garbage once older segments are gone
+            self.garbage[self.active] = (
+                self.garbage.get(self.active, 0) + self.active_size - offset
+            )
+            self._seal_if_full()
+
+    def clear(self) -> None:
+        with self.lock:
+            self._close_files()
+            for name in os.listdir(self.directory):
+                if SEGMENT_NAME.match(name) or name in ("index", "garbage.json"):
+                    os.remove(os.path.join(self.directory, name))
+            self.sealed = {}
+            self.garbage = {}
+            self._open()
+
+    # Compaction
+
+    def compact(self) -> int:
+        """
+        Rewrite the sealed segments that are at least compact_ratio garbage
+        and return how many were removed.
+        """
+        with self.compact_lock:
+            with self.lock:
+                # Oldest first, so their tombstones can be dropped
+                candidates: List[int] = sorted(
+                    segment
+                    for segment, data in self.sealed.items()
+                    if not len(data)
+                    or self.garbage.get(segment, 0) >= len(data) * self.compact_ratio
+                )
+            for segment in candidates:
+                self._compact_segment(segment)
+        return len(candidates)
+
+    def _compact_segment(self, segment: int) -> None:
+        data = self.sealed[segment]
+        for flags, key, offset, end in self._records(data):
+            with self.lock:
+                digest: bytes = key_digest(key)
+                if flags == PUT:
+                    if self.index.get(digest) == (segment, offset):
+                        value_size: int = RECORD.unpack_from(data, offset)[3]
+                        self.index.put(
+                            digest,
+                            self.active,
+                            self._append(PUT, key, data[end - value_size : end]),
+                        )
+                        self._seal_if_full()
+                elif min(self.sealed) < segment:
+                    # Older segments may still hold the deleted record
+                    if self.index.get(digest) is None:
+                        start: int = self._append(DELETE, key, b"")
+                        self.garbage[self.active] = (
+                            self.garbage.get(self.active, 0) + self.active_size - start
+                        )
+                        self._seal_if_full()
+        with self.lock:
+            mapped = self.sealed.pop(segment)
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+            self.garbage.pop(segment, None)
+            os.remove(self._segment_path(segment))
+            self.compactions += 1
+
+    def _compact_periodically(self, interval: float) -> None:
+        while not self.closed.wait(interval):
+            self.compact()
+
+    # Durability
+
+    def sync(self) -> None:
+        # "full" syncs every append, the others only on seal and close
+        pass
+
+    def flush(self) -> None:
+        with self.lock:
+            os.fsync(self.active_fd)
+            self.index.map.flush()
+
+    def _close_files(self) -> None:
+        if self.durability != DURABILITY_OFF:
+            os.fsync(self.active_fd)
+        os.close(self.active_fd)
+        self.active_fd = -1
+        for mapped in self.sealed.values():
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+        self.index.close((self.active, self.active_size))
+
+    def close(self) -> None:
+        self.closed.set()
+        if (
+            self.compactor is not None
+            and self.compactor is not threading.current_thread()
+        ):
+            self.compactor.join()
+        with self.lock:
+            if self.active_fd < 0:
+                return
+            with open(os.path.join(self.directory, "garbage.json"), "w") as f:
+                json.dump(self.garbage, f)
+            self._close_files()
@@ -0,0 +1,256 @@
+# metrics.py
+
+"""
+Prometheus metrics. A node given a MetricsRegistry registers its counters
+(datagrams and bytes in and out, duplicates, invalid messages, bans),
+gauges (peers, stored messages, queue depths) and per message type latency
+histograms (decode, validate, store, index, broadcast) in it; with
+metrics_port, start() serves them at http://127.0.0.1:metrics_port/metrics.
+Without metrics the receive path does no timing at all.
+"""
+
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from 10µs to 1s
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.00001,
+    0.000025,
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+)
+
+# Label value for events beyond a histogram's max_labels distinct values
+OTHER_LABEL: str = "other"
+
+CONTENT_TYPE: str = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Counter:
+    """
+    A monotonically increasing count. With a function, the value is read
+    from it at scrape time, so counters the code keeps anyway cost nothing
+    extra.
+    """
+
+    def __init__(
+        self, name: str, help: str, function: Optional[Callable[[], float]] = None
+    ) -> None:
+        self.name: str = name
+        self.help: str = help
+        self.function: Optional[Callable[[], float]] = function
+        self.value: float = 0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def get(self) -> float:
+        return self.function() if self.function is not None else self.value
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} counter",
+            f"{self.name} {_number(self.get())}",
+        ]
+
+
+class Gauge(Counter):
+    """
+    A value that goes up and down, either set() or read from a function at
+    scrape time.
+    """
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} gauge",
+            f"{self.name} {_number(self.get())}",
+        ]
+
+
+class Histogram:
+    """
+    Distribution of observed values (latencies in seconds) over fixed
+    buckets, kept separately per value of one label. observe() is a bisect
+    and a few additions, well under a microsecond. Only the first
+    `max_labels` label values get their own series; later ones are counted
+    under "other", so arbitrary message types cannot grow the registry
+    without bound.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        label: str = "message_type",
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        max_labels: int = 64,
+    ) -> None:
+        self.name: str = name
+        self.help: str = help
+        self.label: str = label
+        self.buckets: List[float] = sorted(buckets)
+        self.max_labels: int = max_labels
+        # label value -> [count per bucket..., count above the last, sum]
+        self.series: Dict[str, List[float]] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, label: str = "") -> None:
+        series: Optional[List[float]] = self.series.get(label)
+        if series is None:
+            series = self._new_series(label)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def count(self, label: str = "") -> int:
+        series: Optional[List[float]] = self.series.get(label)
+        return int(sum(series[:-1])) if series is not None else 0
+
+    def render(self) -> List[str]:
+        lines: List[str] = [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} histogram",
+        ]
+        for label, series in sorted(self.series.items()):
+            label = _escape(label)
+            cumulative: float = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(
+                    f'{self.name}_bucket{{{self.label}="{label}",le="{_number(bound)}"}} '
+                    f"{_number(cumulative)}"
+                )
+            cumulative += series[-2]
+            lines.append(
+                f'{self.name}_bucket{{{self.label}="{label}",le="+Inf"}} '
+                f"{_number(cumulative)}"
+            )
+            lines.append(
+                f'{self.name}_sum{{{self.label}="{label}"}} {_number(series[-1])}'
+            )
+            lines.append(
+                f'{self.name}_count{{{self.label}="{label}"}} {_number(cumulative)}'
+            )
+        return lines
+
+    def _new_series(self, label: str) -> List[float]:
+        with self.lock:
+            if label not in self.series and len(self.series) >= self.max_labels:
+                label = OTHER_LABEL
+            return self.series.setdefault(label, [0] * (len(self.buckets) + 2))
+
+
+class MetricsRegistry:
+    """
+    The metrics of one process, rendered in the Prometheus text exposition
+    format by render() and optionally served over HTTP by serve().
+
+    Instruments are plain Python objects updated without locks: under the
+    GIL an update is a handful of bytecodes, and a scrape may at worst miss
+    an update that is happening at the same moment.
+    """
+
+    def __init__(self, prefix: str = "chaincraft_") -> None:
+        self.prefix: str = prefix
+        self.metrics: Dict[str, object] = {}
+        self.server: Optional[MetricsServer] = None
+
+    def counter(
+        self, name: str, help: str, function: Optional[Callable[[], float]] = None
+    ) -> Counter:
+        return self._register(Counter(self.prefix + name, help, function))
+
+    def gauge(
+        self, name: str, help: str, function: Optional[Callable[[], float]] = None
+    ) -> Gauge:
+        return self._register(Gauge(self.prefix + name, help, function))
+
+    def histogram(self, name: str, help: str, **kwargs) -> Histogram:
+        return self._register(Histogram(self.prefix + name, help, **kwargs))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in list(self.metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def serve(self, host: str = "127.0.0.1", port: int = 9464) -> "MetricsServer":
+        """
+        Serve render() at http://host:port/metrics from a daemon thread.
+        Port 0 picks a free port (see server.port).
+        """
+        if self.server is None:
+            self.server = MetricsServer(self, host, port)
+        return self.server
+
+    def close(self) -> None:
+        if self.server is not None:
+            self.server.close()
+            self.server = None
+
+    def _register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+
+class MetricsServer:
+    """
+    A minimal HTTP server answering GET /metrics with a registry's metrics.
+    """
+
+    def __init__(self, registry: MetricsRegistry, host: str, port: int) -> None:
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body: bytes = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.host: str = host
+        self.port: int = self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def _number(value: float) -> str:
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,206 @@
+# multiprocess.py
+
+"""
+Multi-process receive path. ChaincraftNode(receive_processes=N) forks N
+workers that bind the node's UDP port with SO_REUSEPORT (Linux) and decode
+their share of the datagrams on their own cores, while the node process
+stays the single writer of the store and the index.
+"""
+
+import multiprocessing
+import queue
+import socket
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from .compression import MESSAGE_FRAMES
+from .fragmentation import FRAME_MAGIC
+from .gossip import TTL_ENVELOPE, TTL_HEADER, unwrap_ttl
+from .seen_cache import SeenCache
+from .transport import UDPTransport
+
+# Result kinds sent from the workers to the writer
+DECODED: str = "decoded"
+RAW: str = "raw"
+
+
+class ShardedReceiver:
+    """
+    Multi-process receive path for a ChaincraftNode (Linux, SO_REUSEPORT).
+
+    `processes` worker processes bind the node's UDP port next to the node's
+    own socket, and the kernel spreads incoming datagrams over the sockets
+    by source address, so all datagrams of one peer land on the same socket
+    and stay in order. Each worker runs the decode stage (hash, dedup,
+    decompress, parse, schema check) on its own core and sends the results
+    to the node process over a bounded queue.
+
+    The node process is the single writer: one thread commits the workers'
+    results (control messages, SharedObject validation, storage, indexing,
+    relaying), and no other process touches the store or the index. The
+    node's own socket keeps its share of the traffic and handles it as
+    before. SharedObject.is_valid runs in the writer for the same reason as
+    in ReceivePipeline: it validates against state built by earlier messages.
+
+    Workers only dedup against a local seen cache; the writer checks the
+    store again before committing. Each worker applies the node's packet
+    filter with its own rate limit buckets and the bans made before the
+    fork; the writer drops results from peers banned since. Frames that
+    need node state (fragments, NACKs, dictionary-compressed messages) are
+    forwarded undecoded.
+
+    Workers are forked from the node, so start() must be called before the
+    node starts its threads.
+    """
+
+    POLL_INTERVAL: float = 0.2  # seconds between stop checks in workers
+
+    def __init__(self, node: Any, processes: int = 2, queue_size: int = 1024) -> None:
+        self.node = node
+        self.processes: int = processes
+        self.queue_size: int = queue_size
+        self.context = multiprocessing.get_context("fork")
+        self.results = self.context.Queue(maxsize=queue_size)
+        self.stop_event = self.context.Event()
+        # Results dropped by the workers because the queue was full
+        self.dropped = self.context.Value("i", 0)
+        self.workers: List[multiprocessing.process.BaseProcess] = []
+        self.writer: Optional[threading.Thread] = None
+        self.is_running: bool = False
+
+        self.committed: int = 0
+        self.forwarded_raw: int = 0
+
+    def start(self) -> None:
+        """
+        Fork the worker processes and start the writer thread.
+        """
+        if self.is_running:
+            return
+        self.is_running = True
+        for _ in range(self.processes):
+            worker = self.context.Process(
+                target=_run_worker,
+                args=(self.node, self.results, self.stop_event, self.dropped),
+                daemon=True,
+            )
+            worker.start()
+            self.workers.append(worker)
+        self.writer = threading.Thread(target=self._write, daemon=True)
+        self.writer.start()
+
+    def stop(self) -> None:
+        """
+        Stop the workers and the writer. Queued results are discarded.
+        """
+        if not self.is_running:
+            return
+        self.is_running = False
+        self.stop_event.set()
+        for worker in self.workers:
+            worker.join(timeout=2 * self.POLL_INTERVAL + 1)
+            if worker.is_alive():
+                worker.terminate()
+                worker.join()
+        self.workers = []
+        if self.writer is not None:
+            self.writer.join(timeout=1)
+        self.results.close()
+        self.results.cancel_join_thread()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return worker and writer counters.
+        """
+        return {
+            "processes": self.processes,
+            "alive": sum(worker.is_alive() for worker in self.workers),
+            "committed": self.committed,
+            "forwarded_raw": self.forwarded_raw,
+            "dropped": self.dropped.value,
+        }
+
+    def _write(self) -> None:
+        while self.is_running:
+            try:
+                item: Tuple[Any, ...] = self.results.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError, ValueError):
+                break
+            try:
+                if item[0] == RAW:
+                    self.forwarded_raw += 1
+                    self.node._process_datagram(item[1], item[2])
+                    continue
+                _, decoded, ttl, addr = item
+                # Workers only know the bans made before they were forked
+                if self.node.packet_filter.is_banned(addr, self.node.clock()):
+                    continue
+                if ttl is not None:
+                    self.node._remember_hash_ttl(decoded[3], ttl)
+                self.node._commit_message(*decoded, addr)
+                self.committed += 1
+            except Exception as e:
+                print(f"❌ Error committing message: {str(e)}")
+
+
+def _run_worker(node: Any, results: Any, stop_event: Any, dropped: Any) -> None:
+    """
+    Worker process main loop. `node` is the forked copy of the node; only
+    its configuration and decode methods are used, never its store.
+    """
+    transport = UDPTransport()
+    transport.join(node.host, node.port)
+    transport.socket.settimeout(ShardedReceiver.POLL_INTERVAL)
+    seen_cache = SeenCache()
+
+    def seen(message_hash: str) -> bool:
+        return seen_cache.seen(message_hash, lambda _: False)
+
+    try:
+        while not stop_event.is_set():
+            try:
+                data, addr = transport.recvfrom(node.RECV_BUFFER_SIZE)
+            except socket.timeout:
+                continue
+            if not node.packet_filter.allow(addr, node.clock()):
+                continue
+            item: Optional[Tuple[Any, ...]] = _decode(node, data, addr, seen)
+            if item is None:
+                continue
+            try:
+                results.put_nowait(item)
+            except queue.Full:
+                with dropped.get_lock():
+                    dropped.value += 1
+            else:
+                # Only once queued, so a retransmission of a dropped message
+                # is not discarded as a duplicate
+                if item[0] == DECODED and item[1][0] is not None:
+                    seen_cache.add(item[1][3])
+    except OSError:
+        pass
+    finally:
+        transport.close()
+        # Do not block exit on results the writer will no longer read
+        results.cancel_join_thread()
+
+
+def _decode(
+    node: Any, data: bytes, addr: Tuple[str, int], seen: Any
+) -> Optional[Tuple[Any, ...]]:
+    """
+    Decode one datagram in a worker. Returns the item to send to the writer,
+    or None for a duplicate.
+    """
+    payload: bytes = data
+    ttl: Optional[int] = None
+    if payload[:2] == TTL_ENVELOPE and len(payload) >= TTL_HEADER.size:
+        ttl, payload = unwrap_ttl(payload)
+    if payload[:1] == bytes([FRAME_MAGIC]) and payload[:2] not in MESSAGE_FRAMES:
+        return RAW, data, addr
+    decoded = node._decode_datagram(payload, seen=seen)
+    if decoded is None:
+        return None
+    return DECODED, decoded, ttl, addr
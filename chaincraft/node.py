@@ -1,5 +1,6 @@
 # chaincraft.py
 
+import base64
 import json
 import random
 import socket
@@ -8,12 +9,87 @@ import time
 import zlib
 import hashlib
 import dbm.ndbm
+import bisect
+import multiprocessing
 import os
-from typing import List, Tuple, Dict, Union, Optional, Any, Set
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Tuple, Dict, Union, Optional, Any, Set
 
-from .shared_object import SharedObject, SharedObjectException
+from .shared_object import SharedObject, SharedObjectException, run_stateless_checks
 from .shared_message import SharedMessage
 from .index_helper import IndexHelper
+from .pipeline import ReceivePipeline
+from .multiprocess import ShardedReceiver
+from .seen_cache import SeenCache
+from .compression import (
+    COMPRESSED,
+    DEFLATED,
+    DEFLATED_HEADER,
+    MESSAGE_FRAMES,
+    ZLIB_HEADER,
+    DictionaryCompressor,
+    decode_deflated_frame,
+    dictionary_id,
+    encode_deflated_frame,
+    inflate,
+)
+from .handshake import (
+    COMPRESSIONS,
+    FEATURE_ANTI_ENTROPY,
+    FEATURE_SKETCH,
+    PROTOCOL_VERSION,
+    Capabilities,
+)
+from .gossip import (
+    TTL_ENVELOPE,
+    TTL_HEADER,
+    FloodStrategy,
+    GossipStrategy,
+    unwrap_ttl,
+    wrap_ttl,
+)
+from .anti_entropy import PrefixMerkleTree
+from .iblt import CELL, IBLT, SetReconciler
+from .sync_manager import SyncManager
+from .retention import RetentionPolicy, message_type_of
+from .packet_filter import OVERSIZED, PacketFilter
+from .metrics import Histogram, MetricsRegistry
+from .store import DictStore, MessageStore
+from .wire_cache import WireCache
+from .tracing import (
+    ACCEPT,
+    ADD_MESSAGE,
+    DECOMPRESS,
+    DEDUP,
+    INDEX,
+    RECEIVE,
+    STORE_AND_BROADCAST,
+    VALIDATE,
+    Tracer,
+)
+from .buffer_ring import BufferRing
+from .codec import (
+    BINARY,
+    BINARY_HEADER,
+    CODECS,
+    Codec,
+    JSONCodec,
+    decode_binary_frame,
+    encode_binary_frame,
+    get_codec,
+)
+from .transport import Transport, UDPTransport
+from .fragmentation import (
+    FRAGMENT,
+    FRAGMENT_NACK,
+    FRAME_MAGIC,
+    NACK_HEADER,
+    FragmentCache,
+    ReassemblyBuffer,
+    decode_nack,
+    encode_nack,
+)
 
 
 class ChaincraftNode:
@@ -21,6 +97,21 @@ class ChaincraftNode:
     BANNED_PEERS: str = "BANNED_PEERS"
     INDEXED_FIELDS: str = "INDEXED_FIELDS"
 
+    GOSSIP_FULL: str = "full"
+    GOSSIP_INVENTORY: str = "inventory"
+    INVENTORY_BATCH_SIZE: int = 16  # 64-char hashes per INVENTORY datagram
+    INVENTORY_REQUEST_TIMEOUT: float = 2.0  # seconds before re-requesting
+    INVENTORY_MAX_ATTEMPTS: int = 3
+    RECV_BUFFER_SIZE: int = 65535
+    RECV_RING_SLOTS: int = 8
+    DICTIONARY_OFFER_INTERVAL: float = 2.0
+    DICTIONARY_OFFER_ATTEMPTS: int = 3
+    ENCODED_CACHE_SIZE: int = 1024
+    WIRE_CACHE_BYTES: int = 64 * 1024 * 1024
+    ANTI_ENTROPY_INTERVAL: float = 1.0
+    ANTI_ENTROPY_BATCH_SIZE: int = 256
+    SKETCH_INTERVAL: float = 1.0
+
     def __init__(
         self,
         max_peers: int = 5,
@@ -33,14 +124,125 @@ class ChaincraftNode:
         shared_objects: Optional[List[SharedObject]] = None,
         port: Optional[int] = None,
         use_compression: bool = False,
+        gossip_mode: str = "full",
+        validation_workers: int = 0,
+        receive_queue_size: int = 1024,
+        max_datagram_size: int = 1400,
+        transport: Optional[Transport] = None,
+        sync_transport: Optional[Transport] = None,
+        seen_cache: Optional[SeenCache] = None,
+        dictionary_compression: Optional[DictionaryCompressor] = None,
+        codec: str = "json",
+        gossip_strategy: Optional[GossipStrategy] = None,
+        anti_entropy: Optional[PrefixMerkleTree] = None,
+        set_reconciliation: Optional[SetReconciler] = None,
+        sync_manager: Optional[SyncManager] = None,
+        receive_processes: int = 0,
+        precheck_processes: int = 0,
+        clock: Optional[Callable[[], float]] = None,
+        retention: Optional[RetentionPolicy] = None,
+        packet_filter: Optional[PacketFilter] = None,
+        metrics: Optional[MetricsRegistry] = None,
+        metrics_port: Optional[int] = None,
+        tracer: Optional[Tracer] = None,
+        store: Optional[MessageStore] = None,
     ) -> None:
         """
-        Initialize the ChaincraftNode with optional parameters.
-        """
+        Initialize the ChaincraftNode with optional parameters. Features are
+        off unless enabled; each is described in its module's docstring.
+
+        Args:
+            max_peers: peers kept before new ones replace old ones
+            reset_db: clear the store (and index) on start
+            persistent: keep messages, peers and bans in a dbm database
+            indexed: index persistent messages by type and field
+            use_fixed_address: bind localhost:21000 and never retry elsewhere
+            debug: print debug output
+            local_discovery: answer REQUEST_LOCAL_PEERS with our peers
+            shared_objects: SharedObjects that validate and integrate messages
+            port: port to bind (random if None)
+            use_compression: send zlib DEFLATED frames where they are smaller
+            gossip_mode: "full" rebroadcasts the store, "inventory" announces
+                hashes and peers fetch only what they are missing
+            validation_workers: decode worker threads, 0 decodes inline
+            receive_queue_size: datagrams queued for the receive workers
+            max_datagram_size: larger messages are sent as fragments
+            transport: Transport for all traffic (UDPTransport by default)
+            sync_transport: Transport for merkelized catch-up, e.g. TCP
+            seen_cache: SeenCache answering duplicate checks
+            dictionary_compression: DictionaryCompressor, replaces
+                use_compression
+            codec: wire encoding towards peers that support it, "json" or
+                "binary"
+            gossip_strategy: GossipStrategy (flood to all peers by default)
+            anti_entropy: PrefixMerkleTree for Merkle-range reconciliation
+            set_reconciliation: SetReconciler for IBLT sketch rounds
+            sync_manager: SyncManager driving merkelized catch-up
+            receive_processes: forked SO_REUSEPORT receive workers
+            precheck_processes: process pool size for stateless checks, used
+                with validation_workers (the checks run inline otherwise)
+            clock: time source of protocol timers (time.time by default)
+            retention: RetentionPolicy; without one nothing is deleted
+            packet_filter: PacketFilter applied to every datagram
+            metrics: MetricsRegistry to register the node's metrics in
+            metrics_port: port start() serves the metrics on over HTTP
+            tracer: Tracer timing the receive stages of sampled messages
+            store: MessageStore to use instead of the one persistent picks
+        """
+        if gossip_mode not in (self.GOSSIP_FULL, self.GOSSIP_INVENTORY):
+            raise ValueError(f"Unknown gossip mode: {gossip_mode}")
+        if use_compression and dictionary_compression is not None:
+            raise ValueError(
+                "use_compression and dictionary_compression are mutually exclusive"
+            )
+        if receive_processes > 0:
+            if not hasattr(socket, "SO_REUSEPORT"):
+                raise ValueError("receive_processes requires SO_REUSEPORT")
+            if transport is None:
+                transport = UDPTransport(reuse_port=True)
+            elif not getattr(transport, "reuse_port", False):
+                raise ValueError(
+                    "receive_processes requires a UDPTransport with reuse_port"
+                )
+
         self.max_peers: int = max_peers
         self.use_fixed_address: bool = use_fixed_address
         self.indexed: bool = indexed
         self.use_compression: bool = use_compression
+        self.gossip_mode: str = gossip_mode
+        self.validation_workers: int = validation_workers
+        self.receive_queue_size: int = receive_queue_size
+        self.receive_pipeline: Optional[ReceivePipeline] = None
+        self.receive_processes: int = receive_processes
+        self.sharded_receiver: Optional[ShardedReceiver] = None
+        self.precheck_processes: int = precheck_processes
+        self.precheck_pool: Optional[ProcessPoolExecutor] = None
+        self.clock: Callable[[], float] = clock or time.time
+        self.retention: Optional[RetentionPolicy] = retention
+        self.last_compaction: float = 0.0
+        self.max_datagram_size: int = max_datagram_size
+        self.reassembly_buffer: ReassemblyBuffer = ReassemblyBuffer()
+        self.compressor: Optional[DictionaryCompressor] = dictionary_compression
+        self.codec: Codec = get_codec(codec)
+        # What each peer announced in its handshake, and the peers we sent ours
+        self.peer_capabilities: Dict[Tuple[str, int], Capabilities] = {}
+        self.handshakes_sent: Set[Tuple[str, int]] = set()
+        # (encoding, message) -> encoded message
+        self.encoded_cache: "OrderedDict[Tuple[str, bytes], bytes]" = OrderedDict()
+        self.encoded_cache_lock = threading.Lock()
+        # message hash -> canonical and encoded bytes of stored messages
+        self.wire_cache: WireCache = WireCache(self.WIRE_CACHE_BYTES)
+        self.gossip_strategy: GossipStrategy = gossip_strategy or FloodStrategy()
+        # Hop limits that arrived with messages, until they are relayed
+        self.relay_ttls: "OrderedDict[str, int]" = OrderedDict()
+        self.anti_entropy: Optional[PrefixMerkleTree] = anti_entropy
+        self.last_anti_entropy: float = 0.0
+        self.reconciler: Optional[SetReconciler] = set_reconciliation
+        self.last_sketch: float = 0.0
+        self.sync_manager: SyncManager = sync_manager or SyncManager()
+        # (dictionary id, attempts, last attempt) of dictionary offers per peer
+        self.dictionary_offers: Dict[Tuple[str, int], Tuple[bytes, int, float]] = {}
+        self.fragment_cache: FragmentCache = FragmentCache()
 
         if port is not None:
             self.host: str = "127.0.0.1"
@@ -53,11 +255,15 @@ class ChaincraftNode:
             self.port: int = random.randint(5000, 9000)
 
         self.db_name: str = f"node_{self.port}.db"
-        self.persistent: bool = persistent
-
-        # Initialize storage (in-memory or dbm)
-        if not persistent:
-            self.db: Dict[str, str] = {}
+        self.persistent: bool = persistent if store is None else store.persistent
+
+        # Initialize storage (given store, in-memory or dbm)
+        if store is not None:
+            if reset_db:
+                store.clear()
+            self.db: MessageStore = store
+        elif not persistent:
+            self.db: Dict[str, str] = DictStore()
         else:
             if reset_db and os.path.exists(self.db_name):
                 os.remove(self.db_name)
@@ -74,7 +280,15 @@ class ChaincraftNode:
         # Load peers/banned from DB
         self.peers: List[Tuple[str, int]] = self.load_peers()
         self.banned_peers: Dict[Tuple[str, int], float] = self.load_banned_peers()
-
+        self.packet_filter: PacketFilter = packet_filter or PacketFilter()
+        self.metrics: Optional[MetricsRegistry] = metrics
+        self.metrics_port: Optional[int] = metrics_port
+        self.tracer: Optional[Tracer] = tracer
+        for peer, expiration in self.banned_peers.items():
+            self.packet_filter.ban(peer, expiration)
+
+        self.transport: Transport = transport or UDPTransport()
+        self.sync_transport: Optional[Transport] = sync_transport
         self.socket: Optional[socket.socket] = None
         self.is_running: bool = False
         self.gossip_interval: float = 0.5  # seconds
@@ -91,6 +305,141 @@ class ChaincraftNode:
         if self.index_helper:
             self.indexed_fields = self.index_helper.indexed_fields
 
+        # Wire counters (every outgoing datagram goes through _sendto)
+        self.bytes_sent: int = 0
+        self.datagrams_sent: int = 0
+        # Receive counters, including duplicates dropped before any copy
+        self.datagrams_received: int = 0
+        self.bytes_received: int = 0
+        self.early_duplicates: int = 0
+        self.duplicates: int = 0
+        self.invalid_messages: int = 0
+        self.bans: int = 0
+
+        # Inventory gossip state: hashes in store order, how far each peer has
+        # been announced, which hashes each peer is known to hold, and the
+        # payloads we requested but have not received yet. The store lock
+        # keeps the log in step with the store while messages are removed.
+        self.store_lock = threading.Lock()
+        self.inventory_log: List[str] = self._load_inventory_log()
+        self.inventory_cursors: Dict[Tuple[str, int], int] = {}
+        self.known_by_peer: Dict[Tuple[str, int], Set[str]] = {}
+        self.pending_requests: Dict[str, Tuple[float, Tuple[str, int], int]] = {}
+
+        self.seen_cache: SeenCache = seen_cache or SeenCache()
+        for message_hash in self.inventory_log:
+            self.seen_cache.add(message_hash)
+        if self.anti_entropy is not None:
+            self.anti_entropy.update(self.inventory_log)
+        if self.retention is not None:
+            # Ages of messages from a previous run start now
+            now: float = self.clock()
+            for message_hash in self.inventory_log:
+                self._record_retention(
+                    message_hash, self._load_db_value(message_hash), now
+                )
+        if self.metrics is not None:
+            self._register_metrics(self.metrics)
+
+    def _register_metrics(self, registry: MetricsRegistry) -> None:
+        """
+        Register the node's instruments. Counters the node keeps anyway and
+        all gauges are read at scrape time and cost nothing per event.
+        """
+        registry.counter(
+            "datagrams_received_total",
+            "Datagrams received",
+            lambda: self.datagrams_received,
+        )
+        registry.counter(
+            "datagrams_sent_total", "Datagrams sent", lambda: self.datagrams_sent
+        )
+        registry.counter(
+            "bytes_received_total", "Bytes received", lambda: self.bytes_received
+        )
+        registry.counter("bytes_sent_total", "Bytes sent", lambda: self.bytes_sent)
+        registry.counter(
+            "duplicates_total",
+            "Messages received that were already seen",
+            lambda: self.early_duplicates
+            + self.duplicates
+            + (self.receive_pipeline.duplicates if self.receive_pipeline else 0),
+        )
+        registry.counter(
+            "datagrams_filtered_total",
+            "Datagrams dropped by the packet filter",
+            lambda: sum(self.packet_filter.drops.values()),
+        )
+        registry.counter(
+            "invalid_messages_total",
+            "Invalid messages received",
+            lambda: self.invalid_messages,
+        )
+        registry.counter("bans_total", "Peers banned", lambda: self.bans)
+        registry.counter(
+            "wire_cache_hits_total",
+            "Messages sent from cached wire bytes",
+            lambda: self.wire_cache.hits,
+        )
+        registry.counter(
+            "wire_cache_misses_total",
+            "Messages read from the store or encoded to be sent",
+            lambda: self.wire_cache.misses,
+        )
+
+        registry.gauge("peers", "Connected peers", lambda: len(self.peers))
+        registry.gauge(
+            "banned_peers", "Currently banned peers", lambda: len(self.banned_peers)
+        )
+        registry.gauge(
+            "stored_messages", "Messages in the store", lambda: len(self.inventory_log)
+        )
+        registry.gauge(
+            "wire_cache_bytes",
+            "Bytes of cached wire encodings",
+            lambda: self.wire_cache.size,
+        )
+        registry.gauge(
+            "pending_requests",
+            "Requested messages not received yet",
+            lambda: len(self.pending_requests),
+        )
+        registry.gauge(
+            "reassembly_bytes",
+            "Bytes of partially received fragmented messages",
+            lambda: self.reassembly_buffer.buffered_bytes,
+        )
+        registry.gauge(
+            "receive_queue_depth",
+            "Datagrams waiting for a validation worker",
+            lambda: (
+                self.receive_pipeline.inbound.qsize() if self.receive_pipeline else 0
+            ),
+        )
+        registry.gauge(
+            "commit_backlog",
+            "Decoded messages waiting to be committed",
+            lambda: (
+                len(self.receive_pipeline._decoded) if self.receive_pipeline else 0
+            ),
+        )
+
+        self.decode_latency: Histogram = registry.histogram(
+            "decode_seconds", "Time to hash, decompress and parse a message"
+        )
+        self.validate_latency: Histogram = registry.histogram(
+            "validate_seconds", "Time to validate a message with the SharedObjects"
+        )
+        self.store_latency: Histogram = registry.histogram(
+            "store_seconds", "Time to write a message to the store"
+        )
+        self.index_latency: Histogram = registry.histogram(
+            "index_seconds", "Time to index a message"
+        )
+        self.broadcast_latency: Histogram = registry.histogram(
+            "broadcast_seconds", "Time to relay a message to peers"
+        )
+
     def set_indexed_fields(self, message_type: str, fields: List[str]) -> None:
         """
         Set which fields should be indexed for a specific message type.
@@ -138,7 +487,7 @@ class ChaincraftNode:
         Load the peer list from the database if persistent, otherwise return an empty list.
         """
         if self.persistent and self.PEERS.encode() in self.db:
-            return json.loads(self.db[self.PEERS.encode()].decode())
+            return json.loads(self._load_db_value(self.PEERS.encode()))
         else:
             return []
 
@@ -148,15 +497,27 @@ class ChaincraftNode:
         """
         if self.persistent and self.BANNED_PEERS.encode() in self.db:
             banned_peers_data: Dict[str, float] = json.loads(
-                self.db[self.BANNED_PEERS.encode()].decode()
+                self._load_db_value(self.BANNED_PEERS.encode())
             )
-            return {
-                tuple(peer_str.split(",")): expiration
-                for peer_str, expiration in banned_peers_data.items()
-            }
+            banned_peers: Dict[Tuple[str, int], float] = {}
+            for peer_str, expiration in banned_peers_data.items():
+                host, port = peer_str.rsplit(",", 1)
+                banned_peers[(host, int(port))] = expiration
+            return banned_peers
         else:
             return {}
 
+    def _load_inventory_log(self) -> List[str]:
+        """
+        Collect the hashes of messages already in the store (persistent restarts).
+        """
+        log: List[str] = []
+        for key in self.db.keys():
+            if self._is_reserved_key(key):
+                continue
+            log.append(key.decode() if isinstance(key, bytes) else key)
+        return log
+
     def add_shared_object(self, shared_object: SharedObject) -> None:
         """
         Add a SharedObject for the node to validate/integrate messages.
@@ -173,19 +534,53 @@ class ChaincraftNode:
         self._bind_socket()
         self.is_running = True
 
+        # Workers are forked, so before any of our threads exist
+        if self.receive_processes > 0:
+            self.sharded_receiver = ShardedReceiver(
+                self, self.receive_processes, self.receive_queue_size
+            )
+            self.sharded_receiver.start()
+        if self.precheck_processes > 0 and self.validation_workers > 0:
+            # Spawned on first use, when our threads are already running. Only
+            # the receive pipeline keeps several prechecks in flight; without
+            # it each one would block the receive thread, so they run inline
+            self.precheck_pool = ProcessPoolExecutor(
+                self.precheck_processes, multiprocessing.get_context("spawn")
+            )
+
+        if self.validation_workers > 0:
+            self.receive_pipeline = ReceivePipeline(
+                self, self.validation_workers, self.receive_queue_size
+            )
+            self.receive_pipeline.start()
+
         threading.Thread(target=self.listen_for_messages, daemon=True).start()
+        if self.sync_transport is not None:
+            threading.Thread(
+                target=self.listen_for_messages,
+                args=(self.sync_transport,),
+                daemon=True,
+            ).start()
         threading.Thread(target=self.gossip, daemon=True).start()
         threading.Thread(target=self.check_for_merkelized_objects, daemon=True).start()
+        if self.metrics is not None and self.metrics_port is not None:
+            self.metrics.serve(self.host, self.metrics_port)
 
     def _bind_socket(self) -> None:
         """
-        Attempt to bind a UDP socket to the specified host/port (retry if needed).
+        Attempt to bind the transports to the specified host/port (retry if needed).
         """
         max_retries: int = 10
         for _ in range(max_retries):
             try:
-                self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-                self.socket.bind((self.host, self.port))
+                self.transport.bind(self.host, self.port)
+                if self.sync_transport is not None:
+                    try:
+                        self.sync_transport.bind(self.host, self.port)
+                    except OSError:
+                        self.transport.close()
+                        raise
+                self.socket = getattr(self.transport, "socket", None)
                 print(f"Node started on {self.host}:{self.port}")
                 return
             except OSError:
@@ -200,53 +595,503 @@ class ChaincraftNode:
         Cleanly stop the node and close database/socket resources.
         """
         self.is_running = False
-        if self.socket:
-            self.socket.close()
+        self._stop_workers()
+        self.transport.close()
+        if self.sync_transport is not None:
+            self.sync_transport.close()
         if self.persistent:
             self.db.close()
         if self.index_helper:
             self.index_helper.close()
 
-    def listen_for_messages(self) -> None:
+    def _stop_workers(self) -> None:
+        """
+        Stop the receive workers, the precheck pool and the metrics server.
+        """
+        if self.receive_pipeline is not None:
+            self.receive_pipeline.stop()
+        if self.sharded_receiver is not None:
+            self.sharded_receiver.stop()
+        if self.precheck_pool is not None:
+            self.precheck_pool.shutdown(wait=False)
+        if self.metrics is not None:
+            self.metrics.close()
+
+    def listen_for_messages(self, transport: Optional[Transport] = None) -> None:
         """
         Listen for incoming datagrams, decompress them, and handle new messages.
         """
+        transport = transport or self.transport
+        if transport.supports_recv_into:
+            self._listen_into_ring(transport)
+            return
         while self.is_running:
             try:
                 compressed_data: bytes
                 addr: Tuple[str, int]
-                compressed_data, addr = self.socket.recvfrom(1500)
-                message_hash: str = self.hash_message(compressed_data)
-                # Only handle if we've never seen this message
-                if message_hash not in self.db:
-                    message: str = self.decompress_message(compressed_data)
-                    self.handle_message(message, message_hash, addr)
+                compressed_data, addr = transport.recvfrom(self.RECV_BUFFER_SIZE)
+                self._receive_datagram(compressed_data, addr)
+            except OSError:
+                if not self.is_running:
+                    break
+                else:
+                    raise
+
+    def _receive_datagram(self, data: bytes, addr: Tuple[str, int]) -> None:
+        """
+        Count a received datagram and process it if the packet filter allows it.
+        """
+        self.datagrams_received += 1
+        self.bytes_received += len(data)
+        if self.packet_filter.allow(addr, self.clock()):
+            self._process_datagram(data, addr)
+
+    def _listen_into_ring(self, transport: Transport) -> None:
+        """
+        Receive loop for transports that can read into caller buffers:
+        datagrams land in a ring of preallocated buffers and are only copied
+        out once they pass the duplicate check.
+        """
+        ring: BufferRing = BufferRing(self.RECV_RING_SLOTS, self.RECV_BUFFER_SIZE)
+        while self.is_running:
+            try:
+                view: memoryview = ring.next()
+                nbytes: int
+                addr: Tuple[str, int]
+                nbytes, addr = transport.recvfrom_into(view)
+                self._receive_view(view[:nbytes], addr)
             except OSError:
                 if not self.is_running:
                     break
                 else:
                     raise
 
+    def _receive_view(self, view: memoryview, addr: Tuple[str, int]) -> None:
+        """
+        Drop a datagram that is still in a receive buffer if its message was
+        already seen, hashing the buffer in place; otherwise copy it out and
+        process it.
+        """
+        self.datagrams_received += 1
+        self.bytes_received += len(view)
+        if not self.packet_filter.allow(addr, self.clock()):
+            return
+        message_hash: Optional[str] = self._peek_hash(view)
+        if message_hash is not None and self.has_seen(message_hash):
+            self.early_duplicates += 1
+            return
+        self._process_datagram(bytes(view), addr, message_hash)
+
+    def _peek_hash(self, view: memoryview) -> Optional[str]:
+        """
+        Message hash of a received datagram without copying it, or None if
+        it can only be known after decoding (fragments, dictionary-compressed
+        frames, zlib streams from nodes without DEFLATED frames).
+        """
+        if view[:2] == TTL_ENVELOPE:
+            view = view[TTL_HEADER.size :]
+        if view[:1] == ZLIB_HEADER:
+            return None
+        if view[:1] != bytes([FRAME_MAGIC]):
+            return self.hash_message(view)
+        if view[:2] == BINARY and len(view) >= BINARY_HEADER.size:
+            return view[2 : BINARY_HEADER.size].hex()
+        if view[:2] == DEFLATED and len(view) >= DEFLATED_HEADER.size:
+            return view[2 : DEFLATED_HEADER.size].hex()
+        return None
+
+    def _process_datagram(
+        self,
+        compressed_data: bytes,
+        addr: Tuple[str, int],
+        message_hash: Optional[str] = None,
+    ) -> None:
+        """
+        Run a received datagram through the decode and commit stages inline,
+        or hand it to the receive pipeline if validation workers are enabled.
+        message_hash is the hash _peek_hash already computed, if any.
+        """
+        # A reassembled message may itself be a frame (e.g. compressed).
+        # BINARY and DEFLATED frames are messages and go through the decode
+        # stage.
+        ttl: Optional[int] = None
+        while (
+            compressed_data[:1] == bytes([FRAME_MAGIC])
+            and compressed_data[:2] not in MESSAGE_FRAMES
+        ):
+            if compressed_data[:2] == TTL_ENVELOPE:
+                try:
+                    ttl, compressed_data = unwrap_ttl(compressed_data)
+                except ValueError:
+                    self.handle_invalid_message(addr)
+                    return
+                continue
+            compressed_data = self._handle_frame(compressed_data, addr)
+            if compressed_data is None:
+                return
+        if ttl is not None:
+            self._remember_ttl(compressed_data, ttl)
+
+        if self.receive_pipeline is not None:
+            self.receive_pipeline.submit(compressed_data, addr)
+            return
+
+        start: float = time.perf_counter() if self.tracer is not None else 0.0
+        decoded = self._decode_datagram(compressed_data, message_hash, addr=addr)
+        if decoded is None:
+            self.duplicates += 1
+            return
+        self._commit_message(*decoded, addr)
+        if self.tracer is not None and self.tracer.sampled(decoded[3]):
+            data: Any = decoded[0].data if decoded[0] is not None else None
+            self._trace(RECEIVE, start, decoded[3], data, addr)
+
     def gossip(self) -> None:
         """
-        Periodically broadcast all known messages to all peers.
+        Periodically run a gossip round according to the node's gossip_mode.
         """
         while self.is_running:
             try:
-                if self.db:
-                    keys_to_share: List[bytes] = [
-                        key
-                        for key in self.db.keys()
-                        if key != self.PEERS.encode()
-                        and key != self.BANNED_PEERS.encode()
-                    ]
-                    for key in keys_to_share:
-                        object_to_share: str = self._load_db_value(key)
-                        self.broadcast(object_to_share)
+                self.gossip_round()
                 time.sleep(self.gossip_interval)
             except Exception as e:
                 print(f"Error in gossip: {e}")
 
+    def gossip_round(self) -> None:
+        """
+        Run a single gossip round.
+        """
+        self._request_missing_fragments()
+        if self.retention is not None:
+            self._compact_round()
+        if self.compressor is not None:
+            self._negotiate_compression()
+        if self.gossip_strategy.pull_fanout:
+            self._pull_round()
+        if self.gossip_mode == self.GOSSIP_INVENTORY:
+            self._gossip_inventory()
+        elif self.gossip_strategy.periodic_rebroadcast:
+            self._gossip_full()
+        if self.anti_entropy is not None:
+            self._anti_entropy_round()
+        if self.reconciler is not None:
+            self._sketch_round()
+        self._retry_pending_requests()
+
+    def _pull_round(self) -> None:
+        """
+        Push-pull exchange: send our most recent hashes to random peers, which
+        answer with an inventory of the recent messages we are missing.
+        """
+        window: int = self.gossip_strategy.pull_window
+        pull_message = json.dumps({SharedMessage.PULL: self.inventory_log[-window:]})
+        for peer in self.gossip_strategy.pull_targets(self.peers):
+            try:
+                self._sendto(self.compress_message(pull_message), peer)
+            except OSError as e:
+                if self.debug:
+                    print(f"Node {self.port}: Failed to send pull to {peer}: {e}")
+
+    def _handle_pull(self, hashes: List[str], addr: Tuple[str, int]) -> None:
+        """
+        Answer a pull request with the recent hashes the peer did not list,
+        looking back as far as the peer's list reaches.
+        """
+        peer: Tuple[str, int] = (addr[0], addr[1])
+        if peer not in self.peers:
+            return
+        theirs: Set[str] = {h for h in hashes if isinstance(h, str)}
+        window: int = max(self.gossip_strategy.pull_window, len(theirs))
+        missing: List[str] = [
+            h for h in self.inventory_log[-window:] if h not in theirs
+        ]
+        self._send_inventory(missing, peer)
+
+    def _anti_entropy_round(self) -> None:
+        """
+        Start a reconciliation with a random peer by sending our root summary.
+        """
+        now: float = self.clock()
+        if not self.peers or now - self.last_anti_entropy < self.ANTI_ENTROPY_INTERVAL:
+            return
+        self.last_anti_entropy = now
+        peers: List[Tuple[str, int]] = self._peers_with(FEATURE_ANTI_ENTROPY)
+        if not peers:
+            return
+        peer: Tuple[str, int] = random.choice(peers)
+        self._send_sync_tree({"": self.anti_entropy.summary()}, peer)
+
+    def _handle_sync(self, data: Dict[str, Any], addr: Tuple[str, int]) -> None:
+        """
+        Handle an anti-entropy message: descend into the subtrees whose
+        summaries differ from ours, and for buckets fetch the messages we are
+        missing and send the ones the peer is missing. Only peers are
+        answered, and at most ANTI_ENTROPY_BATCH_SIZE messages are pushed
+        per round; the rest still differ and are pushed in later rounds.
+        """
+        if self.anti_entropy is None:
+            return
+        peer: Tuple[str, int] = (addr[0], addr[1])
+        if peer not in self.peers:
+            return
+
+        buckets = data.get(SharedMessage.SYNC_BUCKETS)
+        if isinstance(buckets, dict):
+            budget: int = self.ANTI_ENTROPY_BATCH_SIZE
+            for prefix, hashes in buckets.items():
+                if not isinstance(hashes, list):
+                    continue
+                missing, extra = self.anti_entropy.compare_bucket(prefix, hashes)
+                extra = extra[:budget]
+                budget -= len(extra)
+                missing = [
+                    h
+                    for h in missing
+                    if h not in self.pending_requests and not self.has_seen(h)
+                ]
+                if missing:
+                    self._request_messages(missing, peer)
+                if extra:
+                    self._send_stored(extra, peer)
+
+        summaries = data.get(SharedMessage.SYNC_TREE)
+        if isinstance(summaries, dict):
+            children, differing = self.anti_entropy.respond(summaries)
+            if children:
+                self._send_sync_tree(children, peer)
+            items: List[Tuple[str, List[str]]] = list(differing.items())
+            for i in range(0, len(items), self.ANTI_ENTROPY_BATCH_SIZE):
+                batch = dict(items[i : i + self.ANTI_ENTROPY_BATCH_SIZE])
+                sync_message = json.dumps({SharedMessage.SYNC_BUCKETS: batch})
+                self._sendto(self.compress_message(sync_message), peer)
+
+    def _send_sync_tree(self, summaries: Dict[str, Any], peer: Tuple[str, int]) -> None:
+        """
+        Send tree summaries to a peer in batches.
+        """
+        items: List[Tuple[str, Any]] = list(summaries.items())
+        for i in range(0, len(items), self.ANTI_ENTROPY_BATCH_SIZE):
+            batch = dict(items[i : i + self.ANTI_ENTROPY_BATCH_SIZE])
+            sync_message = json.dumps({SharedMessage.SYNC_TREE: batch})
+            self._sendto(self.compress_message(sync_message), peer)
+
+    def _sketch_round(self) -> None:
+        """
+        Send a sketch of our recent hashes to a random peer.
+        """
+        now: float = self.clock()
+        if not self.peers or now - self.last_sketch < self.SKETCH_INTERVAL:
+            return
+        self.last_sketch = now
+        peers: List[Tuple[str, int]] = self._peers_with(FEATURE_SKETCH)
+        if peers:
+            self._send_sketch(random.choice(peers), self.reconciler.initial_cells)
+
+    def _send_sketch(self, peer: Tuple[str, int], num_cells: int) -> None:
+        recent: List[str] = self.inventory_log[-self.reconciler.window :]
+        table: IBLT = self.reconciler.build(recent, num_cells)
+        sketch_message = json.dumps(
+            {
+                SharedMessage.SKETCH: {
+                    "table": table.to_bytes().hex(),
+                    "hashes": table.num_hashes,
+                }
+            }
+        )
+        self._sendto(self.compress_message(sketch_message), peer)
+
+    def _handle_sketch(self, sketch: Dict[str, Any], addr: Tuple[str, int]) -> None:
+        """
+        Decode the difference between a peer's sketch and our recent hashes.
+        Fetch what we lack, announce what the peer lacks, ask for a larger
+        sketch if the difference did not decode, and exchange the full
+        hash lists once the sketch size limit is reached. Only peers are
+        answered, and tables beyond max_cells are never decoded.
+        """
+        if self.reconciler is None:
+            return
+        peer: Tuple[str, int] = (addr[0], addr[1])
+        if peer not in self.peers:
+            return
+        num_hashes: int = self.reconciler.num_hashes
+        max_cells: int = self.reconciler.max_cells
+        max_cells += -max_cells % num_hashes
+        if (
+            not isinstance(sketch, dict)
+            or not isinstance(sketch.get("table"), str)
+            or sketch.get("hashes") != num_hashes
+            or len(sketch["table"]) > 2 * max_cells * CELL.size
+        ):
+            self.handle_invalid_message(addr)
+            return
+        try:
+            table: IBLT = IBLT.from_bytes(bytes.fromhex(sketch["table"]), num_hashes)
+        except ValueError:
+            self.handle_invalid_message(addr)
+            return
+        recent: List[str] = self.inventory_log[-self.reconciler.window :]
+        difference = self.reconciler.difference(table, recent)
+
+        if difference is None:
+            num_cells: Optional[int] = self.reconciler.next_size(table.num_cells)
+            if num_cells is not None:
+                request_message = json.dumps({SharedMessage.SKETCH_REQUEST: num_cells})
+                self._sendto(self.compress_message(request_message), peer)
+                return
+            # Too many differences for a sketch: fall back to hash lists
+            pull_message = json.dumps({SharedMessage.PULL: recent})
+            self._sendto(self.compress_message(pull_message), peer)
+            self._send_inventory(recent, peer)
+            return
+
+        theirs_only, ours_only = difference
+        missing: List[str] = [
+            h
+            for h in theirs_only
+            if h not in self.pending_requests and not self.has_seen(h)
+        ]
+        if missing:
+            self._request_messages(missing, peer)
+        # Recent here may be older there, so let the peer decide what to fetch
+        self._send_inventory(ours_only, peer)
+
+    def _handle_sketch_request(self, num_cells: Any, addr: Tuple[str, int]) -> None:
+        """
+        Answer a peer's request for a sketch of the given size.
+        """
+        peer: Tuple[str, int] = (addr[0], addr[1])
+        if (
+            self.reconciler is None
+            or peer not in self.peers
+            or not isinstance(num_cells, int)
+        ):
+            return
+        num_cells = max(1, min(num_cells, self.reconciler.max_cells))
+        self._send_sketch(peer, num_cells)
+
+    def _gossip_full(self) -> None:
+        """
+        Broadcast all known messages to all peers.
+        """
+        if self.db:
+            keys_to_share: List[bytes] = [
+                key for key in self.db.keys() if not self._is_reserved_key(key)
+            ]
+            for key in keys_to_share:
+                message_hash: str = key.decode() if isinstance(key, bytes) else key
+                self._broadcast_encoded(self._wire_bytes(message_hash), message_hash)
+
+    def _gossip_inventory(self) -> None:
+        """
+        Announce hashes each peer has not been told about yet and re-request
+        payloads that did not arrive in time.
+        """
+        if not self.gossip_strategy.periodic_rebroadcast:
+            return
+        for peer in list(self.peers):
+            cursor: int = self.inventory_cursors.get(peer, 0)
+            if cursor < len(self.inventory_log):
+                self.announce_inventory(self.inventory_log[cursor:], [peer])
+                self.inventory_cursors[peer] = len(self.inventory_log)
+
+    def _retry_pending_requests(self) -> None:
+        """
+        Re-request payloads that did not arrive in time, giving up after
+        INVENTORY_MAX_ATTEMPTS.
+        """
+        now: float = self.clock()
+        retries: Dict[Tuple[str, int], List[str]] = {}
+        for message_hash, (requested_at, peer, attempts) in list(
+            self.pending_requests.items()
+        ):
+            if now - requested_at < self.INVENTORY_REQUEST_TIMEOUT:
+                continue
+            if attempts >= self.INVENTORY_MAX_ATTEMPTS or peer not in self.peers:
+                del self.pending_requests[message_hash]
+            else:
+                retries.setdefault(peer, []).append(message_hash)
+
+        for peer, hashes in retries.items():
+            self._request_messages(hashes, peer)
+
+    def announce_inventory(
+        self, hashes: List[str], peers: Optional[List[Tuple[str, int]]] = None
+    ) -> None:
+        """
+        Send INVENTORY announcements for the given hashes, skipping hashes a
+        peer already holds. Each hash is announced to a peer at most once.
+        """
+        for peer in self.peers if peers is None else peers:
+            known: Set[str] = self.known_by_peer.setdefault(peer, set())
+            unknown: List[str] = [h for h in hashes if h not in known]
+            self._send_inventory(unknown, peer)
+            known.update(unknown)
+
+    def _send_inventory(self, hashes: List[str], peer: Tuple[str, int]) -> None:
+        """
+        Send INVENTORY messages for the given hashes in batches.
+        """
+        for i in range(0, len(hashes), self.INVENTORY_BATCH_SIZE):
+            batch: List[str] = hashes[i : i + self.INVENTORY_BATCH_SIZE]
+            inventory_message = json.dumps({SharedMessage.INVENTORY: batch})
+            self._sendto(self.compress_message(inventory_message), peer)
+
+    def _request_messages(self, hashes: List[str], peer: Tuple[str, int]) -> None:
+        """
+        Ask a peer for the payloads of the given hashes and track them as pending.
+        """
+        now: float = self.clock()
+        for i in range(0, len(hashes), self.INVENTORY_BATCH_SIZE):
+            batch: List[str] = hashes[i : i + self.INVENTORY_BATCH_SIZE]
+            request_message = json.dumps({SharedMessage.REQUEST_MESSAGES: batch})
+            self._sendto(self.compress_message(request_message), peer)
+            for message_hash in batch:
+                _, _, attempts = self.pending_requests.get(message_hash, (now, peer, 0))
+                self.pending_requests[message_hash] = (now, peer, attempts + 1)
+
+    def _handle_inventory(self, hashes: List[str], addr: Tuple[str, int]) -> None:
+        """
+        Handle an INVENTORY announcement by requesting only the missing payloads.
+        """
+        peer: Tuple[str, int] = (addr[0], addr[1])
+        self.known_by_peer.setdefault(peer, set()).update(hashes)
+        missing: List[str] = [
+            h
+            for h in hashes
+            if isinstance(h, str)
+            and h not in self.pending_requests
+            and not self.has_seen(h)
+        ]
+        if missing:
+            self._request_messages(missing, peer)
+
+    def _handle_message_request(self, hashes: List[str], addr: Tuple[str, int]) -> None:
+        """
+        Handle a REQUEST_MESSAGES by sending the stored payloads back to the
+        peer. Requests from non-peers are ignored, and at most
+        INVENTORY_BATCH_SIZE hashes, the size of the requests we send, are
+        served per request.
+        """
+        peer: Tuple[str, int] = (addr[0], addr[1])
+        if peer not in self.peers or not isinstance(hashes, list):
+            return
+        self._send_stored(hashes[: self.INVENTORY_BATCH_SIZE], peer)
+
+    def _send_stored(self, hashes: List[str], peer: Tuple[str, int]) -> None:
+        """
+        Send the stored messages with the given hashes to a peer.
+        """
+        known: Set[str] = self.known_by_peer.setdefault(peer, set())
+        for message_hash in hashes:
+            if not isinstance(message_hash, str) or self._is_reserved_key(message_hash):
+                continue
+            try:
+                data: bytes = self._wire_bytes(message_hash)
+            except KeyError:
+                continue
+            self._sendto(data, peer, message_hash=message_hash)
+            known.add(message_hash)
+
     def connect_to_peer(self, host: str, port: int, discovery: bool = False) -> None:
         """
         Connect to a peer (host, port), optionally sending a discovery message.
@@ -278,13 +1123,58 @@ class ChaincraftNode:
 
     def send_peer_discovery(self, host: str, port: int) -> None:
         """
-        Send a discovery message to the specified peer.
+        Send a discovery message to the specified peer. It carries our
+        Capabilities, which opens the handshake: the peer answers with its
+        own discovery message if it has not sent us one yet.
         """
         discovery_message = json.dumps(
-            {SharedMessage.PEER_DISCOVERY: f"{self.host}:{self.port}"}
+            {
+                SharedMessage.PEER_DISCOVERY: f"{self.host}:{self.port}",
+                SharedMessage.HANDSHAKE: self.capabilities().to_dict(),
+            }
         )
         compressed_message = self.compress_message(discovery_message)
-        self.socket.sendto(compressed_message, (host, port))
+        self.handshakes_sent.add((host, port))
+        self._sendto(compressed_message, (host, port))
+
+    def capabilities(self) -> Capabilities:
+        """
+        What this node supports, as announced in its handshake.
+        """
+        features: List[str] = []
+        if self.anti_entropy is not None:
+            features.append(FEATURE_ANTI_ENTROPY)
+        if self.reconciler is not None:
+            features.append(FEATURE_SKETCH)
+        return Capabilities(
+            PROTOCOL_VERSION,
+            list(CODECS),
+            COMPRESSIONS,
+            self.max_datagram_size,
+            features,
+        )
+
+    @property
+    def peer_codecs(self) -> Dict[Tuple[str, int], List[str]]:
+        """
+        Codecs each peer announced it can decode.
+        """
+        return {
+            peer: capabilities.codecs
+            for peer, capabilities in list(self.peer_capabilities.items())
+        }
+
+    def _peers_with(self, feature: str) -> List[Tuple[str, int]]:
+        """
+        Peers that announced a feature, or did not complete a handshake.
+        """
+        return [
+            peer
+            for peer in self.peers
+            if peer not in self.peer_capabilities
+            or feature in self.peer_capabilities[peer].features
+            or self.peer_capabilities[peer].version == 0
+        ]
 
     def connect_to_peer_locally(self, host: str, port: int) -> None:
         """
@@ -302,34 +1192,350 @@ class ChaincraftNode:
             {SharedMessage.REQUEST_LOCAL_PEERS: f"{self.host}:{self.port}"}
         )
         compressed_message = self.compress_message(request_message)
-        self.socket.sendto(compressed_message, (host, port))
+        self._sendto(compressed_message, (host, port))
+
+    def _sendto(
+        self,
+        data: bytes,
+        addr: Tuple[str, int],
+        ttl: Optional[int] = None,
+        message_hash: Optional[str] = None,
+    ) -> None:
+        """
+        Send an encoded message to addr, in a TTL envelope if a hop limit is
+        given, fragmenting it if it does not fit in one datagram. With the
+        message's hash, its encodings come from the wire cache.
+        """
+        data = self._encode_for_peer(data, addr, message_hash)
+        if ttl is not None:
+            data = wrap_ttl(data, ttl)
+        max_size: int = self._datagram_size_for(addr)
+        if len(data) <= max_size:
+            self._send_datagram(data, addr)
+            return
+        for fragment in self.fragment_cache.fragments_for(
+            data, max_size, (addr[0], addr[1])
+        ):
+            self._send_datagram(fragment, addr)
+
+    def _datagram_size_for(self, addr: Tuple[str, int]) -> int:
+        """
+        Largest datagram we send to a peer: ours, or less if it said so.
+        """
+        capabilities: Optional[Capabilities] = self.peer_capabilities.get(
+            (addr[0], addr[1])
+        )
+        if capabilities is None or capabilities.max_datagram_size is None:
+            return self.max_datagram_size
+        return min(self.max_datagram_size, capabilities.max_datagram_size)
+
+    def _encode_for_peer(
+        self, data: bytes, addr: Tuple[str, int], message_hash: Optional[str] = None
+    ) -> bytes:
+        """
+        Apply the per-peer wire encodings (codec, compression) to a message,
+        as far as the peer's handshake allows. Frames are passed through
+        unchanged.
+        """
+        if data[:1] == bytes([FRAME_MAGIC]):
+            return data
+        peer: Tuple[str, int] = (addr[0], addr[1])
+        capabilities: Optional[Capabilities] = self.peer_capabilities.get(peer)
+        if (
+            self.codec.name != JSONCodec.name
+            and capabilities is not None
+            and self.codec.name in capabilities.codecs
+        ):
+            data = self._encode_with_codec(data, message_hash)
+        # Every node of this protocol version decodes DEFLATED frames, so
+        # only a handshake without zlib rules them out
+        if (
+            self.use_compression
+            and data[:1] != bytes([FRAME_MAGIC])
+            and (capabilities is None or "zlib" in capabilities.compression)
+        ):
+            data = self._encode_cached("zlib", data, self._deflate, message_hash)
+        if self.compressor is not None and data[:1] != bytes([FRAME_MAGIC]):
+            data = self.compressor.encode(data, peer)
+        return data
+
+    def _encode_with_codec(
+        self, data: bytes, message_hash: Optional[str] = None
+    ) -> bytes:
+        """
+        Re-encode a JSON message with the node's codec as a BINARY frame.
+        Messages whose text is not canonical json.dumps output are left as
+        they are, so every node derives the same hash for them.
+        """
+        return self._encode_cached(
+            self.codec.name, data, self._codec_frame, message_hash
+        )
+
+    def _encode_cached(
+        self,
+        encoding: str,
+        data: bytes,
+        encode: Callable[[bytes, Optional[str]], bytes],
+        message_hash: Optional[str] = None,
+    ) -> bytes:
+        """
+        Encode a message, caching the result, since the same message goes to
+        many peers: by message hash in the wire cache if it is known, else by
+        content.
+        """
+        if message_hash is not None:
+            encoded: Optional[bytes] = self.wire_cache.get(message_hash, encoding)
+            if encoded is None:
+                encoded = encode(data, message_hash)
+                self.wire_cache.put(message_hash, encoded, encoding)
+            return encoded
+
+        key: Tuple[str, bytes] = (encoding, data)
+        with self.encoded_cache_lock:
+            encoded = self.encoded_cache.get(key)
+            if encoded is not None:
+                self.encoded_cache.move_to_end(key)
+                return encoded
+
+        encoded = encode(data, None)
+
+        with self.encoded_cache_lock:
+            self.encoded_cache[key] = encoded
+            while len(self.encoded_cache) > self.ENCODED_CACHE_SIZE:
+                self.encoded_cache.popitem(last=False)
+        return encoded
+
+    def _codec_frame(self, data: bytes, message_hash: Optional[str] = None) -> bytes:
+        try:
+            message: str = self.decompress_message(data)
+            parsed: Any = json.loads(message)
+            if json.dumps(parsed) == message:
+                frame: bytes = encode_binary_frame(
+                    message_hash or self.hash_message(data), self.codec.encode(parsed)
+                )
+                if len(frame) < len(data):
+                    return frame
+        except (zlib.error, UnicodeDecodeError, ValueError, TypeError):
+            pass
+        return data
+
+    def _deflate(self, data: bytes, message_hash: Optional[str] = None) -> bytes:
+        frame: bytes = encode_deflated_frame(
+            message_hash or self.hash_message(data), data
+        )
+        return frame if len(frame) < len(data) else data
+
+    def _send_datagram(self, data: bytes, addr: Tuple[str, int]) -> None:
+        """
+        Send a single datagram to addr, keeping the wire counters up to date.
+        """
+        self.transport.sendto(data, addr)
+        self.bytes_sent += len(data)
+        self.datagrams_sent += 1
+
+    def _send_sync(self, data: bytes, addr: Tuple[str, int]) -> None:
+        """
+        Send bulk sync traffic over the sync transport when one is configured,
+        falling back to the regular transport if the peer cannot be reached.
+        """
+        if self.sync_transport is not None:
+            try:
+                payload: bytes = self._encode_for_peer(data, addr)
+                self.sync_transport.sendto(payload, addr)
+                self.bytes_sent += len(payload)
+                self.datagrams_sent += 1
+                return
+            except OSError as e:
+                if self.debug:
+                    print(f"Node {self.port}: Sync transport to {addr} failed: {e}")
+        self._sendto(data, addr)
+
+    def _handle_frame(self, frame: bytes, addr: Tuple[str, int]) -> Optional[bytes]:
+        """
+        Handle a framed datagram. Returns the reassembled message once all
+        fragments are in, otherwise None.
+        """
+        kind: bytes = frame[:2]
+        if kind == FRAGMENT:
+            return self.reassembly_buffer.add(frame, addr, self.clock())
+        if kind == FRAGMENT_NACK and len(frame) >= NACK_HEADER.size:
+            message_id, missing = decode_nack(frame)
+            for fragment in self.fragment_cache.get(
+                (addr[0], addr[1]), message_id, missing, self._datagram_size_for(addr)
+            ):
+                self._send_datagram(fragment, (addr[0], addr[1]))
+            return None
+        if kind == COMPRESSED and self.compressor is not None:
+            try:
+                data: Optional[bytes] = self.compressor.decode(
+                    frame, self.packet_filter.max_decompressed_size
+                )
+            except (zlib.error, ValueError):
+                self.handle_invalid_message(addr)
+                return None
+            if data is None:
+                # The sender thinks we hold a dictionary we do not have
+                self._send_compression_ack(None, (addr[0], addr[1]))
+            return data
+        self.handle_invalid_message(addr)
+        return None
+
+    def _negotiate_compression(self) -> None:
+        """
+        Train the compression dictionary once enough messages are stored and
+        offer it to peers that have not acknowledged it yet.
+        """
+        if self.compressor.needs_training(len(self.inventory_log)):
+            recent: List[str] = self.inventory_log[-self.compressor.sample_size :]
+            samples: List[str] = [
+                self._load_db_value(h) for h in recent if h in self.db
+            ]
+            dict_id: bytes = self.compressor.train(samples)
+            if self.debug:
+                print(f"Node {self.port}: Trained dictionary {dict_id.hex()}")
+
+        active = self.compressor.active_dictionary()
+        if active is None:
+            return
+        dict_id, dictionary = active
+        now: float = self.clock()
+        for peer in self.compressor.peers_to_offer(self.peers):
+            offered_id, attempts, last_attempt = self.dictionary_offers.get(
+                peer, (b"", 0, 0.0)
+            )
+            if offered_id != dict_id:
+                attempts = 0
+            elif (
+                attempts >= self.DICTIONARY_OFFER_ATTEMPTS
+                or now - last_attempt < self.DICTIONARY_OFFER_INTERVAL
+            ):
+                continue
+            offer: str = json.dumps(
+                {
+                    SharedMessage.COMPRESSION_DICTIONARY: {
+                        "id": dict_id.hex(),
+                        "dictionary": base64.b64encode(dictionary).decode(),
+                    }
+                }
+            )
+            self.dictionary_offers[peer] = (dict_id, attempts + 1, now)
+            try:
+                self._send_sync(self.compress_message(offer), peer)
+            except OSError as e:
+                if self.debug:
+                    print(f"Node {self.port}: Failed to offer dictionary: {e}")
+
+    def _handle_compression_dictionary(self, offer: Any, addr: Tuple[str, int]) -> None:
+        """
+        Install a dictionary offered by a peer and acknowledge it. Offers
+        from non-peers are ignored; oversized or mislabelled ones are invalid.
+        """
+        peer: Tuple[str, int] = (addr[0], addr[1])
+        if self.compressor is None or peer not in self.peers:
+            return
+        dictionary: bytes = base64.b64decode(offer["dictionary"])
+        if dictionary_id(dictionary).hex() != offer["id"]:
+            self.handle_invalid_message(addr)
+            return
+        try:
+            dict_id: bytes = self.compressor.add_dictionary(dictionary)
+        except ValueError:
+            self.handle_invalid_message(addr)
+            return
+        self._send_compression_ack(dict_id, peer)
+
+    def _send_compression_ack(
+        self, dict_id: Optional[bytes], addr: Tuple[str, int]
+    ) -> None:
+        ack: str = json.dumps(
+            {SharedMessage.COMPRESSION_ACK: dict_id.hex() if dict_id else None}
+        )
+        self._sendto(self.compress_message(ack), addr)
+
+    def _request_missing_fragments(self) -> None:
+        """
+        Expire stale partial messages and NACK fragments that did not arrive.
+        Only peers are NACKed, since a fragment's source address is unverified.
+        """
+        max_indices: int = (self.max_datagram_size - NACK_HEADER.size) // 2
+        for addr, message_id, missing in self.reassembly_buffer.pending_nacks(
+            self.clock()
+        ):
+            if addr not in self.peers:
+                continue
+            try:
+                self._send_datagram(
+                    encode_nack(message_id, missing[:max_indices]), addr
+                )
+            except OSError as e:
+                if self.debug:
+                    print(f"Node {self.port}: Failed to send NACK to {addr}: {e}")
 
     def decompress_message(self, compressed_message: bytes) -> str:
         """
-        Decompress or decode bytes into a string depending on use_compression flag.
+        Decode a received message (plain JSON, a DEFLATED frame or a zlib
+        stream) into its JSON text. Raises zlib.error if it is corrupt or
+        inflates beyond the packet filter's max_decompressed_size.
         """
-        if self.use_compression:
-            return zlib.decompress(compressed_message).decode()
-        else:
-            return compressed_message.decode()
+        if compressed_message[:2] == DEFLATED:
+            try:
+                _, compressed_message = decode_deflated_frame(compressed_message)
+            except ValueError as e:
+                raise zlib.error(str(e))
+            return self._inflate(compressed_message).decode()
+        if compressed_message[:1] == ZLIB_HEADER:
+            return self._inflate(compressed_message).decode()
+        return bytes(compressed_message).decode()
+
+    def _inflate(self, data: bytes) -> bytes:
+        try:
+            return inflate(data, self.packet_filter.max_decompressed_size)
+        except ValueError:
+            self.packet_filter.record_drop(OVERSIZED)
+            raise zlib.error("Compressed message exceeds max_decompressed_size")
 
     def hash_message(self, compressed_message: bytes) -> str:
         """
-        Create a SHA-256 hash from the compressed message bytes.
+        SHA-256 of a message's canonical bytes (its JSON text), whatever the
+        encoding it arrived in, so message IDs are the same on every link.
         """
+        if (
+            compressed_message[:2] == DEFLATED
+            and len(compressed_message) >= DEFLATED_HEADER.size
+        ):
+            return bytes(compressed_message[2 : DEFLATED_HEADER.size]).hex()
+        if compressed_message[:1] == ZLIB_HEADER:
+            compressed_message = self._inflate(bytes(compressed_message))
         return hashlib.sha256(compressed_message).hexdigest()
 
-    def broadcast(self, message: str) -> str:
+    def broadcast(
+        self,
+        message: str,
+        peers: Optional[List[Tuple[str, int]]] = None,
+        ttl: Optional[int] = None,
+    ) -> str:
         """
-        Broadcast a message (string) to all known peers.
+        Broadcast a message (string) to all known peers, or to the given ones.
         """
         compressed_message = self.compress_message(message)
         message_hash = self.hash_message(compressed_message)
+        return self._broadcast_encoded(compressed_message, message_hash, peers, ttl)
+
+    def _broadcast_encoded(
+        self,
+        compressed_message: bytes,
+        message_hash: str,
+        peers: Optional[List[Tuple[str, int]]] = None,
+        ttl: Optional[int] = None,
+    ) -> str:
+        """
+        Broadcast a message's canonical bytes whose hash is already known.
+        """
         failed_peers = []
 
-        for peer in self.peers:
+        for peer in self.peers if peers is None else peers:
             try:
-                self.socket.sendto(compressed_message, peer)
+                self._sendto(compressed_message, peer, ttl, message_hash)
                 # if self.debug:
                 #    print(f"Node {self.port}: Sent message to peer {peer}")
             except Exception as e:
@@ -341,8 +1547,9 @@ class ChaincraftNode:
 
         # Clean up failed peers from the list
         for peer in failed_peers:
-            self.peers.remove(peer)
-            self.save_peers()
+            if peer in self.peers:
+                self.peers.remove(peer)
+                self.save_peers()
 
         return message_hash
 
@@ -350,21 +1557,260 @@ class ChaincraftNode:
         self, message: str, message_hash: str, addr: Tuple[str, int]
     ) -> None:
         """Handle a new incoming message. Validate, store, broadcast if valid."""
+        # Avoid reprocessing if already in DB
+        if self.has_seen(message_hash):
+            return
+
+        try:
+            shared_message, accepted = self._decode_message(message)
+        except Exception as e:
+            print(f"❌ Error handling message: {str(e)}")
+            self.handle_invalid_message(addr)
+            return
+
+        self._commit_message(shared_message, accepted, message, message_hash, addr)
+
+    def _decode_message(self, message: str) -> Tuple[Optional[SharedMessage], bool]:
+        """
+        Parse a message and check it against the accepted message types.
+        Touches no node state besides configuration, so it can run on
+        receive-pipeline workers. Returns (None, False) for invalid JSON.
+        """
+        try:
+            shared_message = SharedMessage.from_json(message)
+        except json.JSONDecodeError:
+            return None, False
+
+        return shared_message, self._is_accepted(shared_message)
+
+    def _is_accepted(self, shared_message: SharedMessage) -> bool:
+        """
+        Control messages are always accepted, everything else is checked
+        against the accepted message types.
+        """
+        if isinstance(shared_message.data, dict) and (
+            SharedMessage.INVENTORY in shared_message.data
+            or SharedMessage.REQUEST_MESSAGES in shared_message.data
+            or SharedMessage.COMPRESSION_DICTIONARY in shared_message.data
+            or SharedMessage.COMPRESSION_ACK in shared_message.data
+            or SharedMessage.PULL in shared_message.data
+            or SharedMessage.SYNC_TREE in shared_message.data
+            or SharedMessage.SYNC_BUCKETS in shared_message.data
+            or SharedMessage.SKETCH in shared_message.data
+            or SharedMessage.SKETCH_REQUEST in shared_message.data
+            or SharedMessage.REQUEST_SHARED_OBJECT_UPDATE in shared_message.data
+            or SharedMessage.SHARED_OBJECT_STATUS in shared_message.data
+        ):
+            return True
+
+        return self.is_data_accepted(shared_message.data) and self._precheck(
+            shared_message
+        )
+
+    def _precheck(self, shared_message: SharedMessage) -> bool:
+        """
+        Run the SharedObjects' stateless checks if prechecks are enabled: in
+        the precheck pool when the receive pipeline is running, inline
+        otherwise (the pool would only block the calling thread).
+        """
+        if self.precheck_processes <= 0:
+            return True
+        checks = [obj.stateless_check() for obj in self.shared_objects]
+        checks = [check for check in checks if check is not None]
+        if not checks:
+            return True
+        if self.precheck_pool is None:
+            return run_stateless_checks(checks, shared_message.data)
+        try:
+            return self.precheck_pool.submit(
+                run_stateless_checks, checks, shared_message.data
+            ).result()
+        except Exception as e:
+            # e.g. a broken pool: the checks are pure, so run them here
+            print(f"❌ Error running stateless checks: {str(e)}")
+            return run_stateless_checks(checks, shared_message.data)
+
+    def _decode_datagram(
+        self,
+        compressed_data: bytes,
+        message_hash: Optional[str] = None,
+        seen: Optional[Callable[[str], bool]] = None,
+        addr: Optional[Tuple[str, int]] = None,
+    ) -> Optional[Tuple[Optional[SharedMessage], bool, str, str]]:
+        """
+        Decode stage of the receive path: hash, dedup, decompress, parse and
+        schema check. Returns None for already-seen messages, otherwise the
+        arguments for _commit_message (minus the sender address). seen
+        replaces has_seen for the dedup (worker processes have no store);
+        addr only labels trace spans.
+        """
+        if self.metrics is None:
+            return self._decode(compressed_data, message_hash, seen, addr)
+        start: float = time.perf_counter()
+        decoded = self._decode(compressed_data, message_hash, seen, addr)
+        if decoded is not None and decoded[0] is not None:
+            self._observe(self.decode_latency, start, decoded[0].data)
+        return decoded
+
+    def _decode(
+        self,
+        compressed_data: bytes,
+        message_hash: Optional[str],
+        seen: Optional[Callable[[str], bool]],
+        addr: Optional[Tuple[str, int]],
+    ) -> Optional[Tuple[Optional[SharedMessage], bool, str, str]]:
+        seen = seen or self.has_seen
+        if compressed_data[:2] == BINARY:
+            return self._decode_binary(compressed_data, seen)
+
+        if message_hash is None:
+            try:
+                message_hash = self.hash_message(compressed_data)
+            except zlib.error:
+                return None, False, "", hashlib.sha256(compressed_data).hexdigest()
+        # Start time of each stage, if this message is traced
+        marks: Optional[List[float]] = None
+        if self.tracer is not None and self.tracer.sampled(message_hash):
+            marks = [time.perf_counter()]
+        # Only handle if we've never seen this message
+        if seen(message_hash):
+            if marks is not None:
+                self.tracer.record(DEDUP, marks[0], time.perf_counter(), message_hash)
+            return None
+
+        try:
+            if marks is not None:
+                marks.append(time.perf_counter())
+            message: str = self.decompress_message(compressed_data)
+            if compressed_data[:2] == DEFLATED and (
+                hashlib.sha256(message.encode()).hexdigest() != message_hash
+            ):
+                return None, False, "", message_hash
+            if marks is not None:
+                marks.append(time.perf_counter())
+            shared_message, accepted = self._decode_message(message)
+        except (zlib.error, UnicodeDecodeError):
+            return None, False, "", message_hash
+        except Exception as e:
+            print(f"❌ Error handling message: {str(e)}")
+            return None, False, "", message_hash
+
+        if marks is not None:
+            marks.append(time.perf_counter())
+            message_type: Optional[str] = (
+                message_type_of(shared_message.data) if shared_message else None
+            )
+            for name, start, end in zip((DEDUP, DECOMPRESS, ACCEPT), marks, marks[1:]):
+                self.tracer.record(name, start, end, message_hash, message_type, addr)
+        return shared_message, accepted, message, message_hash
+
+    def _decode_binary(
+        self, frame: bytes, seen: Optional[Callable[[str], bool]] = None
+    ) -> Optional[Tuple[Optional[SharedMessage], bool, str, str]]:
+        """
+        Decode stage for BINARY frames. Duplicates are dropped using the hash
+        in the frame header; new messages are decoded once, re-serialized to
+        JSON for storage and checked against the hash.
+        """
+        try:
+            message_hash, payload = decode_binary_frame(frame)
+        except ValueError:
+            return None, False, "", self.hash_message(frame)
+        if (seen or self.has_seen)(message_hash):
+            return None
+
         try:
-            # Avoid reprocessing if already in DB
-            if message_hash.encode() in self.db:  # Fix: encode hash for DB key
+            shared_message = SharedMessage.from_bytes(payload, get_codec("binary"))
+            message: str = shared_message.to_json()
+        except Exception:
+            return None, False, "", message_hash
+        if self.hash_message(self.compress_message(message)) != message_hash:
+            return None, False, "", message_hash
+
+        return shared_message, self._is_accepted(shared_message), message, message_hash
+
+    def _commit_message(
+        self,
+        shared_message: Optional[SharedMessage],
+        accepted: bool,
+        message: str,
+        message_hash: str,
+        addr: Tuple[str, int],
+    ) -> None:
+        """
+        Commit stage of the receive path: answer control messages, validate
+        against SharedObjects, store and relay. Must run in receive order.
+        """
+        try:
+            if shared_message is None or self.has_seen(message_hash):
+                if shared_message is None:
+                    self.handle_invalid_message(addr)
                 return
 
-            if not self.is_message_accepted(message):
+            # Inventory and compression control messages are answered
+            # directly and never stored
+            if isinstance(shared_message.data, dict):
+                if SharedMessage.INVENTORY in shared_message.data:
+                    self._handle_inventory(
+                        shared_message.data[SharedMessage.INVENTORY], addr
+                    )
+                    return
+                if SharedMessage.REQUEST_MESSAGES in shared_message.data:
+                    self._handle_message_request(
+                        shared_message.data[SharedMessage.REQUEST_MESSAGES], addr
+                    )
+                    return
+                if SharedMessage.PULL in shared_message.data:
+                    self._handle_pull(shared_message.data[SharedMessage.PULL], addr)
+                    return
+                if (
+                    SharedMessage.SYNC_TREE in shared_message.data
+                    or SharedMessage.SYNC_BUCKETS in shared_message.data
+                ):
+                    self._handle_sync(shared_message.data, addr)
+                    return
+                if SharedMessage.SKETCH in shared_message.data:
+                    self._handle_sketch(shared_message.data[SharedMessage.SKETCH], addr)
+                    return
+                if SharedMessage.SKETCH_REQUEST in shared_message.data:
+                    self._handle_sketch_request(
+                        shared_message.data[SharedMessage.SKETCH_REQUEST], addr
+                    )
+                    return
+                if SharedMessage.REQUEST_SHARED_OBJECT_UPDATE in shared_message.data:
+                    self._handle_shared_object_update_request(shared_message, addr)
+                    return
+                if SharedMessage.SHARED_OBJECT_STATUS in shared_message.data:
+                    self._handle_shared_object_status(
+                        shared_message.data[SharedMessage.SHARED_OBJECT_STATUS], addr
+                    )
+                    return
+                if SharedMessage.COMPRESSION_DICTIONARY in shared_message.data:
+                    self._handle_compression_dictionary(
+                        shared_message.data[SharedMessage.COMPRESSION_DICTIONARY],
+                        addr,
+                    )
+                    return
+                if SharedMessage.COMPRESSION_ACK in shared_message.data:
+                    if self.compressor is not None:
+                        peer: Tuple[str, int] = (addr[0], addr[1])
+                        dict_id = shared_message.data[SharedMessage.COMPRESSION_ACK]
+                        if not dict_id:
+                            # Peer lost our dictionary (e.g. restarted), offer again
+                            self.dictionary_offers.pop(peer, None)
+                        self.compressor.acknowledge(
+                            peer, bytes.fromhex(dict_id) if dict_id else None
+                        )
+                    return
+
+            if not accepted:
                 self.handle_invalid_message(addr)
                 return
-            else:
-                shared_message = SharedMessage.from_json(message)
 
             # Additional data-based actions (peer discovery, local peers, etc.)
             if isinstance(shared_message.data, dict):
                 if SharedMessage.PEER_DISCOVERY in shared_message.data:
-                    self._handle_peer_discovery(shared_message)
+                    self._handle_peer_discovery(shared_message, addr)
                 elif (
                     SharedMessage.REQUEST_LOCAL_PEERS in shared_message.data
                     and self.local_discovery
@@ -372,14 +1818,10 @@ class ChaincraftNode:
                     self._handle_local_peer_request(shared_message)
                 elif SharedMessage.LOCAL_PEERS in shared_message.data:
                     self._handle_local_peer_response(shared_message, addr)
-                elif SharedMessage.REQUEST_SHARED_OBJECT_UPDATE in shared_message.data:
-                    self._handle_shared_object_update_request(shared_message, addr)
 
             # if valid types, process
             self._handle_shared_message(shared_message, message, message_hash, addr)
 
-        except json.JSONDecodeError:
-            self.handle_invalid_message(addr)
         except Exception as e:
             print(f"❌ Error handling message: {str(e)}")
             self.handle_invalid_message(addr)
@@ -395,33 +1837,106 @@ class ChaincraftNode:
         Handle logic for a valid SharedMessage, including storage, broadcasting, and
         special message fields (peer discovery, local peers).
         """
-        # Check if the message is valid for our shared objects
+        # Check if the message is valid for our shared objects. With
+        # prechecks, the stateless part already passed in the decode stage.
         if self.shared_objects:
-            if all(obj.is_valid(shared_message) for obj in self.shared_objects):
-                self._process_shared_objects(shared_message)
-                self._store_and_broadcast(message_hash, original_message)
+            start: float = time.perf_counter() if self.metrics is not None else 0.0
+            traced: bool = self.tracer is not None and self.tracer.sampled(message_hash)
+            if traced:
+                valid: bool = all(
+                    self._traced_is_valid(obj, shared_message, message_hash, addr)
+                    for obj in self.shared_objects
+                )
+            elif self.precheck_processes > 0:
+                valid = all(
+                    obj.is_valid_stateful(shared_message) for obj in self.shared_objects
+                )
+            else:
+                valid = all(obj.is_valid(shared_message) for obj in self.shared_objects)
+            if self.metrics is not None:
+                self._observe(self.validate_latency, start, shared_message.data)
+            if valid:
+                self._process_shared_objects(
+                    shared_message, message_hash if traced else None, addr
+                )
+                self._store_and_broadcast(
+                    message_hash, original_message, addr, shared_message.data
+                )
             else:
                 # Apply strike for messages not accepted by SharedObjects
                 self.handle_invalid_message(addr)
         else:
-            self._store_and_broadcast(message_hash, original_message)
+            self._store_and_broadcast(
+                message_hash, original_message, addr, shared_message.data
+            )
+
+    def _traced_is_valid(
+        self,
+        obj: SharedObject,
+        shared_message: SharedMessage,
+        message_hash: str,
+        addr: Tuple[str, int],
+    ) -> bool:
+        start: float = time.perf_counter()
+        if self.precheck_processes > 0:
+            valid: bool = obj.is_valid_stateful(shared_message)
+        else:
+            valid = obj.is_valid(shared_message)
+        self._trace(
+            f"{VALIDATE}:{type(obj).__name__}",
+            start,
+            message_hash,
+            shared_message.data,
+            addr,
+        )
+        return valid
 
-    def _process_shared_objects(self, shared_message: SharedMessage) -> None:
+    def _process_shared_objects(
+        self,
+        shared_message: SharedMessage,
+        message_hash: Optional[str] = None,
+        addr: Optional[Tuple[str, int]] = None,
+    ) -> None:
         """
-        Add the shared message to each SharedObject.
+        Add the shared message to each SharedObject. message_hash is given
+        if the message is traced.
         """
         for obj in self.shared_objects:
+            start: float = time.perf_counter() if message_hash is not None else 0.0
             obj.add_message(shared_message)
+            if message_hash is not None:
+                self._trace(
+                    f"{ADD_MESSAGE}:{type(obj).__name__}",
+                    start,
+                    message_hash,
+                    shared_message.data,
+                    addr,
+                )
             if self.debug:
                 print(
                     f"Node {self.port}: Added message to shared object {type(obj).__name__}"
                 )
 
-    def _store_and_broadcast(self, message_hash: str, message_str: str) -> None:
-        """
-        Store the message in the node's DB and broadcast it.
+    def _store_and_broadcast(
+        self,
+        message_hash: str,
+        message_str: str,
+        addr: Optional[Tuple[str, int]] = None,
+        data: Any = None,
+    ) -> None:
         """
-        self.db[message_hash] = message_str
+        Store the message in the node's DB and broadcast it. data (the
+        decoded message) only labels the latency metrics and trace spans.
+        """
+        traced: bool = self.tracer is not None and self.tracer.sampled(message_hash)
+        begin: float = time.perf_counter() if traced else 0.0
+        start: float = time.perf_counter() if self.metrics is not None else 0.0
+        self._store_message(message_hash, message_str)
+        if self.metrics is not None:
+            start = self._observe(self.store_latency, start, data)
+        if addr is not None and self.gossip_mode == self.GOSSIP_INVENTORY:
+            # The sender obviously holds the message already
+            self.known_by_peer.setdefault((addr[0], addr[1]), set()).add(message_hash)
         if self.debug:
             print(
                 f"Node {self.port}: Received new object with hash {message_hash} Object: {message_str}"
@@ -429,19 +1944,221 @@ class ChaincraftNode:
 
         # Index the message if persistent and indexed are both True
         if self.persistent and self.indexed and self.index_helper:
+            index_start: float = time.perf_counter() if traced else 0.0
             self.index_helper.index_message(message_hash, message_str)
+            if self.metrics is not None:
+                start = self._observe(self.index_latency, start, data)
+            if traced:
+                self._trace(INDEX, index_start, message_hash, data, addr)
+
+        self._relay(message_hash, message_str, addr)
+        if self.metrics is not None:
+            self._observe(self.broadcast_latency, start, data)
+        if traced:
+            self._trace(STORE_AND_BROADCAST, begin, message_hash, data, addr)
+
+    def _trace(
+        self,
+        name: str,
+        start: float,
+        message_hash: str,
+        data: Any,
+        addr: Optional[Tuple[str, int]],
+    ) -> None:
+        """
+        Record a span of a traced message from start until now.
+        """
+        self.tracer.record(
+            name, start, time.perf_counter(), message_hash, message_type_of(data), addr
+        )
 
-        self.broadcast(message_str)
+    def _observe(self, histogram: Histogram, start: float, data: Any) -> float:
+        """
+        Record the time since start under the message's type and return the
+        current time, so consecutive stages can be timed back to back.
+        """
+        now: float = time.perf_counter()
+        histogram.observe(now - start, message_type_of(data) or "none")
+        return now
 
-    def _handle_peer_discovery(self, shared_message: SharedMessage) -> None:
+    def has_seen(self, message_hash: str) -> bool:
+        """
+        Check whether a message is already stored, from memory when possible.
+        """
+        return self.seen_cache.seen(message_hash, self._in_store)
+
+    def _in_store(self, message_hash: str) -> bool:
+        # Removed messages still count as seen, so re-gossip cannot revive them
+        return message_hash in self.db or (
+            self.retention is not None and self.retention.was_removed(message_hash)
+        )
+
+    def _store_message(self, message_hash: str, message_str: str) -> None:
+        """
+        Write a message to the store and record it in the inventory log.
+        """
+        with self.store_lock:
+            self.db[message_hash] = message_str
+            self.inventory_log.append(message_hash)
+        self.seen_cache.add(message_hash)
+        if self.anti_entropy is not None:
+            self.anti_entropy.add(message_hash)
+        self.pending_requests.pop(message_hash, None)
+        if self.retention is not None:
+            self._record_retention(message_hash, message_str, self.clock())
+
+    def _record_retention(
+        self, message_hash: str, message_str: str, now: float
+    ) -> None:
+        try:
+            data: Any = json.loads(message_str)
+        except ValueError:
+            data = None
+        self.retention.record(
+            message_hash, message_type_of(data, self.retention.type_field), now
+        )
+
+    def _compact_round(self) -> None:
+        """
+        Remove the messages whose retention expired, every retention.interval.
+        """
+        now: float = self.clock()
+        if now - self.last_compaction < self.retention.interval:
+            return
+        self.last_compaction = now
+        expired: List[str] = self.retention.expired(now, self._is_finalized)
+        if expired:
+            self.remove_messages(expired)
+
+    def _is_finalized(self, message_hash: str) -> bool:
+        try:
+            message: str = self._load_db_value(message_hash)
+        except KeyError:
+            return True
+        shared_message: SharedMessage = SharedMessage.from_json(message)
+        return any(obj.is_finalized(shared_message) for obj in self.shared_objects)
+
+    def remove_messages(self, message_hashes: List[str]) -> int:
+        """
+        Delete messages from the store together with everything that refers
+        to them: the inventory log (adjusting each peer's announce cursor),
+        the anti-entropy tree, the seen cache, pending requests and the
+        index. Returns the number of messages removed.
+        """
+        removed: Set[str] = set()
+        with self.store_lock:
+            for message_hash in message_hashes:
+                if message_hash in removed or message_hash not in self.db:
+                    continue
+                del self.db[message_hash]
+                removed.add(message_hash)
+            if removed:
+                positions: List[int] = [
+                    i for i, h in enumerate(self.inventory_log) if h in removed
+                ]
+                for peer, cursor in list(self.inventory_cursors.items()):
+                    self.inventory_cursors[peer] = cursor - bisect.bisect_left(
+                        positions, cursor
+                    )
+                self.inventory_log = [h for h in self.inventory_log if h not in removed]
+                if self.persistent:
+                    self.db_sync()
+        if self.retention is not None:
+            self.retention.forget(message_hashes)
+        if not removed:
+            return 0
+
+        self.wire_cache.discard(removed)
+        for message_hash in removed:
+            self.seen_cache.discard(message_hash)
+            self.pending_requests.pop(message_hash, None)
+            if self.anti_entropy is not None:
+                self.anti_entropy.remove(message_hash)
+        for known in list(self.known_by_peer.values()):
+            known.difference_update(removed)
+        if self.persistent and self.indexed and self.index_helper:
+            self.index_helper.remove_messages(list(removed))
+
+        if self.debug:
+            print(f"Node {self.port}: Removed {len(removed)} expired messages")
+        return len(removed)
+
+    def _relay(
+        self,
+        message_hash: str,
+        message_str: str,
+        origin: Optional[Tuple[str, int]] = None,
+    ) -> None:
+        """
+        Push a newly stored message to peers according to the gossip mode and
+        strategy. Messages we originate start with the strategy's TTL.
+        """
+        if origin is None:
+            ttl: Optional[int] = self.gossip_strategy.ttl
+        else:
+            origin = (origin[0], origin[1])
+            with self.encoded_cache_lock:
+                received_ttl: Optional[int] = self.relay_ttls.pop(message_hash, None)
+            ttl = self.gossip_strategy.next_ttl(received_ttl)
+        if ttl is not None and ttl <= 0:
+            return
+
+        peers: List[Tuple[str, int]] = self.gossip_strategy.relay_targets(
+            self.peers, origin
+        )
+        if self.gossip_mode == self.GOSSIP_INVENTORY:
+            self.announce_inventory([message_hash], peers)
+        else:
+            self._broadcast_encoded(
+                self._wire_bytes(message_hash, message_str), message_hash, peers, ttl
+            )
+
+    def _remember_ttl(self, data: bytes, ttl: int) -> None:
+        """
+        Keep the hop limit a message arrived with until it is relayed.
+        """
+        try:
+            if data[:2] == BINARY:
+                message_hash, _ = decode_binary_frame(data)
+            else:
+                message_hash = self.hash_message(data)
+        except (zlib.error, ValueError):
+            return  # rejected by the decode stage
+        self._remember_hash_ttl(message_hash, ttl)
+
+    def _remember_hash_ttl(self, message_hash: str, ttl: int) -> None:
+        with self.encoded_cache_lock:
+            self.relay_ttls[message_hash] = ttl
+            while len(self.relay_ttls) > self.ENCODED_CACHE_SIZE:
+                self.relay_ttls.popitem(last=False)
+
+    def _handle_peer_discovery(
+        self, shared_message: SharedMessage, addr: Tuple[str, int]
+    ) -> None:
         """
         Handle a PEER_DISCOVERY message by connecting to the discovered peer.
+        Capabilities are only recorded from the peer's own handshake, i.e.
+        when the announced address is the one the message came from.
         """
         peer_address: str = shared_message.data[SharedMessage.PEER_DISCOVERY]
         host: str
         port: str
         host, port = peer_address.split(":")
+        peer: Tuple[str, int] = (host, int(port))
+        capabilities: Optional[Capabilities] = Capabilities.from_dict(
+            shared_message.data.get(SharedMessage.HANDSHAKE)
+        )
+        if capabilities is None and SharedMessage.CODECS in shared_message.data:
+            # Nodes from before the handshake only announced their codecs
+            capabilities = Capabilities.legacy(
+                shared_message.data[SharedMessage.CODECS]
+            )
+        if capabilities is not None and peer == (addr[0], addr[1]):
+            self.peer_capabilities[peer] = capabilities
         self.connect_to_peer(host, int(port), discovery=True)
+        if peer not in self.handshakes_sent and peer != (self.host, self.port):
+            # Already a peer, so connect_to_peer did not answer
+            self.send_peer_discovery(host, int(port))
 
     def _handle_local_peer_request(self, shared_message: SharedMessage) -> None:
         """
@@ -457,7 +2174,7 @@ class ChaincraftNode:
         )
         response_message: str = response_object.to_json()
         compressed_message: bytes = self.compress_message(response_message)
-        self.socket.sendto(compressed_message, (host, int(port)))
+        self._sendto(compressed_message, (host, int(port)))
 
     def _handle_local_peer_response(
         self, shared_message: SharedMessage, addr: Tuple[str, int]
@@ -485,23 +2202,29 @@ class ChaincraftNode:
 
         try:
             shared_object: SharedMessage = SharedMessage.from_json(message)
-            message_type: type = type(shared_object.data)
-
-            # If the data is a dictionary, attempt to match the 'message_type' key.
-            for accepted_type in self.accepted_message_types:
-                if message_type == dict and self.is_valid_dict_message(
-                    shared_object.data, accepted_type
-                ):
-                    return True
-                elif (
-                    message_type in (str, int, float, bool, list, tuple)
-                    and message_type == accepted_type
-                ):
-                    return True
-
-            return False
         except json.JSONDecodeError:
             return False
+        return self.is_data_accepted(shared_object.data)
+
+    def is_data_accepted(self, data: Any) -> bool:
+        """
+        Check already-decoded message data against the accepted type schemas.
+        """
+        if not self.accepted_message_types:
+            return True
+
+        message_type: type = type(data)
+        # If the data is a dictionary, attempt to match the 'message_type' key.
+        for accepted_type in self.accepted_message_types:
+            if message_type == dict and self.is_valid_dict_message(data, accepted_type):
+                return True
+            elif (
+                message_type in (str, int, float, bool, list, tuple)
+                and message_type == accepted_type
+            ):
+                return True
+
+        return False
 
     def is_valid_dict_message(
         self, message_data: Dict[str, Any], accepted_type: Dict[str, Any]
@@ -576,6 +2299,7 @@ class ChaincraftNode:
         Handle invalid messages (increment counters, ban if too many).
         """
         peer: Tuple[str, int] = (addr[0], addr[1])
+        self.invalid_messages += 1
         if peer not in self.banned_peers:
             self.invalid_message_counts[peer] = (
                 self.invalid_message_counts.get(peer, 0) + 1
@@ -589,7 +2313,9 @@ class ChaincraftNode:
         """
         Ban a peer for 48 hours and remove it from our peer list.
         """
-        self.banned_peers[peer] = time.time() + 48 * 60 * 60
+        self.banned_peers[peer] = self.clock() + 48 * 60 * 60
+        self.bans += 1
+        self.packet_filter.ban(peer, self.banned_peers[peer])
         if peer in self.peers:
             self.peers.remove(peer)
         self.save_banned_peers()
@@ -624,12 +2350,20 @@ class ChaincraftNode:
                 raise SharedObjectException("Invalid message for shared objects")
 
         message: str = new_object.to_json()
-        message_hash: str = self.broadcast(message)
-        self.db[message_hash] = message
+        message_hash: str = self.hash_message(self.compress_message(message))
+        start: float = time.perf_counter() if self.metrics is not None else 0.0
+        self._store_message(message_hash, message)
+        if self.metrics is not None:
+            start = self._observe(self.store_latency, start, data)
+        self._relay(message_hash, message)
+        if self.metrics is not None:
+            start = self._observe(self.broadcast_latency, start, data)
 
         # Index the message if persistent and indexed are both True
         if self.persistent and self.indexed and self.index_helper:
             self.index_helper.index_message(message_hash, message)
+            if self.metrics is not None:
+                self._observe(self.index_latency, start, data)
 
         if self.persistent:
             self.db_sync()
@@ -643,9 +2377,12 @@ class ChaincraftNode:
 
     def db_sync(self) -> None:
         """
-        Close and reopen the DB if we're using dbm to ensure data is written.
+        Make the writes so far durable: a MessageStore syncs according to its
+        durability level, a plain dbm DB is closed and reopened.
         """
-        if self.persistent:
+        if isinstance(self.db, MessageStore):
+            self.db.sync()
+        elif self.persistent:
             self.db.close()
             self.db = dbm.ndbm.open(self.db_name, "c")
 
@@ -659,22 +2396,46 @@ class ChaincraftNode:
 
     def _load_db_value(self, key: bytes) -> str:
         """
-        Helper to load a string value from DB (decoding if persistent).
+        Helper to load a string value from DB (decoding dbm bytes).
         """
         value: Union[str, bytes] = self.db[key]
-        if self.persistent:
+        if isinstance(value, bytes):
             value = value.decode()
         return value
 
+    def _wire_bytes(
+        self, message_hash: str, message_str: Optional[str] = None
+    ) -> bytes:
+        """
+        Canonical bytes of a stored message, from the wire cache if possible,
+        else from message_str or the store (raises KeyError if not stored).
+        """
+        data: Optional[bytes] = self.wire_cache.get(message_hash)
+        if data is None:
+            if message_str is not None:
+                data = self.compress_message(message_str)
+            elif isinstance(self.db, MessageStore):
+                data = self.db.raw(message_hash)
+            else:
+                data = self.compress_message(self._load_db_value(message_hash))
+            self.wire_cache.put(message_hash, data)
+        return data
+
+    def _is_reserved_key(self, key: Union[str, bytes]) -> bool:
+        """
+        Whether a store key holds node metadata rather than a message.
+        """
+        if isinstance(key, bytes):
+            key = key.decode()
+        return key == self.PEERS or key == self.BANNED_PEERS
+
     def compress_message(self, message: str) -> bytes:
         """
-        Compress or encode a string message depending on use_compression flag.
+        Encode a message string as its canonical bytes. Compression is
+        applied per peer when sending (see _encode_for_peer).
         """
         if isinstance(message, str):
-            if self.use_compression:
-                return zlib.compress(message.encode())
-            else:
-                return message.encode()
+            return message.encode()
         else:
             raise TypeError(f"Expected str, got {type(message)}")
 
@@ -685,38 +2446,59 @@ class ChaincraftNode:
         if self.debug:
             print("🔄 Starting check_for_merkelized_objects loop")
         while self.is_running:
-            if self.debug:
-                print(f"🔍 Checking {len(self.shared_objects)} shared objects")
-            for obj in self.shared_objects:
-                if self.debug:
-                    print(f"📦 Examining object of type: {type(obj).__name__}")
-                if obj.is_merkelized():
-                    latest_digest: str = obj.get_latest_digest()
-                    class_name: str = type(obj).__name__
-                    if self.debug:
-                        print(
-                            f"✨ Found merkelized object - class: {class_name}, digest: {latest_digest[:8]}..."
-                        )
-                    self.request_shared_object_update(class_name, latest_digest)
-                elif self.debug:
-                    print(f"⏭️ Object {type(obj).__name__} is not merkelized")
+            self.check_merkelized_round()
             if self.debug:
                 print(f"💤 Sleeping for {self.gossip_interval} seconds")
             time.sleep(self.gossip_interval)  # Adjust the interval as needed
 
-    def request_shared_object_update(self, class_name: str, digest: str) -> None:
+    def check_merkelized_round(self) -> None:
+        """
+        Let the sync manager request updates for every merkelized shared object.
+        """
+        if self.debug:
+            print(f"🔍 Checking {len(self.shared_objects)} shared objects")
+        for obj in self.shared_objects:
+            if self.debug:
+                print(f"📦 Examining object of type: {type(obj).__name__}")
+            if obj.is_merkelized():
+                latest_digest: str = obj.get_latest_digest()
+                class_name: str = type(obj).__name__
+                if self.debug:
+                    print(
+                        f"✨ Found merkelized object - class: {class_name}, digest: {latest_digest[:8]}..."
+                    )
+                self._sync_shared_object(obj)
+            elif self.debug:
+                print(f"⏭️ Object {type(obj).__name__} is not merkelized")
+
+    def _sync_shared_object(self, obj: SharedObject) -> None:
         """
-        Request an update for a shared object with the given class name and digest.
+        Send the next catch-up request for a merkelized object, if any is due.
+        """
+        class_name: str = type(obj).__name__
+        latest_digest: str = obj.get_latest_digest()
+        peer: Optional[Tuple[str, int]] = self.sync_manager.next_request(
+            class_name, latest_digest, obj.has_digest, list(self.peers), self.clock()
+        )
+        if peer is not None:
+            self.request_shared_object_update(class_name, latest_digest, peer)
+
+    def request_shared_object_update(
+        self, class_name: str, digest: str, peer: Optional[Tuple[str, int]] = None
+    ) -> None:
+        """
+        Request an update for a shared object with the given class name and
+        digest: a batch from one peer, or from every peer if none is given.
         """
         if self.debug:
-            print(f"\n📤 Requesting update for {class_name} with digest {digest[:8]}...")
+            print(
+                f"\n📤 Requesting update for {class_name} with digest {digest[:8]}..."
+            )
+        request: Dict[str, Any] = {"class_name": class_name, "digest": digest}
+        if peer is not None:
+            request["limit"] = self.sync_manager.batch_size
         message: SharedMessage = SharedMessage(
-            data={
-                SharedMessage.REQUEST_SHARED_OBJECT_UPDATE: {
-                    "class_name": class_name,
-                    "digest": digest,
-                }
-            }
+            data={SharedMessage.REQUEST_SHARED_OBJECT_UPDATE: request}
         )
         message_json: str = message.to_json()
         if self.debug:
@@ -724,12 +2506,41 @@ class ChaincraftNode:
             print(f"📄 Content: {message_json}")
 
         try:
-            self.broadcast(message_json)  # Pass the JSON string directly to broadcast
+            if peer is None:
+                self.broadcast(message_json)
+            else:
+                self._sendto(self.compress_message(message_json), peer)
             if self.debug:
-                print(f"✅ Successfully broadcast update request for {class_name}")
+                print(f"✅ Successfully sent update request for {class_name}")
         except Exception as e:
             if self.debug:
-                print(f"❌ Failed to broadcast update request: {str(e)}")
+                print(f"❌ Failed to send update request: {str(e)}")
+
+    def _handle_shared_object_status(
+        self, status: Dict[str, Any], addr: Tuple[str, int]
+    ) -> None:
+        """
+        Record a peer's tip and, if the batch moved us forward, ask for the
+        next one right away.
+        """
+        class_name = status.get("class_name")
+        tip = status.get("tip")
+        if not isinstance(class_name, str) or not isinstance(tip, str):
+            return
+        self.sync_manager.on_status(
+            class_name,
+            (addr[0], addr[1]),
+            tip,
+            bool(status.get("known")),
+            self.clock(),
+        )
+        for obj in self.shared_objects:
+            if type(obj).__name__ == class_name and obj.is_merkelized():
+                if status.get("more") and obj.get_latest_digest() != status.get(
+                    "digest"
+                ):
+                    self._sync_shared_object(obj)
+                return
 
     def _handle_shared_object_update_request(
         self, shared_message: SharedMessage, addr: Tuple[str, int]
@@ -744,6 +2555,8 @@ class ChaincraftNode:
         ]
         class_name: str = request_data["class_name"]
         digest: str = request_data["digest"]
+        # Sync manager requests are bounded and answered with our tip
+        limit: Optional[int] = request_data.get("limit")
 
         if self.debug:
             print(
@@ -760,10 +2573,15 @@ class ChaincraftNode:
 
             if current_class == class_name:
                 matching_objects += 1
-                if obj.is_valid_digest(digest):
+                known: bool = obj.is_valid_digest(digest)
+                more: bool = False
+                if known:
                     if self.debug:
                         print(f"✅ Found matching object with valid digest")
                     messages_to_gossip: List[SharedMessage] = obj.gossip_object(digest)
+                    if isinstance(limit, int) and limit > 0:
+                        more = len(messages_to_gossip) > limit
+                        messages_to_gossip = messages_to_gossip[:limit]
                     if self.debug:
                         print(f"📨 Got {len(messages_to_gossip)} messages to gossip")
 
@@ -775,7 +2593,7 @@ class ChaincraftNode:
                                     f"📤 Sending next hash {idx + 1}/{len(messages_to_gossip)} to {addr}: {message.data[:8]}..."
                                 )
                             compressed_message: bytes = self.compress_message(json_msg)
-                            self.socket.sendto(compressed_message, addr)
+                            self._send_sync(compressed_message, addr)
                             if self.debug:
                                 print(f"✅ Send to {addr} successful")
                         except Exception as e:
@@ -785,6 +2603,20 @@ class ChaincraftNode:
                                 )
                 elif self.debug:
                     print(f"❌ Invalid digest {digest[:8]}...")
+                if limit is not None:
+                    status_message = json.dumps(
+                        {
+                            SharedMessage.SHARED_OBJECT_STATUS: {
+                                "class_name": class_name,
+                                "digest": digest,
+                                "tip": obj.get_latest_digest(),
+                                "known": known,
+                                "more": more,
+                            }
+                        }
+                    )
+                    # Same channel as the batch, so it arrives after it
+                    self._send_sync(self.compress_message(status_message), addr)
 
         if matching_objects == 0 and self.debug:
             print(f"⚠️ No matching objects found for class {class_name}")
@@ -0,0 +1,137 @@
+# pipeline.py
+
+"""
+Threaded receive path. ChaincraftNode(validation_workers=N) moves decoding
+and schema checks off the socket thread into N worker threads fed by a
+bounded queue of receive_queue_size datagrams; 0 keeps the inline path.
+"""
+
+import queue
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class ReceivePipeline:
+    """
+    Staged receive path for a ChaincraftNode.
+
+    The socket thread only calls submit(), which puts the datagram on a bounded
+    queue (or counts a drop when it is full). A pool of worker threads runs the
+    decode stage (hash, dedup, decompress, JSON parse, schema check) in
+    parallel, and a single commit thread applies the results in the order the
+    datagrams were received: control messages, SharedObject validation,
+    storage, indexing and relaying.
+
+    SharedObject.is_valid stays in the commit stage because every shared object
+    in this repo validates against state built by earlier messages (chain tips,
+    nonces, membership), so it has to see them committed in order.
+    """
+
+    def __init__(self, node: Any, workers: int = 2, queue_size: int = 1024) -> None:
+        self.node = node
+        self.workers: int = workers
+        self.queue_size: int = queue_size
+        self.inbound: "queue.Queue[Optional[Tuple[int, bytes, Tuple[str, int]]]]" = (
+            queue.Queue(maxsize=queue_size)
+        )
+
+        # Decoded results waiting for their turn in the commit stage
+        self._decoded: Dict[int, Tuple[Optional[tuple], Tuple[str, int]]] = {}
+        self._decoded_ready = threading.Condition()
+        self._submit_lock = threading.Lock()
+        self._next_sequence: int = 0
+        self._next_commit: int = 0
+        self._threads: List[threading.Thread] = []
+        self.is_running: bool = False
+
+        self.received: int = 0
+        self.dropped: int = 0
+        self.duplicates: int = 0
+        self.committed: int = 0
+
+    def start(self) -> None:
+        """
+        Start the worker pool and the commit thread.
+        """
+        if self.is_running:
+            return
+        self.is_running = True
+        for _ in range(self.workers):
+            thread = threading.Thread(target=self._decode_worker, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._commit_worker, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def stop(self) -> None:
+        """
+        Stop all pipeline threads. Queued datagrams are discarded.
+        """
+        self.is_running = False
+        for _ in range(self.workers):
+            try:
+                self.inbound.put_nowait(None)
+            except queue.Full:
+                break
+        with self._decoded_ready:
+            self._decoded_ready.notify_all()
+
+    def submit(self, data: bytes, addr: Tuple[str, int]) -> bool:
+        """
+        Enqueue a datagram without blocking. Returns False if it was dropped
+        because the queue is full.
+        """
+        with self._submit_lock:
+            self.received += 1
+            try:
+                self.inbound.put_nowait((self._next_sequence, data, addr))
+            except queue.Full:
+                self.dropped += 1
+                return False
+            self._next_sequence += 1
+            return True
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return queue depths and counters.
+        """
+        return {
+            "queue_depth": self.inbound.qsize(),
+            "commit_backlog": len(self._decoded),
+            "received": self.received,
+            "dropped": self.dropped,
+            "duplicates": self.duplicates,
+            "committed": self.committed,
+        }
+
+    def _decode_worker(self) -> None:
+        while self.is_running:
+            item = self.inbound.get()
+            if item is None:
+                break
+            sequence, data, addr = item
+            try:
+                decoded = self.node._decode_datagram(data)
+            except Exception as e:
+                print(f"❌ Error decoding message: {str(e)}")
+                decoded = (None, False, "", "")
+            with self._decoded_ready:
+                self._decoded[sequence] = (decoded, addr)
+                self._decoded_ready.notify_all()
+
+    def _commit_worker(self) -> None:
+        while self.is_running:
+            with self._decoded_ready:
+                while self.is_running and self._next_commit not in self._decoded:
+                    self._decoded_ready.wait(timeout=0.5)
+                if not self.is_running:
+                    break
+                decoded, addr = self._decoded.pop(self._next_commit)
+                self._next_commit += 1
+
+            if decoded is None:
+                self.duplicates += 1
+                continue
+            self.node._commit_message(*decoded, addr)
+            self.committed += 1
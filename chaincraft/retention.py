@@ -0,0 +1,156 @@
+# retention.py
+
+"""
+Garbage collection of the message store. With a RetentionPolicy, every
+policy.interval seconds the gossip thread removes the messages whose
+RetentionRule expired (max age, max count per message type, or finalized by
+a SharedObject) from the store, the seen cache, the inventory and the index.
+Without one nothing is ever deleted.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+
+def message_type_of(data: Any, field: str = "message_type") -> Optional[str]:
+    """
+    The message_type of dict messages (as used by accepted_message_types and
+    the index), or whichever string `field` they carry instead, None for
+    everything else.
+    """
+    if isinstance(data, dict):
+        message_type = data.get(field)
+        if isinstance(message_type, str):
+            return message_type
+    return None
+
+
+class RetentionRule:
+    """
+    How long stored messages of one type are kept: at most `max_age` seconds
+    after the node stored them, only the `max_count` most recent ones, and/or
+    until a SharedObject reports them finalized (`until_finalized`). A rule
+    with message_type None applies to every message without a rule of its
+    own, including non-dict messages.
+    """
+
+    def __init__(
+        self,
+        message_type: Optional[str] = None,
+        max_age: Optional[float] = None,
+        max_count: Optional[int] = None,
+        until_finalized: bool = False,
+    ) -> None:
+        if max_age is None and max_count is None and not until_finalized:
+            raise ValueError("A retention rule needs max_age, max_count or finalized")
+        self.message_type: Optional[str] = message_type
+        self.max_age: Optional[float] = max_age
+        self.max_count: Optional[int] = max_count
+        self.until_finalized: bool = until_finalized
+
+
+class RetentionPolicy:
+    """
+    Retention rules plus the bookkeeping to apply them.
+
+    The node records every stored message that a rule applies to, and every
+    `interval` seconds asks for the expired ones and removes them from the
+    store, the seen cache and the index. Messages no rule applies to are
+    kept forever and cost nothing here.
+
+    Removed hashes are kept as tombstones (the most recent `tombstones` of
+    them), so a peer that still has an expired message cannot make us store
+    it again.
+
+    Rules match the `type_field` of dict messages, "message_type" unless the
+    application names its types differently (e.g. "type").
+    """
+
+    def __init__(
+        self,
+        rules: Sequence[RetentionRule],
+        interval: float = 5.0,
+        tombstones: int = 65536,
+        type_field: str = "message_type",
+    ) -> None:
+        self.type_field: str = type_field
+        self.rules: Dict[Optional[str], RetentionRule] = {
+            rule.message_type: rule for rule in rules
+        }
+        self.interval: float = interval
+        self.max_tombstones: int = tombstones
+        # rule key -> message hash -> stored at, oldest first
+        self.entries: Dict[Optional[str], "OrderedDict[str, float]"] = {
+            key: OrderedDict() for key in self.rules
+        }
+        self.tombstones: "OrderedDict[str, None]" = OrderedDict()
+        self.lock = threading.Lock()
+
+        self.removed: int = 0
+
+    def rule_key(self, message_type: Optional[str]) -> Optional[str]:
+        """
+        Key of the rule that applies to a message type, or "" if none does.
+        """
+        if message_type is not None and message_type in self.rules:
+            return message_type
+        return None if None in self.rules else ""
+
+    def record(
+        self, message_hash: str, message_type: Optional[str], now: float
+    ) -> None:
+        key: Optional[str] = self.rule_key(message_type)
+        if key == "":
+            return
+        with self.lock:
+            self.entries[key][message_hash] = now
+
+    def expired(self, now: float, is_finalized: Callable[[str], bool]) -> List[str]:
+        """
+        Hashes of the recorded messages that should be removed now.
+        """
+        expired: List[str] = []
+        with self.lock:
+            for key, entries in self.entries.items():
+                rule: RetentionRule = self.rules[key]
+                excess: int = 0
+                if rule.max_count is not None:
+                    excess = max(0, len(entries) - rule.max_count)
+                for position, (message_hash, stored_at) in enumerate(entries.items()):
+                    if position < excess:
+                        expired.append(message_hash)
+                    elif rule.max_age is not None and now - stored_at > rule.max_age:
+                        expired.append(message_hash)
+                    elif not rule.until_finalized:
+                        # Entries are in storage order, the rest are younger
+                        break
+                    elif is_finalized(message_hash):
+                        expired.append(message_hash)
+        return expired
+
+    def forget(self, message_hashes: Sequence[str]) -> None:
+        """
+        Stop tracking removed messages and remember them as tombstones.
+        """
+        with self.lock:
+            for message_hash in message_hashes:
+                for entries in self.entries.values():
+                    entries.pop(message_hash, None)
+                self.tombstones[message_hash] = None
+                self.tombstones.move_to_end(message_hash)
+                self.removed += 1
+            while len(self.tombstones) > self.max_tombstones:
+                self.tombstones.popitem(last=False)
+
+    def was_removed(self, message_hash: str) -> bool:
+        with self.lock:
+            return message_hash in self.tombstones
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                "tracked": sum(len(entries) for entries in self.entries.values()),
+                "tombstones": len(self.tombstones),
+                "removed": self.removed,
+            }
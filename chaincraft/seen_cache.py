@@ -0,0 +1,209 @@
+# seen_cache.py
+
+"""
+Duplicate detection from memory, so the message store is only read when
+the cache cannot decide.
+"""
+
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter sized for `capacity` keys at `false_positive_rate`.
+    """
+
+    def __init__(self, capacity: int, false_positive_rate: float) -> None:
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        if not 0 < false_positive_rate < 1:
+            raise ValueError("false_positive_rate must be between 0 and 1")
+        self.num_bits: int = max(
+            8,
+            int(-capacity * math.log(false_positive_rate) / (math.log(2) ** 2)),
+        )
+        self.num_hashes: int = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count: int = 0
+
+    def _positions(self, key: str):
+        digest: bytes = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1: int = int.from_bytes(digest[:8], "big")
+        h2: int = int.from_bytes(digest[8:], "big") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, key: str) -> None:
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+    @property
+    def memory_bytes(self) -> int:
+        return len(self.bits)
+
+
+class SeenCache:
+    """
+    In-memory answer to "have we already seen this message hash?".
+
+    Two Bloom filter generations cover the most recent messages: once the
+    current generation holds `capacity` keys (or is older than `max_age`
+    seconds), the previous one is dropped and a fresh one started, so memory
+    stays bounded at two filters plus an exact LRU of `lru_size` hashes.
+
+    A hash in the LRU is a definite hit. A hash missing from both filters is a
+    definite miss as long as no generation has been dropped yet; a miss after
+    rotation is resolved by the fallback lookup passed to seen(), normally
+    the message store.
+
+    A Bloom "maybe" is checked with the fallback too, so a false positive
+    can never cause a new message to be discarded. Setting
+    `verify_positives` to False counts a "maybe" as seen instead, which
+    saves the store read for duplicates that left the LRU, but then about
+    `false_positive_rate` of new messages are dropped for good.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 100000,
+        false_positive_rate: float = 0.001,
+        lru_size: int = 10000,
+        max_age: Optional[float] = None,
+        verify_positives: bool = True,
+    ) -> None:
+        self.capacity: int = capacity
+        self.false_positive_rate: float = false_positive_rate
+        self.lru_size: int = lru_size
+        self.max_age: Optional[float] = max_age
+        self.verify_positives: bool = verify_positives
+
+        self.current = BloomFilter(capacity, false_positive_rate)
+        self.previous: Optional[BloomFilter] = None
+        self.current_started: float = time.time()
+        # False once keys have been forgotten, so a Bloom miss is no longer final
+        self.complete: bool = True
+        self.lru: "OrderedDict[str, None]" = OrderedDict()
+        self.lock = threading.Lock()
+
+        self.lru_hits: int = 0
+        self.bloom_hits: int = 0
+        self.bloom_misses: int = 0
+        self.fallback_lookups: int = 0
+        self.false_positives: int = 0
+
+    def add(self, message_hash: str) -> None:
+        """
+        Record a hash as seen.
+        """
+        with self.lock:
+            self._add(message_hash)
+
+    def discard(self, message_hash: str) -> None:
+        """
+        Forget a hash that was removed from the store. Bloom filters cannot
+        delete keys, so later lookups of it are checked with the store
+        (without verify_positives it counts as seen until its generation is
+        dropped).
+        """
+        with self.lock:
+            self.lru.pop(message_hash, None)
+
+    def check(self, message_hash: str) -> Optional[bool]:
+        """
+        Answer from memory only: True (seen), False (never seen) or None if
+        the store has to be consulted.
+        """
+        with self.lock:
+            if message_hash in self.lru:
+                self.lru.move_to_end(message_hash)
+                self.lru_hits += 1
+                return True
+            if self._maybe_contains(message_hash):
+                if self.verify_positives:
+                    return None
+                self.bloom_hits += 1
+                return True
+            if self.complete:
+                self.bloom_misses += 1
+                return False
+            return None
+
+    def seen(self, message_hash: str, fallback: Callable[[str], bool]) -> bool:
+        """
+        Return whether a hash was seen, calling fallback(hash) only when the
+        in-memory structures cannot decide.
+        """
+        result: Optional[bool] = self.check(message_hash)
+        if result is not None:
+            return result
+
+        found: bool = fallback(message_hash)
+        with self.lock:
+            self.fallback_lookups += 1
+            if found:
+                self._add(message_hash)
+            elif self._maybe_contains(message_hash):
+                self.false_positives += 1
+        return found
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return hit/miss counters and the memory used by the filters and LRU.
+        """
+        with self.lock:
+            bloom_bytes: int = self.current.memory_bytes + (
+                self.previous.memory_bytes if self.previous else 0
+            )
+            return {
+                "lru_hits": self.lru_hits,
+                "bloom_hits": self.bloom_hits,
+                "bloom_misses": self.bloom_misses,
+                "fallback_lookups": self.fallback_lookups,
+                "false_positives": self.false_positives,
+                "lru_entries": len(self.lru),
+                "bloom_bytes": bloom_bytes,
+            }
+
+    def max_memory_bytes(self) -> int:
+        """
+        Upper bound on filter memory (two generations), excluding the LRU.
+        """
+        return 2 * self.current.memory_bytes
+
+    def _add(self, message_hash: str) -> None:
+        if (
+            self.current.count >= self.capacity
+            or self.max_age is not None
+            and time.time() - self.current_started > self.max_age
+        ):
+            self._rotate()
+        if message_hash not in self.current:
+            self.current.add(message_hash)
+        self.lru[message_hash] = None
+        self.lru.move_to_end(message_hash)
+        while len(self.lru) > self.lru_size:
+            self.lru.popitem(last=False)
+
+    def _maybe_contains(self, message_hash: str) -> bool:
+        return message_hash in self.current or (
+            self.previous is not None and message_hash in self.previous
+        )
+
+    def _rotate(self) -> None:
+        if self.previous is not None and self.previous.count:
+            self.complete = False
+        self.previous = self.current
+        self.current = BloomFilter(self.capacity, self.false_positive_rate)
+        self.current_started = time.time()
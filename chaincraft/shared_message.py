@@ -1,9 +1,11 @@
 # shared_message.py
 
 from dataclasses import dataclass
-from typing import Any
+from typing import Any, Optional
 import json
 
+from .codec import Codec, JSONCodec
+
 
 @dataclass
 class SharedMessage:
@@ -13,6 +15,18 @@ class SharedMessage:
     REQUEST_LOCAL_PEERS = "REQUEST_LOCAL_PEERS"
     LOCAL_PEERS = "LOCAL_PEERS"
     REQUEST_SHARED_OBJECT_UPDATE = "REQUEST_SHARED_OBJECT_UPDATE"
+    SHARED_OBJECT_STATUS = "SHARED_OBJECT_STATUS"
+    INVENTORY = "INVENTORY"
+    REQUEST_MESSAGES = "REQUEST_MESSAGES"
+    COMPRESSION_DICTIONARY = "COMPRESSION_DICTIONARY"
+    COMPRESSION_ACK = "COMPRESSION_ACK"
+    CODECS = "CODECS"
+    HANDSHAKE = "HANDSHAKE"
+    PULL = "PULL"
+    SYNC_TREE = "SYNC_TREE"
+    SYNC_BUCKETS = "SYNC_BUCKETS"
+    SKETCH = "SKETCH"
+    SKETCH_REQUEST = "SKETCH_REQUEST"
 
     def to_json(self):
         return json.dumps(self.data)
@@ -20,3 +34,10 @@ class SharedMessage:
     @classmethod
     def from_json(cls, json_str):
         return cls(data=json.loads(json_str))
+
+    def to_bytes(self, codec: Optional[Codec] = None) -> bytes:
+        return (codec or JSONCodec()).encode(self.data)
+
+    @classmethod
+    def from_bytes(cls, payload: bytes, codec: Optional[Codec] = None):
+        return cls(data=(codec or JSONCodec()).decode(payload))
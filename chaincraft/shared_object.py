@@ -1,7 +1,16 @@
 # shared_object.py
 
+"""
+Shared objects validate and integrate messages. Stateless checks they
+declare (stateless_check, e.g. signatures) run in a process pool during the
+decode stage when the node has precheck_processes, and only the stateful
+part of the validation runs in the commit stage. The checks run in
+parallel when several messages are decoded at once (validation_workers);
+receive_processes workers run them inline.
+"""
+
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Sequence
 
 from .shared_message import SharedMessage
 
@@ -10,11 +19,38 @@ class SharedObjectException(Exception):
     pass
 
 
+# Pure check of a message's data, e.g. signatures or proof of work
+StatelessCheck = Callable[[Any], bool]
+
+
 class SharedObject(ABC):
     @abstractmethod
     def is_valid(self, message: SharedMessage) -> bool:
         raise SharedObjectException("is_valid method not implemented")
 
+    def stateless_check(self) -> Optional[StatelessCheck]:
+        """
+        Optional part of is_valid that only looks at the message data. It must
+        be picklable (a module-level function or a functools.partial of one),
+        since the node may run it in a worker process. When it passes, the
+        node calls is_valid_stateful instead of is_valid.
+        """
+        return None
+
+    def is_valid_stateful(self, message: SharedMessage) -> bool:
+        """
+        The rest of is_valid, for messages that passed stateless_check().
+        """
+        return self.is_valid(message)
+
+    def is_finalized(self, message: SharedMessage) -> bool:
+        """
+        Whether a stored message is no longer needed by this object, e.g. a
+        transaction included in a block. Retention rules with
+        until_finalized remove messages once a SharedObject says so.
+        """
+        return False
+
     @abstractmethod
     def add_message(self, message: SharedMessage) -> None:
         raise SharedObjectException("add_message method not implemented")
@@ -46,3 +82,13 @@ class SharedObject(ABC):
     @abstractmethod
     def get_messages_since_digest(self, digest: str) -> List[SharedMessage]:
         raise SharedObjectException("get_messages_since_digest method not implemented")
+
+
+def run_stateless_checks(checks: Sequence[StatelessCheck], data: Any) -> bool:
+    """
+    Run stateless checks on message data; a check that raises fails.
+    """
+    try:
+        return all(check(data) for check in checks)
+    except Exception:
+        return False
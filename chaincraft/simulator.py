@@ -0,0 +1,308 @@
+# simulator.py
+
+"""
+In-process network simulator. Simulated nodes share a MemoryNetwork and
+take the simulator's virtual clock as their clock, which drives every
+protocol timer (retries, anti-entropy and sketch intervals, fragment
+expiry).
+"""
+
+import heapq
+import itertools
+import math
+import queue
+import random
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from .gossip import random_topology
+from .node import ChaincraftNode
+from .seen_cache import SeenCache
+from .transport import Transport
+
+Address = Tuple[str, int]
+
+BASE_PORT: int = 10000  # simulated node i listens on 127.0.0.1:BASE_PORT + i
+
+
+class LinkConfig:
+    """
+    One-way link properties: `latency` seconds plus up to `jitter` seconds of
+    uniform random delay, the probability `loss` of dropping a datagram, and
+    `bandwidth` in bytes per second (None: unlimited). A link sends one
+    datagram at a time, so with a bandwidth datagrams queue behind each
+    other.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.01,
+        jitter: float = 0.0,
+        loss: float = 0.0,
+        bandwidth: Optional[float] = None,
+    ) -> None:
+        if not 0 <= loss <= 1:
+            raise ValueError("loss must be between 0 and 1")
+        self.latency: float = latency
+        self.jitter: float = jitter
+        self.loss: float = loss
+        self.bandwidth: Optional[float] = bandwidth
+
+
+class MemoryNetwork:
+    """
+    In-memory datagram network driven by a virtual clock.
+
+    MemoryTransports bound to the network send through it. Each datagram is
+    dropped or delayed according to its link and delivered when the clock
+    reaches its arrival time. Nothing happens in real time: run() jumps the
+    clock from event to event, and also fires the callbacks registered with
+    schedule(). All randomness comes from `seed`, so a run is reproducible.
+    """
+
+    def __init__(self, default_link: Optional[LinkConfig] = None, seed: int = 0):
+        self.default_link: LinkConfig = default_link or LinkConfig()
+        self.links: Dict[Tuple[Address, Address], LinkConfig] = {}
+        self.transports: Dict[Address, "MemoryTransport"] = {}
+        self.rng = random.Random(seed)
+        self.now: float = 0.0
+        # (time, sequence, callback, args); the sequence keeps ties in order
+        self.events: List[Tuple[float, int, Callable[..., None], tuple]] = []
+        self.sequence = itertools.count()
+        # When each link finishes sending its queued datagrams
+        self.busy_until: Dict[Tuple[Address, Address], float] = {}
+
+        self.bytes_sent: int = 0
+        self.datagrams_sent: int = 0
+        self.datagrams_lost: int = 0
+        self.datagrams_delivered: int = 0
+
+    def clock(self) -> float:
+        return self.now
+
+    def set_link(self, src: Address, dst: Address, link: LinkConfig) -> None:
+        self.links[(src, dst)] = link
+
+    def link(self, src: Address, dst: Address) -> LinkConfig:
+        return self.links.get((src, dst), self.default_link)
+
+    def schedule(self, delay: float, callback: Callable[..., None], *args) -> None:
+        """
+        Call callback(*args) after `delay` seconds of virtual time.
+        """
+        heapq.heappush(
+            self.events, (self.now + delay, next(self.sequence), callback, args)
+        )
+
+    def send(self, src: Address, dst: Address, data: bytes) -> None:
+        self.datagrams_sent += 1
+        self.bytes_sent += len(data)
+        link: LinkConfig = self.link(src, dst)
+        if link.loss and self.rng.random() < link.loss:
+            self.datagrams_lost += 1
+            return
+        sent_at: float = self.now
+        if link.bandwidth:
+            sent_at = max(sent_at, self.busy_until.get((src, dst), 0.0))
+            sent_at += len(data) / link.bandwidth
+            self.busy_until[(src, dst)] = sent_at
+        delay: float = sent_at - self.now + link.latency
+        if link.jitter:
+            delay += self.rng.uniform(0, link.jitter)
+        self.schedule(delay, self._deliver, src, dst, data)
+
+    def _deliver(self, src: Address, dst: Address, data: bytes) -> None:
+        transport: Optional[MemoryTransport] = self.transports.get(dst)
+        if transport is None:
+            self.datagrams_lost += 1
+            return
+        self.datagrams_delivered += 1
+        transport.deliver(data, src)
+
+    def run(self, until: float) -> int:
+        """
+        Process every event up to virtual time `until`, then set the clock to
+        it. Returns the number of events processed.
+        """
+        processed: int = 0
+        while self.events and self.events[0][0] <= until:
+            at, _, callback, args = heapq.heappop(self.events)
+            self.now = at
+            callback(*args)
+            processed += 1
+        self.now = max(self.now, until)
+        return processed
+
+
+class MemoryTransport(Transport):
+    """
+    Transport over a MemoryNetwork. Received datagrams go to `handler` if one
+    is set (the simulator calls the node directly), otherwise to an inbox
+    read by recvfrom(), for nodes running their own listener thread.
+    """
+
+    def __init__(self, network: MemoryNetwork) -> None:
+        self.network: MemoryNetwork = network
+        self.local_addr: Optional[Address] = None
+        self.handler: Optional[Callable[[bytes, Address], None]] = None
+        self.inbox: "queue.Queue[Optional[Tuple[bytes, Address]]]" = queue.Queue()
+
+    def bind(self, host: str, port: int) -> None:
+        if (host, port) in self.network.transports:
+            raise OSError(f"Address already in use: {host}:{port}")
+        self.local_addr = (host, port)
+        self.network.transports[self.local_addr] = self
+
+    def sendto(self, data: bytes, addr: Tuple[str, int]) -> None:
+        self.network.send(self.local_addr, (addr[0], addr[1]), data)
+
+    def recvfrom(self, bufsize: int) -> Tuple[bytes, Tuple[str, int]]:
+        item = self.inbox.get()
+        if item is None:
+            raise OSError("Transport closed")
+        data, addr = item
+        return data[:bufsize], addr
+
+    def deliver(self, data: bytes, addr: Address) -> None:
+        if self.handler is not None:
+            self.handler(data, addr)
+        else:
+            self.inbox.put((data, addr))
+
+    def close(self) -> None:
+        if self.network.transports.get(self.local_addr) is self:
+            del self.network.transports[self.local_addr]
+        self.inbox.put(None)
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """
+    Nearest-rank percentile (q in 0..100) of values, or inf if empty.
+    """
+    if not values:
+        return float("inf")
+    ordered: List[float] = sorted(values)
+    rank: int = min(max(1, math.ceil(len(ordered) * q / 100)), len(ordered))
+    return ordered[rank - 1]
+
+
+def default_node(index: int, **kwargs: Any) -> ChaincraftNode:
+    # A small seen cache keeps a thousand nodes within a few tens of MB
+    return ChaincraftNode(seen_cache=SeenCache(capacity=10000), **kwargs)
+
+
+class Simulator:
+    """
+    Deterministic simulation of `num_nodes` ChaincraftNodes on a MemoryNetwork.
+
+    Nodes are created by node_factory(index, **kwargs), where kwargs carries
+    the port, transport and clock the node must be constructed with (see
+    default_node). They are never started: no sockets, no threads. Datagrams
+    are handed to node._process_datagram on delivery and every node runs a
+    gossip round each `gossip_interval` of virtual time, at a random phase.
+    Peers come from a connected random topology of the given degree.
+
+    Nodes pick some peers with the global random module, so it is seeded
+    with `seed` as well; two simulators built and run the same way produce
+    the same results.
+    """
+
+    def __init__(
+        self,
+        num_nodes: int,
+        degree: int = 8,
+        link: Optional[LinkConfig] = None,
+        gossip_interval: float = 0.5,
+        seed: int = 0,
+        node_factory: Callable[..., ChaincraftNode] = default_node,
+    ) -> None:
+        random.seed(seed)
+        rng = random.Random(seed)
+        self.network: MemoryNetwork = MemoryNetwork(link, seed)
+        self.gossip_interval: float = gossip_interval
+        self.nodes: List[ChaincraftNode] = []
+        self.addresses: List[Address] = []
+        # message hash -> (origin time, node index -> arrival time)
+        self.arrivals: Dict[str, Tuple[float, Dict[int, float]]] = {}
+        # message hash -> network (bytes, datagrams) sent before it
+        self.sent_before: Dict[str, Tuple[int, int]] = {}
+        # Tracked messages each node has not received yet
+        self.missing: Dict[str, Set[int]] = {}
+
+        for index in range(num_nodes):
+            transport = MemoryTransport(self.network)
+            node: ChaincraftNode = node_factory(
+                index,
+                port=BASE_PORT + index,
+                transport=transport,
+                clock=self.network.clock,
+            )
+            transport.bind(node.host, node.port)
+            transport.handler = self._make_handler(index, node)
+            self.nodes.append(node)
+            self.addresses.append((node.host, node.port))
+
+        for index, neighbours in enumerate(random_topology(num_nodes, degree, rng)):
+            self.nodes[index].peers = [self.addresses[j] for j in neighbours]
+        for index in range(num_nodes):
+            self.network.schedule(rng.uniform(0, gossip_interval), self._tick, index)
+
+    def _make_handler(
+        self, index: int, node: ChaincraftNode
+    ) -> Callable[[bytes, Address], None]:
+        def handle(data: bytes, addr: Address) -> None:
+            node._process_datagram(data, addr)
+            for message_hash, missing in self.missing.items():
+                if index in missing and message_hash in node.db:
+                    missing.discard(index)
+                    self.arrivals[message_hash][1][index] = self.network.now
+
+        return handle
+
+    def _tick(self, index: int) -> None:
+        node: ChaincraftNode = self.nodes[index]
+        try:
+            node.gossip_round()
+            node.check_merkelized_round()
+        except Exception as e:
+            print(f"Error in gossip: {e}")
+        self.network.schedule(self.gossip_interval, self._tick, index)
+
+    def publish(self, data: Any, origin: int = 0) -> str:
+        """
+        Create a message on node `origin` now and track its propagation.
+        """
+        message_hash, _ = self.nodes[origin].create_shared_message(data)
+        now: float = self.network.now
+        self.arrivals[message_hash] = (now, {origin: now})
+        self.sent_before[message_hash] = (
+            self.network.bytes_sent,
+            self.network.datagrams_sent,
+        )
+        self.missing[message_hash] = set(range(len(self.nodes))) - {origin}
+        return message_hash
+
+    def run(self, duration: float) -> None:
+        """
+        Advance the simulation by `duration` seconds of virtual time.
+        """
+        self.network.run(self.network.now + duration)
+
+    def report(self, message_hash: str) -> Dict[str, float]:
+        """
+        Propagation of a published message: coverage, latency percentiles
+        (seconds from publication to arrival, over the nodes reached), and
+        the bytes and datagrams sent on the network since it was published.
+        """
+        origin_time, arrivals = self.arrivals[message_hash]
+        latencies: List[float] = [at - origin_time for at in arrivals.values()]
+        bytes_before, datagrams_before = self.sent_before[message_hash]
+        return {
+            "nodes": len(self.nodes),
+            "coverage": len(arrivals) / len(self.nodes),
+            "p50": percentile(latencies, 50),
+            "p90": percentile(latencies, 90),
+            "p99": percentile(latencies, 99),
+            "max": max(latencies),
+            "bytes": self.network.bytes_sent - bytes_before,
+            "datagrams": self.network.datagrams_sent - datagrams_before,
+        }
@@ -0,0 +1,256 @@
+# store.py
+
+"""
+Message stores. A node keeps its messages in a dict, or in a dbm.ndbm
+database that is closed and reopened on every sync when persistent. A
+MessageStore given as store, e.g. SQLiteStore for group-committed writes,
+replaces that choice, and the node's persistence follows store.persistent.
+"""
+
+import dbm.ndbm
+import sqlite3
+import threading
+import time
+from collections.abc import MutableMapping
+from typing import Iterator, List, Optional, Union
+
+Key = Union[str, bytes]
+
+DURABILITY_FULL: str = "full"
+DURABILITY_NORMAL: str = "normal"
+DURABILITY_OFF: str = "off"
+DURABILITY_LEVELS = (DURABILITY_FULL, DURABILITY_NORMAL, DURABILITY_OFF)
+
+
+def _text(value: Key) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class MessageStore(MutableMapping):
+    """
+    Where a node keeps its messages (hash -> message JSON) and its PEERS /
+    BANNED_PEERS metadata.
+
+    A store is a mapping; keys and values may be given as str or bytes and
+    are returned as str, or as bytes by raw(). sync() is called by the
+    node after writes that should be durable and does whatever the
+    backend's durability level requires; flush() makes every write so far
+    durable now; close() flushes and releases the store.
+    """
+
+    # Whether the store outlives the process (peers and bans are saved too)
+    persistent: bool = True
+
+    def raw(self, key: Key) -> bytes:
+        """
+        A message's canonical wire bytes (its hash is the key).
+        """
+        return self[key].encode()
+
+    def sync(self) -> None:
+        pass
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class DictStore(dict, MessageStore):
+    """
+    In-memory store, the default of non-persistent nodes.
+    """
+
+    persistent: bool = False
+
+
+class DbmStore(MessageStore):
+    """
+    dbm.ndbm database at `path`. dbm has no way to flush without closing, so
+    sync() closes and reopens the file: every synced write costs a reopen.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path: str = path
+        self.db = dbm.ndbm.open(path, "c")
+
+    def __getitem__(self, key: Key) -> str:
+        return self.db[key].decode()
+
+    def __setitem__(self, key: Key, value: Key) -> None:
+        self.db[key] = value
+
+    def __delitem__(self, key: Key) -> None:
+        del self.db[key]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.db
+
+    def __iter__(self) -> Iterator[str]:
+        return (key.decode() for key in self.db.keys())
+
+    def __len__(self) -> int:
+        return len(self.db)
+
+    def sync(self) -> None:
+        self.flush()
+
+    def flush(self) -> None:
+        self.db.close()
+        self.db = dbm.ndbm.open(self.path, "c")
+
+    def close(self) -> None:
+        self.db.close()
+
+
+class SQLiteStore(MessageStore):
+    """
+    SQLite database at `path` in WAL mode, with group commit.
+
+    Writes join an open transaction that is committed once it holds
+    `max_batch` writes or its first write is `max_delay` seconds old (a
+    background thread commits idle batches), so one commit, and one WAL
+    sync, covers many messages. Reads see uncommitted writes.
+
+    durability picks what a crash can lose:
+
+    - "full": every write is committed on its own and synced to disk
+      before it returns (synchronous=FULL); nothing is lost, but each
+      write pays an fsync.
+    - "normal": group commit; committed batches survive a crash of the
+      process, a power loss may also lose the last batches before the WAL
+      checkpoint (synchronous=NORMAL). At most the open batch, i.e.
+      max_delay seconds of writes, is lost when the process dies.
+    - "off": group commit without any syncs (synchronous=OFF); the
+      fastest, but a power loss or OS crash can corrupt the database.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        durability: str = DURABILITY_NORMAL,
+        max_batch: int = 1000,
+        max_delay: float = 0.05,
+    ) -> None:
+        if durability not in DURABILITY_LEVELS:
+            raise ValueError(f"Unknown durability level: {durability}")
+        self.path: str = path
+        self.durability: str = durability
+        self.max_batch: int = 1 if durability == DURABILITY_FULL else max_batch
+        self.max_delay: float = max_delay
+        self.lock = threading.RLock()
+        self.pending: int = 0
+        self.batch_started: float = 0.0
+        self.commits: int = 0
+        # Transactions are managed here, not by the sqlite3 module
+        self.conn: Optional[sqlite3.Connection] = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(f"PRAGMA synchronous={durability.upper()}")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS messages "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+        self.closed = threading.Event()
+        self.committer: Optional[threading.Thread] = None
+        if self.max_batch > 1:
+            self.committer = threading.Thread(target=self._commit_idle, daemon=True)
+            self.committer.start()
+
+    def __getitem__(self, key: Key) -> str:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT value FROM messages WHERE key = ?", (_text(key),)
+            ).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return row[0]
+
+    def __setitem__(self, key: Key, value: Key) -> None:
+        self._write(
+            "INSERT OR REPLACE INTO messages (key, value) VALUES (?, ?)",
+            (_text(key), _text(value)),
+        )
+
+    def __delitem__(self, key: Key) -> None:
+        if not self._write("DELETE FROM messages WHERE key = ?", (_text(key),)):
+            raise KeyError(key)
+
+    def __contains__(self, key: object) -> bool:
+        if not isinstance(key, (str, bytes)):
+            return False
+        with self.lock:
+            return (
+                self.conn.execute(
+                    "SELECT 1 FROM messages WHERE key = ?", (_text(key),)
+                ).fetchone()
+                is not None
+            )
+
+    def __iter__(self) -> Iterator[str]:
+        # Snapshot, so the store can be written while the keys are iterated
+        with self.lock:
+            keys: List[str] = [
+                row[0]
+                for row in self.conn.execute("SELECT key FROM messages ORDER BY rowid")
+            ]
+        return iter(keys)
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+
+    def clear(self) -> None:
+        self._write("DELETE FROM messages", ())
+
+    def _write(self, sql: str, params: tuple) -> int:
+        with self.lock:
+            if self.pending == 0:
+                self.conn.execute("BEGIN")
+                self.batch_started = time.monotonic()
+            rowcount: int = self.conn.execute(sql, params).rowcount
+            self.pending += 1
+            if (
+                self.pending >= self.max_batch
+                or time.monotonic() - self.batch_started >= self.max_delay
+            ):
+                self._commit()
+        return rowcount
+
+    def _commit(self) -> None:
+        if self.pending:
+            self.conn.execute("COMMIT")
+            self.pending = 0
+            self.commits += 1
+
+    def _commit_idle(self) -> None:
+        while not self.closed.wait(self.max_delay):
+            with self.lock:
+                if (
+                    self.pending
+                    and time.monotonic() - self.batch_started >= self.max_delay
+                ):
+                    self._commit()
+
+    def sync(self) -> None:
+        # Group commit decides when batches are durable; "full" already is
+        with self.lock:
+            if self.pending and time.monotonic() - self.batch_started >= self.max_delay:
+                self._commit()
+
+    def flush(self) -> None:
+        with self.lock:
+            self._commit()
+
+    def close(self) -> None:
+        self.closed.set()
+        if self.committer is not None:
+            self.committer.join()
+        with self.lock:
+            if self.conn is None:
+                return
+            self._commit()
+            self.conn.close()
+            self.conn = None
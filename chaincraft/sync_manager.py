@@ -0,0 +1,172 @@
+# sync_manager.py
+
+"""
+Catch-up of merkelized shared objects: one peer per object, bounded
+batches, retries on timeout, and no requests while every peer reports a
+tip we already have.
+"""
+
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+Peer = Tuple[str, int]
+
+
+class SyncSession:
+    """
+    Catch-up state of one merkelized shared object.
+    """
+
+    def __init__(self) -> None:
+        # Last tip each peer reported: (tip, whether it knew our cursor, when)
+        self.peer_tips: Dict[Peer, Tuple[str, bool, float]] = {}
+        # Outstanding request: (peer, cursor digest, sent at, attempts)
+        self.in_flight: Optional[Tuple[Peer, str, float, int]] = None
+        self.peer: Optional[Peer] = None
+        # Peers given up on, and until when they are not chosen again
+        self.failed: Dict[Peer, float] = {}
+
+
+class SyncManager:
+    """
+    Pull-based catch-up for merkelized shared objects, one peer at a time.
+
+    For each object the manager keeps at most one request in flight, to a
+    single peer: "send me at most `batch_size` messages after this digest".
+    The peer answers with the messages and a status carrying its tip. The
+    next batch starts from our new tip, so the cursor is simply our latest
+    digest. Requests that are not answered within `request_timeout` are
+    retried, and after `max_attempts` the peer is dropped from the session
+    and another one is chosen; the dropped peer is not chosen again for
+    `failure_backoff` seconds, or until it sends a status.
+
+    A peer is synced from while its reported tip is unknown to us. When every
+    peer's tip is known (we have it, so they are not ahead), the manager goes
+    quiet and only re-checks one peer whose report is older than `tip_ttl`
+    seconds per round.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 64,
+        request_timeout: float = 2.0,
+        max_attempts: int = 3,
+        tip_ttl: float = 10.0,
+        failure_backoff: float = 30.0,
+    ) -> None:
+        self.batch_size: int = batch_size
+        self.request_timeout: float = request_timeout
+        self.max_attempts: int = max_attempts
+        self.tip_ttl: float = tip_ttl
+        self.failure_backoff: float = failure_backoff
+        self.sessions: Dict[str, SyncSession] = {}
+        self.lock = threading.Lock()
+
+        self.requests_sent: int = 0
+        self.retries: int = 0
+        self.statuses_received: int = 0
+
+    def next_request(
+        self,
+        class_name: str,
+        local_tip: str,
+        has_digest: Callable[[str], bool],
+        peers: Sequence[Peer],
+        now: Optional[float] = None,
+    ) -> Optional[Peer]:
+        """
+        Return the peer to send a request for messages after local_tip to,
+        or None if a request is in flight or we are in sync.
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            session: SyncSession = self.sessions.setdefault(class_name, SyncSession())
+            if session.in_flight is not None:
+                peer, cursor, sent_at, attempts = session.in_flight
+                if now - sent_at < self.request_timeout:
+                    return None
+                if attempts < self.max_attempts and peer in peers:
+                    # Retry from where we are now, which may have moved
+                    session.in_flight = (peer, local_tip, now, attempts + 1)
+                    self.retries += 1
+                    self.requests_sent += 1
+                    return peer
+                session.in_flight = None
+                session.peer_tips.pop(peer, None)
+                session.failed[peer] = now + self.failure_backoff
+                if session.peer == peer:
+                    session.peer = None
+
+            peer = self._choose_peer(session, local_tip, has_digest, peers, now)
+            if peer is None:
+                return None
+            session.peer = peer
+            session.in_flight = (peer, local_tip, now, 1)
+            self.requests_sent += 1
+            return peer
+
+    def on_status(
+        self,
+        class_name: str,
+        peer: Peer,
+        tip: str,
+        known: bool,
+        now: Optional[float] = None,
+    ) -> None:
+        """
+        Record a peer's status reply and complete the matching request.
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            session: SyncSession = self.sessions.setdefault(class_name, SyncSession())
+            session.peer_tips[peer] = (tip, known, now)
+            session.failed.pop(peer, None)
+            self.statuses_received += 1
+            if session.in_flight is not None and session.in_flight[0] == peer:
+                session.in_flight = None
+
+    def in_sync(self, class_name: str) -> bool:
+        with self.lock:
+            session: Optional[SyncSession] = self.sessions.get(class_name)
+            return session is not None and session.in_flight is None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "requests_sent": self.requests_sent,
+            "retries": self.retries,
+            "statuses_received": self.statuses_received,
+        }
+
+    def _choose_peer(
+        self,
+        session: SyncSession,
+        local_tip: str,
+        has_digest: Callable[[str], bool],
+        peers: Sequence[Peer],
+        now: float,
+    ) -> Optional[Peer]:
+        ahead: List[Peer] = []
+        stale: List[Peer] = []
+        for peer in peers:
+            if peer in session.failed:
+                if now < session.failed[peer]:
+                    continue
+                del session.failed[peer]
+            report = session.peer_tips.get(peer)
+            if report is None or now - report[2] >= self.tip_ttl:
+                stale.append(peer)
+                continue
+            tip, known, _ = report
+            # A peer that did not know our cursor is on another branch
+            if known and tip != local_tip and not has_digest(tip):
+                ahead.append(peer)
+        if ahead:
+            # Stay with the current peer while it is ahead
+            if session.peer in ahead:
+                return session.peer
+            return random.choice(ahead)
+        if stale:
+            return random.choice(stale)
+        return None
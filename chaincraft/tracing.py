@@ -0,0 +1,174 @@
+# tracing.py
+
+"""
+Message lifecycle tracing. A node given a Tracer records a timed span for
+each stage a sampled message passes through on the receive path, with its
+hash, type and sender. Without a tracer no spans are timed.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+# Stages of the receive path, in order
+RECEIVE: str = "receive"
+DEDUP: str = "dedup"
+DECOMPRESS: str = "decompress"
+ACCEPT: str = "accept"
+VALIDATE: str = "validate"
+ADD_MESSAGE: str = "add_message"
+STORE_AND_BROADCAST: str = "store_and_broadcast"
+INDEX: str = "index"
+
+
+class Span:
+    """
+    One timed stage of one message. start is a time.perf_counter() value,
+    duration is in seconds.
+    """
+
+    __slots__ = (
+        "name",
+        "start",
+        "duration",
+        "message_hash",
+        "message_type",
+        "peer",
+        "thread_id",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        start: float,
+        duration: float,
+        message_hash: str,
+        message_type: Optional[str],
+        peer: Optional[Tuple[str, int]],
+    ) -> None:
+        self.name: str = name
+        self.start: float = start
+        self.duration: float = duration
+        self.message_hash: str = message_hash
+        self.message_type: Optional[str] = message_type
+        self.peer: Optional[Tuple[str, int]] = peer
+        self.thread_id: int = threading.get_ident()
+
+    def to_trace_event(self, pid: int) -> Dict[str, Any]:
+        """
+        The span as a Chrome trace "complete" event (timestamps in µs).
+        """
+        args: Dict[str, Any] = {"message_hash": self.message_hash}
+        if self.message_type is not None:
+            args["message_type"] = self.message_type
+        if self.peer is not None:
+            args["peer"] = f"{self.peer[0]}:{self.peer[1]}"
+        return {
+            "name": self.name,
+            "cat": "chaincraft",
+            "ph": "X",
+            "ts": self.start * 1e6,
+            "dur": self.duration * 1e6,
+            "pid": pid,
+            "tid": self.thread_id,
+            "args": args,
+        }
+
+
+class Tracer:
+    """
+    Collects timed spans of the stages a message passes through on a node:
+    receive (the whole receive path), dedup, decompress, accept (parsing
+    and the accepted-type check), validate and add_message per
+    SharedObject ("validate:Mempool"), store_and_broadcast and index.
+
+    Whether a message is traced depends only on its hash, so all stages of
+    a sampled message are traced on every node that uses the same
+    sample_rate, and the others cost one comparison per stage. The last
+    `max_spans` spans are kept for export(); hooks are called with every
+    span as it is recorded, from the thread that ran the stage.
+
+    With validation_workers, the receive span is not recorded and decode
+    stage spans carry no peer; stages run in receive_processes workers are
+    not traced.
+    """
+
+    def __init__(
+        self,
+        sample_rate: float = 1.0,
+        max_spans: int = 100000,
+        hooks: Optional[List[Callable[[Span], None]]] = None,
+    ) -> None:
+        if not 0 <= sample_rate <= 1:
+            raise ValueError("sample_rate must be between 0 and 1")
+        self.sample_rate: float = sample_rate
+        self.threshold: int = int(sample_rate * 0xFFFFFFFF)
+        self.spans: Deque[Span] = deque(maxlen=max_spans)
+        self.hooks: List[Callable[[Span], None]] = list(hooks or [])
+
+    def add_hook(self, hook: Callable[[Span], None]) -> None:
+        self.hooks.append(hook)
+
+    def sampled(self, message_hash: str) -> bool:
+        """
+        Whether the message with this (hex) hash is traced.
+        """
+        if self.sample_rate >= 1:
+            return True
+        try:
+            return int(message_hash[:8], 16) < self.threshold
+        except ValueError:
+            return False
+
+    def record(
+        self,
+        name: str,
+        start: float,
+        end: float,
+        message_hash: str,
+        message_type: Optional[str] = None,
+        peer: Optional[Tuple[str, int]] = None,
+    ) -> None:
+        span: Span = Span(name, start, end - start, message_hash, message_type, peer)
+        self.spans.append(span)
+        for hook in self.hooks:
+            hook(span)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Count, total and maximum duration (seconds) of the kept spans per
+        stage, to see which stage takes the time.
+        """
+        summary: Dict[str, Dict[str, float]] = {}
+        for span in list(self.spans):
+            stage = summary.setdefault(
+                span.name, {"count": 0, "total": 0.0, "max": 0.0}
+            )
+            stage["count"] += 1
+            stage["total"] += span.duration
+            stage["max"] = max(stage["max"], span.duration)
+        return summary
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        pid: int = os.getpid()
+        return {
+            "traceEvents": [span.to_trace_event(pid) for span in list(self.spans)],
+            "displayTimeUnit": "ms",
+            "otherData": {"exported_at": time.time()},
+        }
+
+    def export(self, path: str) -> int:
+        """
+        Write the kept spans to path in the Chrome trace event format (open
+        with Perfetto or chrome://tracing) and return how many were written.
+        """
+        trace: Dict[str, Any] = self.to_chrome_trace()
+        with open(path, "w") as f:
+            json.dump(trace, f)
+        return len(trace["traceEvents"])
+
+    def clear(self) -> None:
+        self.spans.clear()
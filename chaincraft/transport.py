@@ -0,0 +1,299 @@
+# transport.py
+
+"""
+Transports a node sends and receives on. All traffic uses the node's
+transport (UDPTransport by default). A sync_transport, e.g. TCPTransport, is
+bound to the same host/port and carries merkelized catch-up responses,
+while gossip stays on the low-latency transport.
+"""
+
+import queue
+import socket
+import struct
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+
+
+class Transport(ABC):
+    """
+    Moves encoded messages between nodes. Addresses are always the peers'
+    node addresses (host, port), whatever the underlying connection is.
+    """
+
+    # Whether recvfrom_into() is implemented (receive into caller buffers)
+    supports_recv_into: bool = False
+
+    @abstractmethod
+    def bind(self, host: str, port: int) -> None:
+        """
+        Start accepting traffic on host/port. Raises OSError if unavailable.
+        """
+        pass
+
+    @abstractmethod
+    def sendto(self, data: bytes, addr: Tuple[str, int]) -> None:
+        """
+        Send one message to addr. Raises OSError on failure.
+        """
+        pass
+
+    @abstractmethod
+    def recvfrom(self, bufsize: int) -> Tuple[bytes, Tuple[str, int]]:
+        """
+        Block until a message arrives. Raises OSError once the transport is closed.
+        """
+        pass
+
+    def recvfrom_into(self, buffer: memoryview) -> Tuple[int, Tuple[str, int]]:
+        """
+        Receive one message into buffer, returning its size and sender.
+        Only available when supports_recv_into is set.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def close(self) -> None:
+        pass
+
+
+class UDPTransport(Transport):
+    """
+    Plain UDP datagrams: low latency, no delivery guarantees.
+
+    With reuse_port, the socket is bound with SO_REUSEPORT (Linux) so that
+    other sockets can join() the same port and the kernel spreads incoming
+    datagrams over all of them.
+    """
+
+    supports_recv_into = True
+
+    def __init__(self, reuse_port: bool = False) -> None:
+        self.socket: Optional[socket.socket] = None
+        self.reuse_port: bool = reuse_port
+
+    def bind(self, host: str, port: int) -> None:
+        if self.reuse_port:
+            # SO_REUSEPORT would also let us share a port another node bound
+            # with it, so first make sure the port is free
+            self._open(host, port, False).close()
+        self.socket = self._open(host, port, self.reuse_port)
+
+    def join(self, host: str, port: int) -> None:
+        """
+        Bind to a port already bound by a reuse_port transport, receiving a
+        share of its datagrams.
+        """
+        self.socket = self._open(host, port, True)
+
+    def _open(self, host: str, port: int, reuse_port: bool) -> socket.socket:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            if reuse_port:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            sock.bind((host, port))
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def sendto(self, data: bytes, addr: Tuple[str, int]) -> None:
+        self.socket.sendto(data, addr)
+
+    def recvfrom(self, bufsize: int) -> Tuple[bytes, Tuple[str, int]]:
+        return self.socket.recvfrom(bufsize)
+
+    def recvfrom_into(self, buffer: memoryview) -> Tuple[int, Tuple[str, int]]:
+        return self.socket.recvfrom_into(buffer)
+
+    def close(self) -> None:
+        if self.socket:
+            self.socket.close()
+
+
+class TCPTransport(Transport):
+    """
+    Length-prefixed frames over persistent TCP connections, one per peer.
+
+    Every outgoing connection starts with a hello frame carrying our node
+    address, so received frames are attributed to the peer's node address
+    rather than its ephemeral port; only the port is taken on trust, and a
+    hello whose host is not the connection's source address is rejected.
+    Reader threads feed a bounded inbound
+    queue; when it is full they stop reading and TCP flow control pushes back
+    on the sender instead of dropping data.
+    """
+
+    FRAME_HEADER = struct.Struct("!I")
+
+    def __init__(
+        self,
+        connect_timeout: float = 2.0,
+        max_frame_size: int = 16 * 1024 * 1024,
+        inbound_queue_size: int = 10000,
+    ) -> None:
+        self.connect_timeout: float = connect_timeout
+        self.max_frame_size: int = max_frame_size
+        self.local_addr: Optional[Tuple[str, int]] = None
+        self.listener: Optional[socket.socket] = None
+        self.inbound: "queue.Queue[Optional[Tuple[bytes, Tuple[str, int]]]]" = (
+            queue.Queue(maxsize=inbound_queue_size)
+        )
+        self.connections: Dict[Tuple[str, int], socket.socket] = {}
+        self.send_locks: Dict[Tuple[str, int], threading.Lock] = {}
+        self.accepted: List[socket.socket] = []
+        self.lock = threading.Lock()
+        self.is_running: bool = False
+
+    def bind(self, host: str, port: int) -> None:
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        # Allow a restarted node to reuse its port while old connections linger
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            listener.bind((host, port))
+            listener.listen()
+        except OSError:
+            listener.close()
+            raise
+        self.listener = listener
+        self.local_addr = (host, port)
+        self.is_running = True
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+
+    def sendto(self, data: bytes, addr: Tuple[str, int]) -> None:
+        """
+        Send a frame over the persistent connection to addr, reconnecting
+        once if the connection turned out to be broken.
+        """
+        if len(data) > self.max_frame_size:
+            raise OSError(f"Frame of {len(data)} bytes exceeds max_frame_size")
+        addr = (addr[0], int(addr[1]))
+        frame: bytes = self.FRAME_HEADER.pack(len(data)) + data
+        for attempt in range(2):
+            conn, send_lock = self._connection(addr)
+            try:
+                with send_lock:
+                    conn.sendall(frame)
+                return
+            except OSError:
+                self._drop_connection(addr, conn)
+                if attempt == 1:
+                    raise
+
+    def recvfrom(self, bufsize: int) -> Tuple[bytes, Tuple[str, int]]:
+        item = self.inbound.get()
+        if item is None:
+            raise OSError("Transport closed")
+        return item
+
+    def close(self) -> None:
+        self.is_running = False
+        if self.listener:
+            # shutdown() wakes the accept thread so the port is really released
+            try:
+                self.listener.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.listener.close()
+        with self.lock:
+            sockets = list(self.connections.values()) + self.accepted
+            self.connections.clear()
+            self.accepted.clear()
+        for conn in sockets:
+            try:
+                conn.close()
+            except OSError:
+                pass
+        try:
+            self.inbound.put_nowait(None)
+        except queue.Full:
+            pass
+
+    def _connection(
+        self, addr: Tuple[str, int]
+    ) -> Tuple[socket.socket, threading.Lock]:
+        with self.lock:
+            conn = self.connections.get(addr)
+            if conn is not None:
+                return conn, self.send_locks[addr]
+
+        conn = socket.create_connection(addr, timeout=self.connect_timeout)
+        conn.settimeout(None)
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        host: str = self.local_addr[0]
+        if host in ("", "0.0.0.0", "::"):
+            # Bound to every interface: announce the one this connection uses
+            host = conn.getsockname()[0]
+        hello: bytes = f"{host}:{self.local_addr[1]}".encode()
+        conn.sendall(self.FRAME_HEADER.pack(len(hello)) + hello)
+
+        with self.lock:
+            existing = self.connections.get(addr)
+            if existing is not None:
+                conn.close()
+                return existing, self.send_locks[addr]
+            self.connections[addr] = conn
+            self.send_locks[addr] = threading.Lock()
+            return conn, self.send_locks[addr]
+
+    def _drop_connection(self, addr: Tuple[str, int], conn: socket.socket) -> None:
+        with self.lock:
+            if self.connections.get(addr) is conn:
+                del self.connections[addr]
+        try:
+            conn.close()
+        except OSError:
+            pass
+
+    def _accept_loop(self) -> None:
+        while self.is_running:
+            try:
+                conn, _ = self.listener.accept()
+            except OSError:
+                break
+            with self.lock:
+                self.accepted.append(conn)
+            threading.Thread(target=self._read_loop, args=(conn,), daemon=True).start()
+
+    def _read_loop(self, conn: socket.socket) -> None:
+        try:
+            hello = self._read_frame(conn)
+            if hello is None:
+                return
+            host, port = hello.decode().rsplit(":", 1)
+            if host != conn.getpeername()[0]:
+                return
+            peer: Tuple[str, int] = (host, int(port))
+            while self.is_running:
+                data = self._read_frame(conn)
+                if data is None:
+                    break
+                self.inbound.put((data, peer))
+        except (OSError, ValueError, UnicodeDecodeError):
+            pass
+        finally:
+            with self.lock:
+                if conn in self.accepted:
+                    self.accepted.remove(conn)
+            conn.close()
+
+    def _read_frame(self, conn: socket.socket) -> Optional[bytes]:
+        header = self._read_exact(conn, self.FRAME_HEADER.size)
+        if header is None:
+            return None
+        (length,) = self.FRAME_HEADER.unpack(header)
+        if length > self.max_frame_size:
+            raise ValueError(f"Frame of {length} bytes exceeds max_frame_size")
+        return self._read_exact(conn, length)
+
+    @staticmethod
+    def _read_exact(conn: socket.socket, length: int) -> Optional[bytes]:
+        chunks: List[bytes] = []
+        remaining: int = length
+        while remaining:
+            chunk = conn.recv(min(remaining, 65536))
+            if not chunk:
+                return None
+            chunks.append(chunk)
+            remaining -= len(chunk)
+        return b"".join(chunks)
@@ -0,0 +1,61 @@
+# wire_cache.py
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+CANONICAL: str = "canonical"
+
+
+class WireCache:
+    """
+    LRU cache of the wire bytes of stored messages, keyed by message hash:
+    the canonical bytes and their encodings per wire format (e.g. "zlib" or
+    a codec name), so sending a message again needs no store read, no
+    compression and no hashing. Bounded by the total size of the cached
+    bytes; a message's encodings are evicted together.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024) -> None:
+        self.max_bytes: int = max_bytes
+        self.size: int = 0
+        self.hits: int = 0
+        self.misses: int = 0
+        self.entries: "OrderedDict[str, Dict[str, bytes]]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, message_hash: str, encoding: str = CANONICAL) -> Optional[bytes]:
+        with self.lock:
+            encodings: Optional[Dict[str, bytes]] = self.entries.get(message_hash)
+            data: Optional[bytes] = (
+                encodings.get(encoding) if encodings is not None else None
+            )
+            if data is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(message_hash)
+            self.hits += 1
+            return data
+
+    def put(self, message_hash: str, data: bytes, encoding: str = CANONICAL) -> None:
+        with self.lock:
+            encodings: Dict[str, bytes] = self.entries.setdefault(message_hash, {})
+            self.entries.move_to_end(message_hash)
+            previous: Optional[bytes] = encodings.get(encoding)
+            if previous is not None:
+                self.size -= len(previous)
+            encodings[encoding] = data
+            self.size += len(data)
+            while self.size > self.max_bytes and len(self.entries) > 1:
+                _, dropped = self.entries.popitem(last=False)
+                self.size -= sum(len(d) for d in dropped.values())
+
+    def discard(self, message_hashes: Iterable[str]) -> None:
+        with self.lock:
+            for message_hash in message_hashes:
+                dropped = self.entries.pop(message_hash, None)
+                if dropped is not None:
+                    self.size -= sum(len(d) for d in dropped.values())
+
+    def __len__(self) -> int:
+        return len(self.entries)
@@ -1,5 +1,6 @@
 # examples/blockchain.py
 
+import functools
 import hashlib
 import json
 import time
@@ -19,6 +20,7 @@ except ImportError:
     from chaincraft.shared_message import SharedMessage
 from typing import List, Dict, Any, Optional
 import secrets
+from collections import OrderedDict
 from dataclasses import dataclass
 from cryptography.hazmat.primitives.asymmetric import ec
 from cryptography.hazmat.primitives import hashes, serialization
@@ -44,8 +46,9 @@ class BlockchainUtils:
     @staticmethod
     def verify_proof_of_work(block_data: Dict, nonce: int, difficulty: int) -> bool:
         """Verify if a given nonce meets the proof-of-work requirement"""
-        # Create copy of block data without the nonce to create the challenge
-        challenge = {k: v for k, v in block_data.items() if k != "nonce"}
+        # Create copy of block data without the nonce and the resulting hash,
+        # as in find_proof_of_work
+        challenge = {k: v for k, v in block_data.items() if k not in ("nonce", "hash")}
         challenge_hash = BlockchainUtils.calculate_hash(challenge)
 
         # Combine challenge hash with nonce to get final hash
@@ -79,7 +82,7 @@ class BlockchainUtils:
     @staticmethod
     def generate_keypair() -> tuple:
         """Generate ECDSA keypair for transaction signing"""
-        private_key = ec.generate_private_key(ec.SECP256K1)
+        private_key = ec.generate_private_key(ec.SECP256K1())
         public_key = private_key.public_key()
 
         # Convert to strings for storage/transmission
@@ -266,8 +269,10 @@ class Transaction:
         if derived_address != self.sender:
             return False
 
-        # Verify the signature
-        tx_data = self.to_dict()
+        # Verify the signature over the fields signed in create()
+        tx_data = {
+            k: v for k, v in self.to_dict().items() if k not in ("public_key", "tx_id")
+        }
         return BlockchainUtils.verify_signature(
             tx_data, self.signature, self.public_key
         )
@@ -359,44 +364,83 @@ class Block:
         return BlockchainUtils.verify_proof_of_work(block_data, self.nonce, difficulty)
 
 
+def precheck_mempool_message(data: Any, difficulty: int) -> bool:
+    """
+    Stateless part of Mempool.is_valid: the transaction's signature or the
+    block's proof-of-work. Module-level so it can run in a worker process.
+    """
+    try:
+        # Handle transaction message
+        if isinstance(data, dict) and "type" in data and data["type"] == "transaction":
+            tx = Transaction.from_dict(data["payload"])
+            return tx.is_valid()
+
+        # Handle block message (which will clear transactions from mempool)
+        elif isinstance(data, dict) and "type" in data and data["type"] == "block":
+            block = Block.from_dict(data["payload"])
+            return block.is_valid(difficulty)
+
+        return False
+    except Exception as e:
+        print(f"Error validating message: {e}")
+        return False
+
+
+def precheck_block_message(data: Any, difficulty: int) -> bool:
+    """
+    Stateless part of Ledger.is_valid: the block's proof-of-work and the
+    signatures of its transactions.
+    """
+    try:
+        # Only accept block messages
+        if not (isinstance(data, dict) and "type" in data and data["type"] == "block"):
+            return False
+        block = Block.from_dict(data["payload"])
+
+        # Check block integrity and proof-of-work
+        if not block.is_valid(difficulty):
+            print(f"Invalid block: Failed proof-of-work check")
+            return False
+
+        # Check each transaction signature
+        for tx_dict in block.transactions:
+            tx = Transaction.from_dict(tx_dict)
+            if not tx.is_valid():
+                print(f"Invalid transaction {tx.tx_id[:8]} in block")
+                return False
+
+        return True
+    except Exception as e:
+        print(f"Error validating block message: {e}")
+        return False
+
+
 class Mempool(SharedObject):
     """
     Mempool for holding pending transactions before they're included in blocks.
     Not merklelized since it's a temporary storage.
     """
 
-    def __init__(self, difficulty: int = 4):
+    def __init__(self, difficulty: int = 4, max_confirmed: int = 65536):
         """Initialize mempool with empty transactions dict"""
         self.transactions: Dict[str, Transaction] = {}  # tx_id -> Transaction
+        # tx_ids included in a block, only the most recent max_confirmed
+        self.confirmed: "OrderedDict[str, None]" = OrderedDict()
+        self.max_confirmed = max_confirmed
         self.difficulty = difficulty
 
     def is_valid(self, message: SharedMessage) -> bool:
         """
         Check if message contains a valid transaction or block
         """
-        try:
-            data = message.data
+        return precheck_mempool_message(message.data, self.difficulty)
 
-            # Handle transaction message
-            if (
-                isinstance(data, dict)
-                and "type" in data
-                and data["type"] == "transaction"
-            ):
-                tx_data = data["payload"]
-                tx = Transaction.from_dict(tx_data)
-                return tx.is_valid()
-
-            # Handle block message (which will clear transactions from mempool)
-            elif isinstance(data, dict) and "type" in data and data["type"] == "block":
-                block_data = data["payload"]
-                block = Block.from_dict(block_data)
-                return block.is_valid(self.difficulty)
+    def stateless_check(self):
+        """Mempool validation needs no state, so all of it can be offloaded"""
+        return functools.partial(precheck_mempool_message, difficulty=self.difficulty)
 
-            return False
-        except Exception as e:
-            print(f"Error validating message: {e}")
-            return False
+    def is_valid_stateful(self, message: SharedMessage) -> bool:
+        return True
 
     def add_message(self, message: SharedMessage) -> None:
         """
@@ -423,6 +467,10 @@ class Mempool(SharedObject):
             # Remove transactions included in the block from mempool
             for tx_dict in block.transactions:
                 tx_id = tx_dict["tx_id"]
+                self.confirmed[tx_id] = None
+                self.confirmed.move_to_end(tx_id)
+                if len(self.confirmed) > self.max_confirmed:
+                    self.confirmed.popitem(last=False)
                 if tx_id in self.transactions:
                     del self.transactions[tx_id]
 
@@ -430,6 +478,13 @@ class Mempool(SharedObject):
                 f"Cleared {len(block.transactions)} transactions from mempool after block {block.index}"
             )
 
+    def is_finalized(self, message: SharedMessage) -> bool:
+        """A transaction message is no longer needed once a block includes it"""
+        data = message.data
+        if isinstance(data, dict) and data.get("type") == "transaction":
+            return data["payload"].get("tx_id") in self.confirmed
+        return False
+
     # These methods aren't needed for Mempool since it's non-merklelized,
     # but SharedObject requires them to be implemented
     def is_merkelized(self) -> bool:
@@ -509,6 +564,19 @@ class Ledger(SharedObject):
         """
         Check if message contains a valid block that can be added to the chain
         """
+        return precheck_block_message(
+            message.data, self.difficulty
+        ) and self.is_valid_stateful(message)
+
+    def stateless_check(self):
+        """Proof-of-work and signature checks, see precheck_block_message"""
+        return functools.partial(precheck_block_message, difficulty=self.difficulty)
+
+    def is_valid_stateful(self, message: SharedMessage) -> bool:
+        """
+        Check that a block which passed precheck_block_message extends our
+        chain and that its senders can afford their transactions
+        """
         try:
             data = message.data
 
@@ -517,11 +585,6 @@ class Ledger(SharedObject):
                 block_data = data["payload"]
                 block = Block.from_dict(block_data)
 
-                # Check block integrity and proof-of-work
-                if not block.is_valid(self.difficulty):
-                    print(f"Invalid block: Failed proof-of-work check")
-                    return False
-
                 # Check block index
                 if block.index != len(self.chain):
                     print(
@@ -538,11 +601,6 @@ class Ledger(SharedObject):
                 for tx_dict in block.transactions:
                     tx = Transaction.from_dict(tx_dict)
 
-                    # Check transaction signature
-                    if not tx.is_valid():
-                        print(f"Invalid transaction {tx.tx_id[:8]} in block")
-                        return False
-
                     # Check sender has enough balance
                     sender_balance = self.balances.get(tx.sender, 0)
                     if sender_balance < tx.amount + tx.fee:
@@ -35,6 +35,43 @@ def verify_signature(public_key_pem: str, payload_str: str, signature_hex: str)
         return False
 
 
+def precheck_chatroom_message(data) -> bool:
+    """
+    Stateless part of ChatroomObject.is_valid: required fields, message type
+    and the ECDSA signature. Module-level so it can run in a worker process.
+    """
+    if not isinstance(data, dict):
+        return False
+
+    required = [
+        "message_type",
+        "chatroom_name",
+        "public_key_pem",
+        "signature",
+        "timestamp",
+    ]
+    for field in required:
+        if field not in data:
+            return False
+
+    # Allowed message types
+    if data["message_type"] not in (
+        "CREATE_CHATROOM",
+        "REQUEST_JOIN",
+        "ACCEPT_MEMBER",
+        "POST_MESSAGE",
+    ):
+        return False
+
+    # Verify ECDSA signature
+    #    We'll create a JSON payload of all fields except "signature"
+    #    and compare to the public_key_pem field
+    temp_dict = dict(data)
+    del temp_dict["signature"]
+    payload_str = json.dumps(temp_dict, sort_keys=True)
+    return verify_signature(data["public_key_pem"], payload_str, data["signature"])
+
+
 class ChatroomObject(SharedObject):
     """
     A non-merkelized chatroom protocol.
@@ -68,48 +105,29 @@ class ChatroomObject(SharedObject):
              - ACCEPT_MEMBER   => only the admin can accept
              - POST_MESSAGE    => only an accepted member or the admin can post
         """
-        data = message.data
-        if not isinstance(data, dict):
-            return False
+        return precheck_chatroom_message(message.data) and self.is_valid_stateful(
+            message
+        )
 
-        required = [
-            "message_type",
-            "chatroom_name",
-            "public_key_pem",
-            "signature",
-            "timestamp",
-        ]
-        for field in required:
-            if field not in data:
-                return False
+    def stateless_check(self):
+        """Field, message type and signature checks (steps 1 and 3)"""
+        return precheck_chatroom_message
+
+    def is_valid_stateful(self, message: SharedMessage) -> bool:
+        """
+        Timestamp window and the per-type chatroom rules (steps 2 and 4), for
+        messages that passed precheck_chatroom_message.
+        """
+        data = message.data
 
-        # 1) Check timestamp ±15s
+        # 2) Check timestamp ±15s
         now = time.time()
         msg_time = float(data["timestamp"])
         if abs(now - msg_time) > 15:
             return False
 
-        # 2) Allowed message types
         msg_type = data["message_type"]
-        if msg_type not in (
-            "CREATE_CHATROOM",
-            "REQUEST_JOIN",
-            "ACCEPT_MEMBER",
-            "POST_MESSAGE",
-        ):
-            return False
-
-        # 3) Verify ECDSA signature
-        #    We'll create a JSON payload of all fields except "signature"
-        #    and compare to the public_key_pem field
-        signature_hex = data["signature"]
-        temp_dict = dict(data)
-        del temp_dict["signature"]
-        payload_str = json.dumps(temp_dict, sort_keys=True)
-
         pub_key_pem = data["public_key_pem"]
-        if not verify_signature(pub_key_pem, payload_str, signature_hex):
-            return False
 
         # 4) Additional logic checks per message type
         cname = data["chatroom_name"]
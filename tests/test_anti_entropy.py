@@ -0,0 +1,147 @@
+# tests/test_anti_entropy.py
+
+import hashlib
+import json
+import time
+import unittest
+
+from chaincraft import ChaincraftNode
+from chaincraft.anti_entropy import PrefixMerkleTree, simulate_reconciliation
+from chaincraft.gossip import FanoutStrategy
+from chaincraft.shared_message import SharedMessage
+
+
+def make_hashes(count, tag=""):
+    return [hashlib.sha256(f"{tag}{i}".encode()).hexdigest() for i in range(count)]
+
+
+class TestPrefixMerkleTree(unittest.TestCase):
+    def test_summary_is_order_independent(self):
+        hashes = make_hashes(100)
+        a = PrefixMerkleTree()
+        b = PrefixMerkleTree()
+        a.update(hashes)
+        b.update(reversed(hashes))
+        self.assertEqual(a.summary(), b.summary())
+        self.assertEqual(len(a), 100)
+        self.assertIn(hashes[0], a)
+
+    def test_remove_restores_summary(self):
+        tree = PrefixMerkleTree()
+        tree.update(make_hashes(50))
+        before = tree.summary()
+        extra = make_hashes(1, "extra")[0]
+        self.assertTrue(tree.add(extra))
+        self.assertFalse(tree.add(extra))
+        self.assertNotEqual(tree.summary(), before)
+        self.assertTrue(tree.remove(extra))
+        self.assertEqual(tree.summary(), before)
+        self.assertEqual(PrefixMerkleTree().summary(), 0)
+
+    def test_respond_ignores_matching_and_malformed_prefixes(self):
+        tree = PrefixMerkleTree(depth=2)
+        tree.update(make_hashes(20))
+        children, buckets = tree.respond({"": tree.summary(), "zz": [1, "00"]})
+        self.assertEqual((children, buckets), ({}, {}))
+        children, buckets = tree.respond({"": 0})
+        self.assertEqual(len(children), 16)
+        self.assertEqual(buckets, {})
+
+    def test_reconciliation_finds_both_directions(self):
+        shared = make_hashes(5000)
+        only_a = make_hashes(7, "a")
+        only_b = make_hashes(3, "b")
+        a = PrefixMerkleTree()
+        b = PrefixMerkleTree()
+        a.update(shared + only_a)
+        b.update(shared + only_b)
+        result = simulate_reconciliation(a, b)
+        self.assertEqual(result["missing_a"], 3)
+        self.assertEqual(result["missing_b"], 7)
+
+    def test_benchmark_million_messages(self):
+        hashes = make_hashes(1000000)
+        a = PrefixMerkleTree()
+        b = PrefixMerkleTree()
+        start = time.perf_counter()
+        a.update(hashes)
+        build_s = time.perf_counter() - start
+        b.update(hashes[:-10])
+        b.update(make_hashes(10, "new"))
+
+        result = simulate_reconciliation(a, b)
+        full_bytes = 1000000 * 64  # just the hashes of a full resend
+        print(f"\nTree build: {build_s:.1f} s for 1M hashes")
+        print(
+            f"Reconcile 10+10 differences: {result['round_trips']} round trips, "
+            f"{result['bytes'] / 1024:.1f} KiB (vs >{full_bytes / 1024 / 1024:.0f} MiB)"
+        )
+        self.assertEqual(result["missing_a"], 10)
+        self.assertEqual(result["missing_b"], 10)
+        self.assertLessEqual(result["round_trips"], 4)
+        self.assertLess(result["bytes"], 64 * 1024)
+
+
+class TestNodeAntiEntropy(unittest.TestCase):
+    def setUp(self):
+        self.nodes = []
+        for _ in range(2):
+            # No periodic rebroadcast: only anti-entropy reconciles the stores
+            node = ChaincraftNode(
+                persistent=False,
+                gossip_strategy=FanoutStrategy(),
+                anti_entropy=PrefixMerkleTree(),
+            )
+            node.ANTI_ENTROPY_INTERVAL = 0.1
+            self.nodes.append(node)
+        for node in self.nodes:
+            node.start()
+        a, b = self.nodes
+        a.connect_to_peer(b.host, b.port)
+        b.connect_to_peer(a.host, a.port)
+
+    def tearDown(self):
+        for node in self.nodes:
+            node.close()
+
+    def test_stores_converge(self):
+        a, b = self.nodes
+        for i in range(30):
+            message = json.dumps(f"shared {i}")
+            message_hash = a.hash_message(a.compress_message(message))
+            a._store_message(message_hash, message)
+            b._store_message(message_hash, message)
+        for node, tag in ((a, "a"), (b, "b")):
+            for i in range(3):
+                message = json.dumps(f"only {tag} {i}")
+                node._store_message(
+                    node.hash_message(node.compress_message(message)), message
+                )
+
+        deadline = time.time() + 10
+        while time.time() < deadline and not (len(a.db) == len(b.db) == 36):
+            time.sleep(0.1)
+        self.assertEqual(len(a.db), 36)
+        self.assertEqual(set(a.db), set(b.db))
+        self.assertEqual(a.anti_entropy.summary(), b.anti_entropy.summary())
+
+
+class TestSyncLimits(unittest.TestCase):
+    def test_empty_buckets_push_a_bounded_batch_to_peers_only(self):
+        node = ChaincraftNode(persistent=False, anti_entropy=PrefixMerkleTree())
+        peer = ("127.0.0.1", 7001)
+        node.peers = [peer]
+        sent = []
+        node._send_datagram = lambda data, addr: sent.append(addr)
+        hashes = [node.create_shared_message({"n": i})[0] for i in range(400)]
+        sent.clear()
+        depth = node.anti_entropy.depth
+        sync = {SharedMessage.SYNC_BUCKETS: {h[:depth]: [] for h in hashes}}
+        node._handle_sync(sync, ("10.0.0.1", 7001))
+        self.assertEqual(sent, [])
+        node._handle_sync(sync, peer)
+        self.assertEqual(sent, [peer] * node.ANTI_ENTROPY_BATCH_SIZE)
+
+
+if __name__ == "__main__":
+    unittest.main()
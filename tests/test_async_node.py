@@ -0,0 +1,132 @@
+# tests/test_async_node.py
+
+import asyncio
+import threading
+import time
+import unittest
+import urllib.request
+
+from chaincraft import AsyncChaincraftNode
+from chaincraft.metrics import MetricsRegistry
+
+
+def connect_ring(nodes):
+    for i in range(len(nodes)):
+        next_node = nodes[(i + 1) % len(nodes)]
+        nodes[i].connect_to_peer(next_node.host, next_node.port)
+        next_node.connect_to_peer(nodes[i].host, nodes[i].port)
+
+
+def wait_for_propagation(nodes, expected_count, timeout=15):
+    start_time = time.time()
+    while time.time() - start_time < timeout:
+        if all(len(node.db) == expected_count for node in nodes):
+            return True
+        time.sleep(0.1)
+    return False
+
+
+class TestAsyncChaincraftNode(unittest.TestCase):
+    def setUp(self):
+        self.nodes = []
+
+    def tearDown(self):
+        for node in self.nodes:
+            node.close()
+
+    def create_node(self, **kwargs):
+        node = AsyncChaincraftNode(persistent=False, **kwargs)
+        self.nodes.append(node)
+        return node
+
+    def test_sync_api_propagation(self):
+        node1 = self.create_node()
+        node2 = self.create_node()
+        node1.start()
+        node2.start()
+        self.assertTrue(node1.is_running)
+
+        node1.connect_to_peer(node2.host, node2.port)
+        node2.connect_to_peer(node1.host, node1.port)
+        message_hash, shared_message = node1.create_shared_message("Hello async")
+
+        self.assertEqual(shared_message.data, "Hello async")
+        self.assertTrue(wait_for_propagation([node1, node2], 1))
+        self.assertIn(message_hash, node2.db)
+
+    def test_datagrams_go_through_the_packet_filter(self):
+        node = self.create_node()
+        node.start()
+        banned = ("127.0.0.1", 7001)
+        node.packet_filter.ban(banned, time.time() + 60)
+        node._on_datagram(b'"Dropped"', banned)
+        self.assertEqual((node.datagrams_received, node.bytes_received), (1, 9))
+        self.assertEqual(node.packet_filter.drops["banned"], 1)
+        self.assertEqual(len(node.db), 0)
+
+    def test_many_nodes_share_one_loop(self):
+        threads_before = threading.active_count()
+        nodes = [self.create_node(gossip_mode="inventory") for _ in range(50)]
+        for node in nodes:
+            node.start()
+        connect_ring(nodes)
+
+        # At most the shared loop thread is added, no threads per node
+        self.assertLessEqual(threading.active_count(), threads_before + 1)
+
+        message_hash, _ = nodes[0].create_shared_message("Ring message")
+        self.assertTrue(wait_for_propagation(nodes, 1, timeout=30))
+        for node in nodes:
+            self.assertIn(message_hash, node.db)
+
+    def test_async_api(self):
+        async def scenario():
+            node1 = self.create_node()
+            node2 = self.create_node()
+            await node1.start_async()
+            await node2.start_async()
+            await node1.connect_to_peer_async(node2.host, node2.port)
+            await node2.connect_to_peer_async(node1.host, node1.port)
+
+            message_hash, _ = await node1.create_shared_message_async({"n": 1})
+            for _ in range(100):
+                if message_hash in node2.db:
+                    break
+                await asyncio.sleep(0.05)
+
+            await node1.close_async()
+            await node2.close_async()
+            return message_hash, dict(node2.db)
+
+        message_hash, node2_db = asyncio.run(scenario())
+        self.assertIn(message_hash, node2_db)
+
+    def test_unsupported_options_are_rejected(self):
+        for option in ("validation_workers", "receive_processes", "precheck_processes"):
+            with self.assertRaises(ValueError):
+                AsyncChaincraftNode(persistent=False, **{option: 2})
+
+    def test_metrics_server_runs_until_close(self):
+        node = self.create_node(metrics=MetricsRegistry(), metrics_port=0)
+        node.start()
+        url = f"http://127.0.0.1:{node.metrics.server.port}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as response:
+            self.assertIn(
+                "chaincraft_datagrams_received_total", response.read().decode()
+            )
+        node.close()
+        self.assertIsNone(node.metrics.server)
+
+    def test_blocking_call_from_loop_is_rejected(self):
+        node = self.create_node()
+        node.start()
+
+        async def blocking_start():
+            AsyncChaincraftNode._run_sync(node.loop, asyncio.sleep)
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run_coroutine_threadsafe(blocking_start(), node.loop).result()
+
+
+if __name__ == "__main__":
+    unittest.main()
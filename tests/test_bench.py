@@ -0,0 +1,87 @@
+# tests/test_bench.py
+
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from chaincraft.bench import compare, load_results, run_benchmarks, save_results
+from chaincraft.bench.__main__ import main
+from chaincraft.bench.scenarios import HIGHER, LOWER
+
+
+def results(**metrics):
+    return {
+        "format": 1,
+        "scenarios": {
+            "demo": {
+                name: {"value": value, "better": better}
+                for name, (value, better) in metrics.items()
+            }
+        },
+    }
+
+
+class TestCompare(unittest.TestCase):
+    def test_regressions_respect_direction(self):
+        baseline = results(rate=(100, HIGHER), latency=(1.0, LOWER), other=(5, HIGHER))
+        current = results(rate=(85, HIGHER), latency=(1.05, LOWER), new=(1, HIGHER))
+        comparisons = {c.metric: c for c in compare(baseline, current, 0.1)}
+        # Metrics missing from either side are not compared
+        self.assertEqual(set(comparisons), {"rate", "latency"})
+        self.assertTrue(comparisons["rate"].regression)
+        self.assertAlmostEqual(comparisons["rate"].improvement, -0.15)
+        self.assertFalse(comparisons["latency"].regression)
+        self.assertAlmostEqual(comparisons["latency"].improvement, -0.05)
+
+    def test_faster_is_not_a_regression(self):
+        baseline = results(latency=(2.0, LOWER))
+        current = results(latency=(1.0, LOWER))
+        (comparison,) = compare(baseline, current)
+        self.assertAlmostEqual(comparison.improvement, 0.5)
+        self.assertFalse(comparison.regression)
+
+
+class TestRun(unittest.TestCase):
+    def test_scenarios_produce_json_results(self):
+        output = run_benchmarks(["ingest", "catch_up"], quick=True, repeat=2)
+        self.assertEqual(set(output["scenarios"]), {"ingest", "catch_up"})
+        catch_up = output["scenarios"]["catch_up"]
+        self.assertEqual(catch_up["blocks"]["value"], 100)
+        self.assertEqual(catch_up["virtual_seconds"]["better"], LOWER)
+        self.assertGreater(
+            output["scenarios"]["ingest"]["messages_per_second"]["value"], 0
+        )
+        # Round-trips through JSON
+        self.assertEqual(json.loads(json.dumps(output)), output)
+
+    def test_unknown_scenario(self):
+        with self.assertRaises(ValueError):
+            run_benchmarks(["nope"])
+
+    def test_cli_flags_regressions(self):
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = os.path.join(directory, "baseline.json")
+            current = os.path.join(directory, "current.json")
+            save_results(results(rate=(100, HIGHER)), baseline)
+            save_results(results(rate=(50, HIGHER)), current)
+            self.assertEqual(
+                load_results(baseline)["scenarios"]["demo"]["rate"]["value"], 100
+            )
+
+            out = io.StringIO()
+            with contextlib.redirect_stdout(out):
+                self.assertEqual(main(["compare", baseline, current]), 1)
+                self.assertEqual(main(["compare", baseline, baseline]), 0)
+            self.assertIn("REGRESSION", out.getvalue())
+
+            with self.assertRaises(ValueError):
+                with open(current, "w") as f:
+                    json.dump({"scenarios": {}}, f)
+                load_results(current)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+# tests/test_codec.py
+
+import json
+import time
+import unittest
+from unittest import mock
+
+from chaincraft import ChaincraftNode, SharedMessage
+from chaincraft.codec import BINARY, BinaryCodec, JSONCodec, get_codec
+
+from tests.test_compression import signed_messages
+
+
+class TestBinaryCodec(unittest.TestCase):
+    def setUp(self):
+        self.codec = BinaryCodec()
+
+    def test_roundtrip_preserves_json_text(self):
+        values = [
+            None,
+            True,
+            False,
+            0,
+            -1,
+            2**70,
+            -(2**70),
+            1.5,
+            "",
+            "plain text",
+            "00ff",
+            "ABCD",
+            "café",
+            [1, [2, "x"]],
+            {"b": 1, "a": {"nested": [None, "deadbeef"]}},
+        ]
+        for value in values:
+            decoded = self.codec.decode(self.codec.encode(value))
+            self.assertEqual(json.dumps(decoded), json.dumps(value))
+
+    def test_hex_strings_are_stored_as_bytes(self):
+        signature = "ab" * 64
+        self.assertLess(len(self.codec.encode(signature)), 70)
+
+    def test_truncated_payload_is_rejected(self):
+        payload = self.codec.encode({"key": "value"})
+        with self.assertRaises(ValueError):
+            self.codec.decode(payload[:-2])
+
+    def test_unknown_codec(self):
+        with self.assertRaises(ValueError):
+            get_codec("xml")
+
+    def test_shared_message_bytes(self):
+        message = SharedMessage(data={"message_type": "Test", "value": 1})
+        for codec in (JSONCodec(), BinaryCodec()):
+            self.assertEqual(
+                SharedMessage.from_bytes(message.to_bytes(codec), codec), message
+            )
+
+    def test_benchmark_size_and_parse_time(self):
+        messages = [json.loads(m) for m in signed_messages(500)]
+        results = {}
+        for codec in (JSONCodec(), BinaryCodec()):
+            encoded = [codec.encode(m) for m in messages]
+            start = time.perf_counter()
+            for payload in encoded:
+                codec.decode(payload)
+            decode_us = (time.perf_counter() - start) / len(messages) * 1e6
+            size = sum(len(p) for p in encoded) / len(messages)
+            results[codec.name] = size
+            print(f"\n{codec.name}: {size:.0f} bytes, {decode_us:.1f} us to decode")
+        self.assertLess(results["binary"], results["json"] * 0.8)
+
+
+class TestNodeBinaryCodec(unittest.TestCase):
+    def setUp(self):
+        self.nodes = [
+            ChaincraftNode(persistent=False, codec="binary") for _ in range(2)
+        ]
+        for node in self.nodes:
+            node.start()
+        self.nodes[0].connect_to_peer(
+            self.nodes[1].host, self.nodes[1].port, discovery=True
+        )
+
+    def tearDown(self):
+        for node in self.nodes:
+            node.close()
+
+    def wait_for(self, condition, timeout=5):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if condition():
+                return True
+            time.sleep(0.05)
+        return False
+
+    def test_codec_announced_in_discovery(self):
+        sender, receiver = self.nodes
+        self.assertTrue(
+            self.wait_for(lambda: (sender.host, sender.port) in receiver.peer_codecs)
+        )
+        self.assertIn("binary", receiver.peer_codecs[(sender.host, sender.port)])
+
+    def test_messages_travel_as_binary_with_canonical_hash(self):
+        sender, receiver = self.nodes
+        # The receiver learned the sender's codecs from its discovery message
+        self.assertTrue(
+            self.wait_for(lambda: (sender.host, sender.port) in receiver.peer_codecs)
+        )
+        sent = []
+        send_datagram = receiver._send_datagram
+
+        def recording_send(data, addr):
+            sent.append(data)
+            send_datagram(data, addr)
+
+        receiver._send_datagram = recording_send
+        data = json.loads(signed_messages(1)[0])
+        message_hash, _ = receiver.create_shared_message(data)
+
+        self.assertTrue(self.wait_for(lambda: message_hash in sender.db))
+        self.assertEqual(json.loads(sender.db[message_hash]), data)
+        self.assertTrue(any(d[:2] == BINARY for d in sent))
+
+    def test_message_decoded_once(self):
+        # An unstarted node, so no gossip thread parses messages meanwhile
+        node = ChaincraftNode(persistent=False)
+        node.accepted_message_types = [str]
+        data = node.compress_message(json.dumps("decode me once"))
+        with mock.patch.object(
+            SharedMessage, "from_json", wraps=SharedMessage.from_json
+        ) as from_json:
+            node._process_datagram(data, ("127.0.0.1", 1))
+        self.assertEqual(from_json.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,190 @@
+# tests/test_compression.py
+
+import base64
+import json
+import os
+import random
+import time
+import unittest
+import zlib
+
+from chaincraft import ChaincraftNode
+from chaincraft.compression import COMPRESSED, DictionaryCompressor, dictionary_id
+from chaincraft.crypto_primitives.sign import ECDSASignaturePrimitive
+
+PEER = ("127.0.0.1", 9999)
+
+
+def signed_messages(count, num_keys=5, seed=7331):
+    """
+    Chatroom-style posts signed with a handful of ECDSA keys, i.e. the
+    repeated keys, PEM blocks and hex signatures that make up our traffic.
+    """
+    rng = random.Random(seed)
+    signers = []
+    for _ in range(num_keys):
+        ecdsa = ECDSASignaturePrimitive()
+        ecdsa.generate_key()
+        signers.append(ecdsa)
+
+    messages = []
+    for i in range(count):
+        signer = rng.choice(signers)
+        data = {
+            "message_type": "POST_MESSAGE",
+            "chatroom_name": rng.choice(["general", "dev", "random"]),
+            "public_key_pem": signer.get_public_pem(),
+            "text": f"message {i} " + rng.choice(["hello", "ping", "gm", "ok"]),
+            "timestamp": 1700000000 + i + rng.random(),
+        }
+        payload = json.dumps(data, sort_keys=True)
+        data["signature"] = signer.sign(payload.encode()).hex()
+        messages.append(json.dumps(data))
+    return messages
+
+
+def trained_pair():
+    sender, receiver = DictionaryCompressor(), DictionaryCompressor()
+    dict_id = sender.train(signed_messages(256))
+    receiver.add_dictionary(sender.dictionaries[dict_id])
+    sender.acknowledge(PEER, dict_id)
+    return sender, receiver
+
+
+class TestDictionaryCompressor(unittest.TestCase):
+    def test_roundtrip(self):
+        sender, receiver = trained_pair()
+        for message in signed_messages(20, seed=1):
+            frame = sender.encode(message.encode(), PEER)
+            self.assertEqual(frame[:2], COMPRESSED)
+            self.assertEqual(receiver.decode(frame), message.encode())
+
+    def test_not_compressed_until_acknowledged(self):
+        compressor = DictionaryCompressor()
+        compressor.train(signed_messages(64))
+        message = signed_messages(1, seed=2)[0].encode()
+        self.assertEqual(compressor.encode(message, PEER), message)
+
+    def test_incompressible_falls_back_to_raw(self):
+        sender, _ = trained_pair()
+        data = os.urandom(300)
+        self.assertEqual(sender.encode(data, PEER), data)
+        self.assertEqual(sender.stats()["fallbacks"], 1)
+
+    def test_unknown_dictionary(self):
+        sender, _ = trained_pair()
+        frame = sender.encode(signed_messages(1, seed=3)[0].encode(), PEER)
+        self.assertIsNone(DictionaryCompressor().decode(frame))
+
+    def test_decode_limit(self):
+        sender, receiver = trained_pair()
+        message = signed_messages(1, seed=5)[0].encode()
+        frame = sender.encode(message, PEER)
+        self.assertEqual(receiver.decode(frame, len(message)), message)
+        with self.assertRaises(ValueError):
+            receiver.decode(frame, len(message) - 1)
+
+    def test_dictionaries_are_bounded(self):
+        compressor = DictionaryCompressor(max_dictionary_size=100, max_dictionaries=2)
+        with self.assertRaises(ValueError):
+            compressor.add_dictionary(b"x" * 101)
+        active = compressor.set_dictionary(b"a" * 100)
+        first = compressor.add_dictionary(b"b" * 100)
+        second = compressor.add_dictionary(b"c" * 100)
+        third = compressor.add_dictionary(b"d" * 100)
+        self.assertEqual(list(compressor.dictionaries), [active, third])
+        self.assertNotIn(first, compressor.dictionaries)
+        self.assertNotIn(second, compressor.dictionaries)
+
+    def test_benchmark_ratio_and_cost(self):
+        sender, receiver = trained_pair()
+        messages = [m.encode() for m in signed_messages(500, seed=4)]
+        raw = sum(len(m) for m in messages)
+
+        plain = sum(len(zlib.compress(m)) for m in messages)
+
+        start = time.perf_counter()
+        frames = [sender.encode(m, PEER) for m in messages]
+        encode_us = (time.perf_counter() - start) / len(messages) * 1e6
+        start = time.perf_counter()
+        for frame in frames:
+            receiver.decode(frame)
+        decode_us = (time.perf_counter() - start) / len(messages) * 1e6
+        wire = sum(len(f) for f in frames)
+
+        print(f"\nAverage message: {raw / len(messages):.0f} bytes")
+        print(f"Plain zlib ratio: {raw / plain:.2f}x")
+        print(f"Dictionary ratio: {raw / wire:.2f}x")
+        print(f"Encode: {encode_us:.1f} us/message, decode: {decode_us:.1f} us/message")
+        self.assertGreater(raw / wire, 2.0)
+        self.assertGreater(raw / wire, raw / plain)
+
+
+class TestNodeDictionaryCompression(unittest.TestCase):
+    def setUp(self):
+        self.nodes = [
+            ChaincraftNode(
+                persistent=False,
+                dictionary_compression=DictionaryCompressor(train_after=10),
+            )
+            for _ in range(2)
+        ]
+        for node in self.nodes:
+            node.start()
+        self.nodes[0].connect_to_peer(self.nodes[1].host, self.nodes[1].port)
+        self.nodes[1].connect_to_peer(self.nodes[0].host, self.nodes[0].port)
+
+    def tearDown(self):
+        for node in self.nodes:
+            node.close()
+
+    def wait_for(self, condition, timeout=10):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if condition():
+                return True
+            time.sleep(0.05)
+        return False
+
+    def test_mutually_exclusive_with_use_compression(self):
+        with self.assertRaises(ValueError):
+            ChaincraftNode(
+                use_compression=True, dictionary_compression=DictionaryCompressor()
+            )
+
+    def test_dictionary_offers_only_from_peers(self):
+        node = ChaincraftNode(
+            persistent=False, dictionary_compression=DictionaryCompressor()
+        )
+        sent = []
+        node._send_datagram = lambda data, addr: sent.append(addr)
+        dictionary = b"shared words " * 100
+        offer = {
+            "id": dictionary_id(dictionary).hex(),
+            "dictionary": base64.b64encode(dictionary).decode(),
+        }
+        node._handle_compression_dictionary(offer, PEER)
+        self.assertEqual((node.compressor.dictionaries, sent), ({}, []))
+        node.peers = [PEER]
+        node._handle_compression_dictionary(offer, PEER)
+        self.assertIn(dictionary_id(dictionary), node.compressor.dictionaries)
+        self.assertEqual(sent, [PEER])
+
+    def test_messages_propagate_compressed(self):
+        sender, receiver = self.nodes
+        messages = [json.loads(m) for m in signed_messages(30)]
+        for data in messages[:10]:
+            sender.create_shared_message(data)
+
+        self.assertTrue(
+            self.wait_for(lambda: len(sender.compressor.peer_dictionaries) == 1)
+        )
+        hashes = [sender.create_shared_message(data)[0] for data in messages[10:]]
+        self.assertTrue(self.wait_for(lambda: all(h in receiver.db for h in hashes)))
+        self.assertGreater(sender.compressor.stats()["compressed_messages"], 0)
+        # Hashes are over the plain encoding, so both sides agree
+        self.assertEqual(set(sender.db.keys()), set(receiver.db.keys()))
+
+
+if __name__ == "__main__":
+    unittest.main()
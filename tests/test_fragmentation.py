@@ -0,0 +1,198 @@
+# tests/test_fragmentation.py
+
+import json
+import os
+import time
+import unittest
+
+from chaincraft import ChaincraftNode
+from chaincraft.fragmentation import (
+    FRAGMENT_HEADER,
+    MAX_FRAGMENTS,
+    PARTIAL_OVERHEAD,
+    FragmentCache,
+    ReassemblyBuffer,
+    decode_nack,
+    encode_nack,
+    split_message,
+)
+
+PEER = ("127.0.0.1", 9999)
+
+
+class TestReassemblyBuffer(unittest.TestCase):
+    def test_out_of_order_reassembly(self):
+        data = os.urandom(5000)
+        fragments = split_message(data, 1400)
+        self.assertEqual(len(fragments), 4)
+        self.assertTrue(all(len(f) <= 1400 for f in fragments))
+
+        buffer = ReassemblyBuffer()
+        for fragment in reversed(fragments[1:]):
+            self.assertIsNone(buffer.add(fragment, PEER))
+        self.assertEqual(buffer.add(fragments[0], PEER), data)
+        self.assertEqual(buffer.buffered_bytes, 0)
+
+    def test_duplicate_fragment_after_completion_is_ignored(self):
+        fragments = split_message(os.urandom(3000), 1400)
+        buffer = ReassemblyBuffer()
+        for fragment in fragments:
+            buffer.add(fragment, PEER, now=100.0)
+        self.assertIsNone(buffer.add(fragments[1], PEER, now=100.1))
+        self.assertEqual(buffer.partials, {})
+
+    def test_missing_fragments_are_nacked_then_expired(self):
+        fragments = split_message(os.urandom(6000), 1400)
+        buffer = ReassemblyBuffer(timeout=5.0, nack_delay=0.5)
+        buffer.add(fragments[0], PEER, now=100.0)
+        buffer.add(fragments[3], PEER, now=100.0)
+
+        self.assertEqual(buffer.pending_nacks(now=100.1), [])
+        nacks = buffer.pending_nacks(now=100.6)
+        self.assertEqual(len(nacks), 1)
+        addr, message_id, missing = nacks[0]
+        self.assertEqual(addr, PEER)
+        self.assertEqual(missing, [1, 2, 4])
+
+        # Not NACKed again before nack_delay elapses
+        self.assertEqual(buffer.pending_nacks(now=100.8), [])
+
+        buffer.pending_nacks(now=106.0)
+        self.assertEqual(buffer.partials, {})
+        self.assertEqual(buffer.expired, 1)
+        self.assertEqual(buffer.buffered_bytes, 0)
+
+    def test_memory_cap_evicts_oldest(self):
+        buffer = ReassemblyBuffer(max_bytes=3000)
+        first = split_message(os.urandom(4000), 1400)
+        second = split_message(os.urandom(4000), 1400)
+        buffer.add(first[0], PEER)
+        buffer.add(first[1], PEER)
+        buffer.add(second[0], PEER)
+
+        self.assertEqual(buffer.evicted, 1)
+        self.assertEqual(len(buffer.partials), 1)
+        self.assertLessEqual(buffer.buffered_bytes, 3000)
+
+    def test_empty_partials_are_bounded(self):
+        buffer = ReassemblyBuffer(max_bytes=10 * PARTIAL_OVERHEAD)
+        for i in range(50):
+            frame = FRAGMENT_HEADER.pack(b"\xccF", b"%08d" % i, 0, MAX_FRAGMENTS)
+            buffer.add(frame, PEER)
+        self.assertEqual(len(buffer.partials), 10)
+        self.assertEqual(buffer.evicted, 40)
+
+        buffer = ReassemblyBuffer(max_partials=5)
+        for i in range(50):
+            frame = FRAGMENT_HEADER.pack(b"\xccF", b"%08d" % i, 0, MAX_FRAGMENTS)
+            buffer.add(frame, PEER)
+        self.assertEqual(len(buffer.partials), 5)
+
+    def test_nacks_per_partial_are_capped(self):
+        fragments = split_message(os.urandom(6000), 1400)
+        buffer = ReassemblyBuffer(timeout=60.0, nack_delay=0.5, max_nacks=3)
+        buffer.add(fragments[0], PEER, now=100.0)
+        sent = sum(len(buffer.pending_nacks(now=101.0 + i)) for i in range(20))
+        self.assertEqual(sent, 3)
+
+    def test_corrupted_fragment_is_rejected(self):
+        data = os.urandom(3000)
+        fragments = split_message(data, 1400)
+        tampered = fragments[1][: FRAGMENT_HEADER.size] + b"x" * (
+            len(fragments[1]) - FRAGMENT_HEADER.size
+        )
+        buffer = ReassemblyBuffer()
+        buffer.add(fragments[0], PEER)
+        buffer.add(tampered, PEER)
+        self.assertIsNone(buffer.add(fragments[2], PEER))
+
+    def test_nack_roundtrip(self):
+        frame = encode_nack(b"12345678", [0, 7, 300])
+        self.assertEqual(decode_nack(frame), (b"12345678", [0, 7, 300]))
+
+    def test_nacks_only_resend_each_fragment_once_to_its_recipient(self):
+        cache = FragmentCache()
+        data = os.urandom(3000)
+        fragments = cache.fragments_for(data, 1400, PEER)
+        message_id = FRAGMENT_HEADER.unpack_from(fragments[0])[1]
+        self.assertEqual(
+            cache.get(PEER, message_id, [1] * 500 + [2, 1, 9, 65535], 1400),
+            fragments[1:3],
+        )
+        self.assertEqual(cache.get(("10.0.0.1", 9999), message_id, [1], 1400), [])
+
+
+class TestFragmentNacks(unittest.TestCase):
+    def test_only_peers_are_nacked(self):
+        node = ChaincraftNode(persistent=False)
+        sent = []
+        node._send_datagram = lambda data, addr: sent.append(addr)
+        node.peers = [PEER]
+        stranger = ("10.0.0.1", 9999)
+        for addr in (PEER, stranger):
+            fragments = split_message(os.urandom(3000), 1400)
+            node.reassembly_buffer.add(fragments[0], addr, now=100.0)
+        node.clock = lambda: 101.0
+        node._request_missing_fragments()
+        self.assertEqual(sent, [PEER])
+        node.close()
+
+
+class TestLargeMessagePropagation(unittest.TestCase):
+    def setUp(self):
+        self.nodes = [ChaincraftNode(persistent=False) for _ in range(2)]
+        for node in self.nodes:
+            node.start()
+        self.nodes[0].connect_to_peer(self.nodes[1].host, self.nodes[1].port)
+        self.nodes[1].connect_to_peer(self.nodes[0].host, self.nodes[0].port)
+
+    def tearDown(self):
+        for node in self.nodes:
+            node.close()
+
+    def wait_for(self, message_hash, timeout=5):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if message_hash in self.nodes[1].db:
+                return True
+            time.sleep(0.05)
+        return False
+
+    def large_block(self):
+        return {
+            "message_type": "Block",
+            "transactions": [{"tx_id": "%064x" % i, "amount": i} for i in range(300)],
+        }
+
+    def test_large_message_propagates(self):
+        block = self.large_block()
+        self.assertGreater(len(json.dumps(block)), 20000)
+
+        message_hash, _ = self.nodes[0].create_shared_message(block)
+        self.assertTrue(self.wait_for(message_hash))
+        self.assertEqual(json.loads(self.nodes[1].db[message_hash]), block)
+
+    def test_lost_fragment_is_requested_again(self):
+        sender = self.nodes[0]
+        send_datagram = sender._send_datagram
+        dropped = []
+
+        def lossy_send(data, addr):
+            # Drop the second fragment the first time it is sent
+            if data[:2] == b"\xccF" and not dropped:
+                _, _, index, _ = FRAGMENT_HEADER.unpack_from(data)
+                if index == 1:
+                    dropped.append(index)
+                    return
+            send_datagram(data, addr)
+
+        sender._send_datagram = lossy_send
+        sender.gossip_round = lambda: None  # no rebroadcast, only the NACK can help
+
+        message_hash, _ = sender.create_shared_message(self.large_block())
+        self.assertTrue(self.wait_for(message_hash))
+        self.assertEqual(dropped, [1])
+
+
+if __name__ == "__main__":
+    unittest.main()
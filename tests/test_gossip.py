@@ -0,0 +1,146 @@
+# tests/test_gossip.py
+
+import json
+import time
+import unittest
+from unittest import mock
+
+from chaincraft import ChaincraftNode
+from chaincraft.gossip import (
+    FanoutStrategy,
+    FloodStrategy,
+    PushPullStrategy,
+    simulate_propagation,
+    unwrap_ttl,
+    wrap_ttl,
+)
+
+PEERS = [("127.0.0.1", port) for port in range(7001, 7011)]
+
+
+def wait_for_propagation(nodes, expected_count, timeout=15):
+    start_time = time.time()
+    while time.time() - start_time < timeout:
+        if all(len(node.db) == expected_count for node in nodes):
+            return True
+        time.sleep(0.1)
+    return False
+
+
+class TestGossipStrategies(unittest.TestCase):
+    def test_ttl_envelope_roundtrip(self):
+        ttl, data = unwrap_ttl(wrap_ttl(b"payload", 5))
+        self.assertEqual(ttl, 5)
+        self.assertEqual(data, b"payload")
+        with self.assertRaises(ValueError):
+            unwrap_ttl(b"\xccT")
+
+    def test_flood_excludes_origin(self):
+        targets = FloodStrategy().relay_targets(PEERS, PEERS[0])
+        self.assertEqual(targets, PEERS[1:])
+
+    def test_fanout_limits_targets(self):
+        strategy = FanoutStrategy(fanout=3, seed=1)
+        targets = strategy.relay_targets(PEERS, PEERS[0])
+        self.assertEqual(len(targets), 3)
+        self.assertNotIn(PEERS[0], targets)
+        self.assertEqual(strategy.next_ttl(None), strategy.ttl)
+        self.assertEqual(strategy.next_ttl(2), 1)
+
+    def test_benchmark_propagation(self):
+        print()
+        for num_nodes in (10, 50, 100, 500):
+            for strategy in (FloodStrategy(), FanoutStrategy(), PushPullStrategy()):
+                result = simulate_propagation(strategy, num_nodes, seed=num_nodes)
+                print(
+                    f"{num_nodes:>4} nodes {strategy.name:>9}: "
+                    f"rounds={result['rounds']} coverage={result['coverage']:.2f} "
+                    f"sends={result['sends']} redundant={result['redundant_sends']} "
+                    f"control={result['control_sends']}"
+                )
+                # Pure fanout trades coverage for fewer sends
+                if strategy.name != FanoutStrategy.name:
+                    self.assertEqual(result["coverage"], 1.0)
+
+        flood = simulate_propagation(FloodStrategy(), 500, seed=1)
+        push_pull = simulate_propagation(PushPullStrategy(), 500, seed=1)
+        self.assertLess(push_pull["sends"], flood["sends"])
+
+
+class TestNodeGossipStrategy(unittest.TestCase):
+    def make_node(self, strategy):
+        # Unstarted, so only the datagrams fed in below are processed
+        node = ChaincraftNode(persistent=False, gossip_strategy=strategy)
+        node.accepted_message_types = [str]
+        node.peers = list(PEERS[:3])
+        return node
+
+    def test_no_echo_to_sender(self):
+        node = self.make_node(FloodStrategy())
+        data = node.compress_message(json.dumps("no echo"))
+        with mock.patch.object(node, "_sendto") as sendto:
+            node._process_datagram(data, PEERS[0])
+        recipients = [call.args[1] for call in sendto.call_args_list]
+        self.assertEqual(sorted(recipients), PEERS[1:3])
+
+    def test_ttl_decremented_and_exhausted(self):
+        node = self.make_node(FanoutStrategy(fanout=5, ttl=4))
+        data = node.compress_message(json.dumps("hop limited"))
+        with mock.patch.object(node, "_sendto") as sendto:
+            node._process_datagram(wrap_ttl(data, 3), PEERS[0])
+        self.assertEqual({call.args[2] for call in sendto.call_args_list}, {2})
+
+        last_hop = node.compress_message(json.dumps("last hop"))
+        with mock.patch.object(node, "_sendto") as sendto:
+            node._process_datagram(wrap_ttl(last_hop, 1), PEERS[0])
+        self.assertIn(node.hash_message(last_hop), node.db)
+        sendto.assert_not_called()
+
+    def test_originated_messages_carry_ttl(self):
+        node = self.make_node(FanoutStrategy(fanout=2, ttl=6))
+        with mock.patch.object(node, "_sendto") as sendto:
+            node.create_shared_message("fresh")
+        self.assertEqual(len(sendto.call_args_list), 2)
+        self.assertEqual({call.args[2] for call in sendto.call_args_list}, {6})
+
+    def test_pull_answered_only_for_peers(self):
+        node = self.make_node(PushPullStrategy())
+        node.create_shared_message("pulled")
+        node.peers = list(PEERS[:3])
+        with mock.patch.object(node, "_sendto") as sendto:
+            node._handle_pull([], ("10.0.0.1", 7001))
+            sendto.assert_not_called()
+            node._handle_pull([], PEERS[0])
+        self.assertEqual({call.args[1] for call in sendto.call_args_list}, {PEERS[0]})
+
+
+class TestPushPullNetwork(unittest.TestCase):
+    def setUp(self):
+        self.nodes = [
+            ChaincraftNode(
+                persistent=False,
+                gossip_strategy=PushPullStrategy(fanout=1, ttl=1),
+            )
+            for _ in range(4)
+        ]
+        for node in self.nodes:
+            node.start()
+        for i in range(len(self.nodes) - 1):
+            a, b = self.nodes[i], self.nodes[i + 1]
+            a.connect_to_peer(b.host, b.port)
+            b.connect_to_peer(a.host, a.port)
+
+    def tearDown(self):
+        for node in self.nodes:
+            node.close()
+
+    def test_pull_reaches_nodes_beyond_ttl(self):
+        # With ttl=1 the push stops after one hop; pull rounds do the rest
+        message_hash, _ = self.nodes[0].create_shared_message("pull me")
+        self.assertTrue(wait_for_propagation(self.nodes, 1, timeout=20))
+        for node in self.nodes:
+            self.assertIn(message_hash, node.db)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,183 @@
+# tests/test_handshake.py
+
+import hashlib
+import json
+import time
+import unittest
+import zlib
+
+from chaincraft import ChaincraftNode
+from chaincraft.anti_entropy import PrefixMerkleTree
+from chaincraft.compression import DEFLATED, encode_deflated_frame
+from chaincraft.fragmentation import FRAGMENT
+from chaincraft.handshake import FEATURE_ANTI_ENTROPY, PROTOCOL_VERSION, Capabilities
+
+PEER = ("127.0.0.1", 7001)
+OTHER = ("127.0.0.1", 7002)
+
+
+def record_sends(node):
+    sent = []
+    node._send_datagram = lambda data, addr: sent.append((data, addr))
+    return sent
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+class TestCapabilities(unittest.TestCase):
+    def test_roundtrip_and_unknown_fields(self):
+        capabilities = Capabilities(
+            codecs=["json", "binary"],
+            compression=["zlib"],
+            max_datagram_size=600,
+            features=[FEATURE_ANTI_ENTROPY],
+        )
+        announced = dict(capabilities.to_dict(), future_field=[1, 2])
+        parsed = Capabilities.from_dict(json.loads(json.dumps(announced)))
+        self.assertEqual(parsed.to_dict(), capabilities.to_dict())
+        self.assertEqual(parsed.version, PROTOCOL_VERSION)
+
+    def test_malformed(self):
+        for data in (
+            None,
+            [],
+            {"version": "1"},
+            {"version": 1, "max_datagram_size": 8},
+        ):
+            self.assertIsNone(Capabilities.from_dict(data))
+        parsed = Capabilities.from_dict({"version": 1, "codecs": "binary"})
+        self.assertEqual(parsed.codecs, ["json"])
+
+
+class TestCanonicalHashes(unittest.TestCase):
+    def setUp(self):
+        self.plain = ChaincraftNode(persistent=False)
+        self.compressed = ChaincraftNode(persistent=False, use_compression=True)
+
+    def test_same_id_with_and_without_compression(self):
+        data = {"message_type": "Test", "text": "same everywhere" * 10}
+        self.assertEqual(
+            self.plain.create_shared_message(data)[0],
+            self.compressed.create_shared_message(data)[0],
+        )
+
+    def test_deflated_frames_and_zlib_streams_decode_everywhere(self):
+        message = json.dumps({"text": "compressible " * 20})
+        message_hash = hashlib.sha256(message.encode()).hexdigest()
+        frame = encode_deflated_frame(message_hash, message.encode())
+        self.plain._process_datagram(frame, PEER)
+        # A plain zlib stream, as sent by nodes from before DEFLATED frames
+        self.plain._process_datagram(zlib.compress(b'"legacy"'), PEER)
+        self.assertEqual(self.plain.db[message_hash], message)
+        self.assertIn(hashlib.sha256(b'"legacy"').hexdigest(), self.plain.db)
+
+    def test_deflated_frame_with_wrong_hash_is_rejected(self):
+        message = json.dumps("real content")
+        forged = encode_deflated_frame("00" * 32, message.encode())
+        self.plain._process_datagram(forged, PEER)
+        self.assertEqual(len(self.plain.db), 0)
+        self.assertEqual(self.plain.invalid_message_counts[PEER], 1)
+
+
+class TestPerPeerEncoding(unittest.TestCase):
+    def setUp(self):
+        self.node = ChaincraftNode(persistent=False, use_compression=True)
+        self.node.peers = [PEER, OTHER]
+        self.sent = record_sends(self.node)
+
+    def test_compression_only_for_peers_that_decode_it(self):
+        self.node.peer_capabilities[OTHER] = Capabilities(compression=[])
+        self.node.create_shared_message({"text": "compressible " * 20})
+        encodings = {addr: data[:2] for data, addr in self.sent}
+        self.assertEqual(encodings[PEER], DEFLATED)
+        self.assertEqual(encodings[OTHER], b"{" + b'"')
+
+    def test_datagrams_respect_peer_mtu(self):
+        self.node.use_compression = False
+        self.node.peer_capabilities[OTHER] = Capabilities(max_datagram_size=600)
+        self.node.create_shared_message({"blob": "x" * 1000})
+        sizes = {addr: [] for addr in (PEER, OTHER)}
+        for data, addr in self.sent:
+            sizes[addr].append(len(data))
+        self.assertEqual(len(sizes[PEER]), 1)
+        self.assertGreater(len(sizes[OTHER]), 1)
+        self.assertLessEqual(max(sizes[OTHER]), 600)
+        self.assertTrue(all(d[:2] == FRAGMENT for d, a in self.sent if a == OTHER))
+
+    def test_features_select_peers(self):
+        self.node.peer_capabilities[OTHER] = Capabilities(features=[])
+        self.assertEqual(self.node._peers_with(FEATURE_ANTI_ENTROPY), [PEER])
+
+    def test_capabilities_only_from_the_announced_sender(self):
+        def discovery(address):
+            message = {
+                "PEER_DISCOVERY": f"{address[0]}:{address[1]}",
+                "HANDSHAKE": Capabilities(compression=[]).to_dict(),
+            }
+            return self.node.compress_message(json.dumps(message))
+
+        self.node._process_datagram(discovery(OTHER), PEER)
+        self.assertNotIn(OTHER, self.node.peer_capabilities)
+        self.node._process_datagram(discovery(PEER), PEER)
+        self.assertEqual(self.node.peer_capabilities[PEER].compression, [])
+
+
+class TestHandshake(unittest.TestCase):
+    def setUp(self):
+        self.plain = ChaincraftNode(persistent=False)
+        self.compressed = ChaincraftNode(
+            persistent=False, use_compression=True, anti_entropy=PrefixMerkleTree()
+        )
+        self.nodes = [self.plain, self.compressed]
+        for node in self.nodes:
+            node.start()
+
+    def tearDown(self):
+        for node in self.nodes:
+            node.close()
+
+    def address(self, node):
+        return (node.host, node.port)
+
+    def test_mixed_nodes_interoperate(self):
+        self.plain.connect_to_peer(*self.address(self.compressed), discovery=True)
+        self.assertTrue(
+            wait_for(
+                lambda: self.address(self.compressed) in self.plain.peer_capabilities
+                and self.address(self.plain) in self.compressed.peer_capabilities
+            )
+        )
+        capabilities = self.plain.peer_capabilities[self.address(self.compressed)]
+        self.assertIn("zlib", capabilities.compression)
+        self.assertIn(FEATURE_ANTI_ENTROPY, capabilities.features)
+
+        first, _ = self.compressed.create_shared_message({"n": "x" * 200})
+        second, _ = self.plain.create_shared_message({"n": "y" * 200})
+        self.assertTrue(
+            wait_for(
+                lambda: all(
+                    h in node.db for h in (first, second) for node in self.nodes
+                )
+            )
+        )
+
+    def test_existing_peers_answer_the_handshake(self):
+        self.plain.connect_to_peer(*self.address(self.compressed))
+        self.compressed.connect_to_peer(*self.address(self.plain))
+        self.plain.send_peer_discovery(*self.address(self.compressed))
+        self.assertTrue(
+            wait_for(
+                lambda: self.address(self.compressed) in self.plain.peer_capabilities
+            )
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,163 @@
+# tests/test_iblt.py
+
+import hashlib
+import json
+import time
+import unittest
+
+from chaincraft import ChaincraftNode
+from chaincraft.gossip import FanoutStrategy
+from chaincraft.iblt import IBLT, SetReconciler, simulate_exchange
+
+
+def make_hashes(count, tag=""):
+    return [hashlib.sha256(f"{tag}{i}".encode()).hexdigest() for i in range(count)]
+
+
+def diverge(base, diff):
+    """Drop diff/2 hashes from base and add diff/2 new ones."""
+    half = diff // 2
+    return base[half:] + make_hashes(diff - half, "new")
+
+
+class TestIBLT(unittest.TestCase):
+    def test_decode_symmetric_difference(self):
+        shared = [bytes.fromhex(h) for h in make_hashes(1000)]
+        only_a = [bytes.fromhex(h) for h in make_hashes(6, "a")]
+        only_b = [bytes.fromhex(h) for h in make_hashes(4, "b")]
+        a = IBLT(30)
+        b = IBLT(30)
+        a.update(shared + only_a)
+        b.update(shared + only_b)
+        first, second, complete = a.subtract(b).decode()
+        self.assertTrue(complete)
+        self.assertEqual(first, set(only_a))
+        self.assertEqual(second, set(only_b))
+
+    def test_too_small_table_is_detected(self):
+        a = IBLT(6)
+        a.update(bytes.fromhex(h) for h in make_hashes(50))
+        _, _, complete = a.subtract(IBLT(6)).decode()
+        self.assertFalse(complete)
+
+    def test_serialization_roundtrip(self):
+        table = IBLT(12)
+        table.update(bytes.fromhex(h) for h in make_hashes(5))
+        restored = IBLT.from_bytes(table.to_bytes())
+        self.assertEqual(restored.to_bytes(), table.to_bytes())
+        with self.assertRaises(ValueError):
+            IBLT.from_bytes(table.to_bytes()[:-1])
+        with self.assertRaises(ValueError):
+            table.add(b"short")
+
+    def test_benchmark_bytes_by_difference(self):
+        reconciler = SetReconciler()
+        base = make_hashes(reconciler.window)
+        # Full-store gossip resends every message (~400 bytes each) per round,
+        # an inventory exchange sends every hash as hex
+        full_gossip_bytes = 400 * len(base)
+        inventory_bytes = 64 * len(base)
+        print(
+            f"\nWindow {len(base)}: full gossip {full_gossip_bytes} B, "
+            f"hash list {inventory_bytes} B"
+        )
+        for diff in (0, 1, 10, 100, 1000):
+            result = simulate_exchange(reconciler, base, diverge(base, diff))
+            # Tables travel as hex in JSON messages
+            wire_bytes = 2 * result["bytes"]
+            print(
+                f"diff {diff:>4}: sketch {wire_bytes:>7} B in {result['attempts']} "
+                f"attempt(s), {full_gossip_bytes / wire_bytes:.0f}x less than "
+                f"full gossip"
+            )
+            self.assertEqual(result["only_first"] + result["only_second"], diff)
+            self.assertFalse(result["fallback"])
+            if diff <= 100:
+                self.assertLess(wire_bytes, inventory_bytes / 5)
+
+
+class TestSketchLimits(unittest.TestCase):
+    def setUp(self):
+        self.node = ChaincraftNode(persistent=False, set_reconciliation=SetReconciler())
+        self.peer = ("127.0.0.1", 7001)
+        self.node.peers = [self.peer]
+        self.sent = []
+        self.node._send_datagram = lambda data, addr: self.sent.append(addr)
+
+    def test_sketches_are_sent_to_peers_only(self):
+        self.node._handle_sketch_request(3072, ("10.0.0.1", 7001))
+        table = IBLT(30).to_bytes().hex()
+        self.node._handle_sketch({"table": table, "hashes": 3}, ("10.0.0.1", 7001))
+        self.assertEqual(self.sent, [])
+        self.node._handle_sketch_request(3072, self.peer)
+        # A full-size sketch goes out in fragments
+        self.assertEqual(set(self.sent), {self.peer})
+
+    def test_malformed_and_oversized_sketches_are_invalid(self):
+        max_cells = self.node.reconciler.max_cells
+        for sketch in (
+            {"table": IBLT(max_cells + 3).to_bytes().hex(), "hashes": 3},
+            {"table": "zz", "hashes": 3},
+            {"table": IBLT(30).to_bytes().hex(), "hashes": "3"},
+        ):
+            self.node._handle_sketch(sketch, self.peer)
+        self.assertEqual(self.sent, [])
+        self.assertEqual(self.node.invalid_messages, 3)
+
+
+class TestNodeSetReconciliation(unittest.TestCase):
+    def create_nodes(self, reconciler_factory):
+        self.nodes = []
+        for _ in range(2):
+            # No periodic rebroadcast: only sketches reconcile the stores
+            node = ChaincraftNode(
+                persistent=False,
+                gossip_strategy=FanoutStrategy(),
+                set_reconciliation=reconciler_factory(),
+            )
+            node.SKETCH_INTERVAL = 0.1
+            self.nodes.append(node)
+        for node in self.nodes:
+            node.start()
+        a, b = self.nodes
+        a.connect_to_peer(b.host, b.port)
+        b.connect_to_peer(a.host, a.port)
+
+    def tearDown(self):
+        for node in self.nodes:
+            node.close()
+
+    def store_distinct(self, per_node):
+        for node_index, node in enumerate(self.nodes):
+            for i in range(per_node):
+                message = json.dumps(f"node {node_index} message {i}")
+                node._store_message(
+                    node.hash_message(node.compress_message(message)), message
+                )
+
+    def wait_converged(self, expected, timeout=10):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if all(len(node.db) == expected for node in self.nodes):
+                return True
+            time.sleep(0.1)
+        return False
+
+    def test_small_difference_converges(self):
+        self.create_nodes(SetReconciler)
+        self.store_distinct(3)
+        self.assertTrue(self.wait_converged(6))
+
+    def test_larger_sketch_requested(self):
+        self.create_nodes(lambda: SetReconciler(initial_cells=3))
+        self.store_distinct(10)
+        self.assertTrue(self.wait_converged(20))
+
+    def test_fallback_to_hash_lists(self):
+        self.create_nodes(lambda: SetReconciler(initial_cells=3, max_cells=6))
+        self.store_distinct(20)
+        self.assertTrue(self.wait_converged(40))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,154 @@
+# tests/test_inventory_gossip.py
+
+import os
+import tempfile
+import unittest
+import time
+
+from chaincraft import ChaincraftNode
+from chaincraft.store import SQLiteStore
+
+
+def create_network(num_nodes, gossip_mode):
+    nodes = [
+        ChaincraftNode(persistent=False, gossip_mode=gossip_mode)
+        for _ in range(num_nodes)
+    ]
+    for node in nodes:
+        node.start()
+    return nodes
+
+
+def connect_line(nodes):
+    for i in range(len(nodes) - 1):
+        nodes[i].connect_to_peer(nodes[i + 1].host, nodes[i + 1].port)
+        nodes[i + 1].connect_to_peer(nodes[i].host, nodes[i].port)
+
+
+def wait_for_propagation(nodes, expected_count, timeout=15):
+    start_time = time.time()
+    while time.time() - start_time < timeout:
+        if all(len(node.db) == expected_count for node in nodes):
+            return True
+        time.sleep(0.1)
+    return False
+
+
+def measure_bytes_per_message(gossip_mode, num_nodes=4, num_messages=20, window=3.0):
+    """
+    Create messages on a line of nodes, wait for convergence, keep gossiping for
+    a fixed window and return total bytes sent per converged message.
+    """
+    nodes = create_network(num_nodes, gossip_mode)
+    try:
+        connect_line(nodes)
+        for i in range(num_messages):
+            # Roughly the size of a signed transaction
+            nodes[i % num_nodes].create_shared_message(
+                {"message_type": "TEST", "index": i, "payload": "x" * 400}
+            )
+        if not wait_for_propagation(nodes, num_messages):
+            return None
+        time.sleep(window)
+        return sum(node.bytes_sent for node in nodes) / num_messages
+    finally:
+        for node in nodes:
+            node.close()
+
+
+class TestInventoryGossip(unittest.TestCase):
+    def setUp(self):
+        self.nodes = create_network(3, ChaincraftNode.GOSSIP_INVENTORY)
+        connect_line(self.nodes)
+
+    def tearDown(self):
+        for node in self.nodes:
+            node.close()
+
+    def test_unknown_gossip_mode(self):
+        with self.assertRaises(ValueError):
+            ChaincraftNode(gossip_mode="telepathy")
+
+    def test_message_propagates_over_multiple_hops(self):
+        message_hash, _ = self.nodes[0].create_shared_message("Hello inventory")
+        self.assertTrue(wait_for_propagation(self.nodes, 1))
+        for node in self.nodes:
+            self.assertIn(message_hash, node.db)
+
+    def test_control_messages_are_not_stored(self):
+        self.nodes[0].create_shared_message("Only me")
+        self.assertTrue(wait_for_propagation(self.nodes, 1))
+        time.sleep(1)
+        for node in self.nodes:
+            self.assertEqual(len(node.db), 1)
+
+    def test_message_pushed_to_peer_at_most_once(self):
+        message_hash, _ = self.nodes[1].create_shared_message("Once")
+        self.assertTrue(wait_for_propagation(self.nodes, 1))
+        for peer in self.nodes[1].peers:
+            self.assertIn(message_hash, self.nodes[1].known_by_peer[peer])
+
+        time.sleep(1)
+        sent_before = [node.datagrams_sent for node in self.nodes]
+        time.sleep(2)
+        sent_after = [node.datagrams_sent for node in self.nodes]
+        self.assertEqual(sent_before, sent_after)
+
+    def test_missing_payload_is_requested(self):
+        late_node = ChaincraftNode(
+            persistent=False, gossip_mode=ChaincraftNode.GOSSIP_INVENTORY
+        )
+        late_node.start()
+        try:
+            message_hash, _ = self.nodes[0].create_shared_message("Before joining")
+            self.assertTrue(wait_for_propagation(self.nodes, 1))
+
+            late_node.connect_to_peer(self.nodes[2].host, self.nodes[2].port)
+            self.nodes[2].connect_to_peer(late_node.host, late_node.port)
+            self.assertTrue(wait_for_propagation([late_node], 1))
+            self.assertIn(message_hash, late_node.db)
+            self.assertEqual(late_node.pending_requests, {})
+        finally:
+            late_node.close()
+
+
+class TestMessageRequests(unittest.TestCase):
+    def test_requests_serve_a_bounded_batch_of_messages_to_peers(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        node = ChaincraftNode(
+            store=SQLiteStore(os.path.join(directory.name, "messages.db"))
+        )
+        self.addCleanup(node.close)
+        peer = ("127.0.0.1", 7001)
+        node.peers = [peer]
+        node.save_peers()
+        self.assertIn(node.PEERS, node.db)
+        sent = []
+        node._send_datagram = lambda data, addr: sent.append(addr)
+        hashes = [node.create_shared_message(f"n{i}")[0] for i in range(40)]
+        sent.clear()
+        node._handle_message_request(hashes, ("10.0.0.1", 7001))
+        self.assertEqual(sent, [])
+        node._handle_message_request([node.PEERS, node.BANNED_PEERS], peer)
+        self.assertEqual(sent, [])
+        node._handle_message_request(hashes, peer)
+        self.assertEqual(sent, [peer] * node.INVENTORY_BATCH_SIZE)
+
+
+class TestGossipBandwidth(unittest.TestCase):
+    def test_bytes_per_converged_message(self):
+        full = measure_bytes_per_message(ChaincraftNode.GOSSIP_FULL)
+        inventory = measure_bytes_per_message(ChaincraftNode.GOSSIP_INVENTORY)
+
+        self.assertIsNotNone(full)
+        self.assertIsNotNone(inventory)
+
+        print("\n--- Bytes sent per converged message (4 nodes, 20 messages, 3s) ---")
+        print(f"full:      {full:10.1f}")
+        print(f"inventory: {inventory:10.1f}")
+        self.assertLess(inventory, full)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+# tests/test_log_store.py
+
+import hashlib
+import os
+import tempfile
+import time
+import unittest
+
+from chaincraft import ChaincraftNode
+from chaincraft.log_store import HashIndex, LogStore
+
+
+def message_hash(i):
+    return hashlib.sha256(str(i).encode()).hexdigest()
+
+
+class TestHashIndex(unittest.TestCase):
+    def test_grows_and_reuses_removed_slots(self):
+        with tempfile.TemporaryDirectory() as directory:
+            index = HashIndex(os.path.join(directory, "index"), capacity=8)
+            digests = [bytes.fromhex(message_hash(i)) for i in range(100)]
+            for i, digest in enumerate(digests):
+                index.put(digest, 1, i)
+            self.assertGreaterEqual(index.capacity, 128)
+            self.assertEqual(index.get(digests[42]), (1, 42))
+            self.assertTrue(index.remove(digests[42]))
+            self.assertFalse(index.remove(digests[42]))
+            self.assertIsNone(index.get(digests[42]))
+            self.assertEqual(index.live, 99)
+            index.close((1, 0))
+
+
+class TestLogStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = self.directory.name
+
+    def open(self, **kwargs):
+        kwargs.setdefault("segment_size", 4096)
+        kwargs.setdefault("compact_interval", None)
+        return LogStore(self.path, **kwargs)
+
+    def test_mapping(self):
+        store = self.open()
+        self.addCleanup(store.close)
+        keys = [message_hash(i) for i in range(300)]
+        for i, key in enumerate(keys):
+            store[key] = f'{{"n": {i}}}'
+        store[b"PEERS"] = b"[]"
+        self.assertGreater(len(store.sealed), 1)
+        self.assertEqual(store[keys[7]], '{"n": 7}')
+        self.assertEqual(store.raw(keys[299]), b'{"n": 299}')
+        self.assertEqual(store["PEERS"], "[]")
+        self.assertEqual(list(store), keys + ["PEERS"])
+        store[keys[0]] = "replaced"
+        del store[keys[1]]
+        with self.assertRaises(KeyError):
+            del store[keys[1]]
+        self.assertNotIn(keys[1], store)
+        self.assertEqual(store[keys[0]], "replaced")
+        self.assertEqual(len(store), 300)
+        self.assertEqual(list(store)[-1], keys[0])
+
+    def test_compaction_keeps_live_records(self):
+        store = self.open()
+        self.addCleanup(store.close)
+        keys = [message_hash(i) for i in range(300)]
+        for i, key in enumerate(keys):
+            store[key] = f'{{"n": {i}}}'
+        for key in keys[:250]:
+            del store[key]
+        segments = len(store.sealed)
+        self.assertGreater(store.compact(), 0)
+        self.assertLess(len(store.sealed), segments)
+        self.assertEqual(len(store), 50)
+        self.assertEqual(sorted(store), sorted(keys[250:]))
+        self.assertEqual(store[keys[260]], '{"n": 260}')
+
+    def test_reopen_clean_and_after_a_torn_write(self):
+        store = self.open()
+        keys = [message_hash(i) for i in range(200)]
+        for i, key in enumerate(keys):
+            store[key] = f'{{"n": {i}}}'
+        del store[keys[0]]
+        store.close()
+
+        store = self.open()
+        self.assertEqual(len(store), 199)
+        self.assertEqual(store[keys[150]], '{"n": 150}')
+        # Crash: the index is not closed and the last record is cut short
+        store["ab" * 32] = "lost"
+        os.close(store.active_fd)
+        segment = os.path.join(self.path, f"{store.active:08d}.log")
+        os.truncate(segment, os.path.getsize(segment) - 2)
+
+        store = self.open()
+        self.addCleanup(store.close)
+        self.assertEqual(len(store), 199)
+        self.assertNotIn("ab" * 32, store)
+        self.assertNotIn(keys[0], store)
+        self.assertEqual(store[keys[199]], '{"n": 199}')
+        store["ab" * 32] = "kept"
+        self.assertEqual(store["ab" * 32], "kept")
+
+    def test_background_compaction(self):
+        store = self.open(compact_interval=0.01)
+        self.addCleanup(store.close)
+        for i in range(200):
+            store[message_hash(i)] = "x" * 50
+        for i in range(190):
+            del store[message_hash(i)]
+        deadline = time.time() + 2
+        while not store.compactions and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertGreater(store.compactions, 0)
+        self.assertEqual(len(store), 10)
+
+    def test_node_gossips_from_stored_bytes(self):
+        node = ChaincraftNode(store=self.open())
+        self.addCleanup(node.close)
+        stored_hash, _ = node.create_shared_message({"n": 1})
+        node.peers = [("127.0.0.1", 7001)]
+        sent = []
+        node._send_datagram = lambda data, addr: sent.append(data)
+        node.hash_message = None
+        node._gossip_full()
+        self.assertEqual(sent, [node.db.raw(stored_hash)])
+
+    def test_sustained_write_rate(self):
+        count = 5000
+        node = ChaincraftNode(store=self.open(segment_size=1024 * 1024))
+        self.addCleanup(node.close)
+        start = time.perf_counter()
+        for i in range(count):
+            node.create_shared_message({"message_type": "bench", "n": i})
+        elapsed = time.perf_counter() - start
+        print(f"\nLogStore: {count / elapsed:.0f} messages/s")
+        self.assertEqual(len(node.db), count)
+
+
+if __name__ == "__main__":
+    unittest.main()
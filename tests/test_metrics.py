@@ -0,0 +1,130 @@
+# tests/test_metrics.py
+
+import json
+import time
+import unittest
+import urllib.request
+
+from chaincraft import ChaincraftNode
+from chaincraft.metrics import MetricsRegistry, OTHER_LABEL
+
+PEER = ("127.0.0.1", 7001)
+
+
+class TestRegistry(unittest.TestCase):
+    def test_render(self):
+        registry = MetricsRegistry()
+        counter = registry.counter("events_total", "Events")
+        counter.inc()
+        counter.inc(2)
+        registry.gauge("depth", "Depth", lambda: 7)
+        histogram = registry.histogram("latency_seconds", "Latency", buckets=[0.1, 1])
+        histogram.observe(0.05, "chat")
+        histogram.observe(0.5, "chat")
+        histogram.observe(5, "chat")
+
+        lines = registry.render().splitlines()
+        self.assertIn("# TYPE chaincraft_events_total counter", lines)
+        self.assertIn("chaincraft_events_total 3", lines)
+        self.assertIn("chaincraft_depth 7", lines)
+        self.assertIn(
+            'chaincraft_latency_seconds_bucket{message_type="chat",le="0.1"} 1', lines
+        )
+        self.assertIn(
+            'chaincraft_latency_seconds_bucket{message_type="chat",le="1"} 2', lines
+        )
+        self.assertIn(
+            'chaincraft_latency_seconds_bucket{message_type="chat",le="+Inf"} 3', lines
+        )
+        self.assertIn('chaincraft_latency_seconds_sum{message_type="chat"} 5.55', lines)
+        self.assertIn('chaincraft_latency_seconds_count{message_type="chat"} 3', lines)
+
+    def test_names_are_unique(self):
+        registry = MetricsRegistry()
+        registry.counter("events_total", "Events")
+        with self.assertRaises(ValueError):
+            registry.gauge("events_total", "Events")
+
+    def test_label_values_are_bounded(self):
+        histogram = MetricsRegistry().histogram("latency", "Latency", max_labels=2)
+        for label in ("a", "b", "c", "d"):
+            histogram.observe(0.001, label)
+        self.assertEqual(set(histogram.series), {"a", "b", OTHER_LABEL})
+        self.assertEqual(histogram.count(OTHER_LABEL), 2)
+
+
+class TestNodeMetrics(unittest.TestCase):
+    def test_disabled_by_default(self):
+        node = ChaincraftNode(persistent=False)
+        self.assertIsNone(node.metrics)
+        self.assertFalse(hasattr(node, "decode_latency"))
+
+    def test_receive_path(self):
+        node = ChaincraftNode(persistent=False, metrics=MetricsRegistry())
+        data = node.compress_message(json.dumps({"message_type": "chat", "n": 1}))
+        node._receive_view(memoryview(data), PEER)
+        node._receive_view(memoryview(data), PEER)
+        node._process_datagram(node.compress_message("not json"), PEER)
+        node.create_shared_message({"message_type": "vote"})
+
+        self.assertEqual(node.decode_latency.count("chat"), 1)
+        self.assertEqual(node.store_latency.count("chat"), 1)
+        self.assertEqual(node.broadcast_latency.count("chat"), 1)
+        self.assertEqual(node.store_latency.count("vote"), 1)
+
+        lines = node.metrics.render().splitlines()
+        self.assertIn("chaincraft_datagrams_received_total 2", lines)
+        self.assertIn(f"chaincraft_bytes_received_total {2 * len(data)}", lines)
+        self.assertIn("chaincraft_duplicates_total 1", lines)
+        self.assertIn("chaincraft_invalid_messages_total 1", lines)
+        self.assertIn("chaincraft_stored_messages 2", lines)
+
+    def test_http_endpoint(self):
+        node = ChaincraftNode(
+            persistent=False, metrics=MetricsRegistry(), metrics_port=0
+        )
+        node.start()
+        try:
+            node.ban_peer(PEER)
+            url = f"http://127.0.0.1:{node.metrics.server.port}/metrics"
+            with urllib.request.urlopen(url, timeout=5) as response:
+                self.assertTrue(
+                    response.headers["Content-Type"].startswith("text/plain")
+                )
+                body = response.read().decode()
+            self.assertIn("chaincraft_bans_total 1\n", body)
+            self.assertIn("chaincraft_banned_peers 1\n", body)
+        finally:
+            node.close()
+        self.assertIsNone(node.metrics.server)
+
+
+class TestMetricsBenchmark(unittest.TestCase):
+    EVENTS = 100000
+
+    def per_event(self, function):
+        best = float("inf")
+        for _ in range(5):
+            start = time.perf_counter()
+            for _ in range(self.EVENTS):
+                function()
+            best = min(best, (time.perf_counter() - start) / self.EVENTS)
+        return best
+
+    def test_benchmark_event_cost(self):
+        registry = MetricsRegistry()
+        counter = registry.counter("events_total", "Events")
+        histogram = registry.histogram("latency_seconds", "Latency")
+        baseline = self.per_event(lambda: None)
+        increment = self.per_event(counter.inc) - baseline
+        observe = self.per_event(lambda: histogram.observe(0.0003, "chat")) - baseline
+        print(
+            f"\ncounter increment: {increment * 1e9:.0f} ns, "
+            f"histogram observation: {observe * 1e9:.0f} ns"
+        )
+        self.assertLess(increment, 1e-6)
+        self.assertLess(observe, 1e-6)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,165 @@
+# tests/test_multiprocess.py
+
+import json
+import multiprocessing
+import queue
+import socket
+import threading
+import time
+import unittest
+
+from chaincraft import ChaincraftNode
+from chaincraft.gossip import wrap_ttl
+from chaincraft.multiprocess import DECODED, RAW, _decode, _run_worker
+from chaincraft.transport import UDPTransport
+
+PEER = ("127.0.0.1", 7001)
+
+
+@unittest.skipUnless(hasattr(socket, "SO_REUSEPORT"), "requires SO_REUSEPORT")
+class TestReusePortTransport(unittest.TestCase):
+    def test_bind_refuses_taken_port(self):
+        first = UDPTransport(reuse_port=True)
+        first.bind("127.0.0.1", 0)
+        port = first.socket.getsockname()[1]
+        other = UDPTransport(reuse_port=True)
+        joined = UDPTransport()
+        try:
+            with self.assertRaises(OSError):
+                other.bind("127.0.0.1", port)
+            joined.join("127.0.0.1", port)
+            self.assertEqual(joined.socket.getsockname()[1], port)
+        finally:
+            for transport in (first, other, joined):
+                transport.close()
+
+    def test_node_requires_reuse_port_transport(self):
+        with self.assertRaises(ValueError):
+            ChaincraftNode(receive_processes=2, transport=UDPTransport())
+
+
+class TestWorkerDecode(unittest.TestCase):
+    def setUp(self):
+        self.node = ChaincraftNode(persistent=False)
+        self.node.accepted_message_types = [str]
+        self.seen = set()
+
+    def test_decoded_with_ttl(self):
+        data = self.node.compress_message(json.dumps("hello"))
+        kind, decoded, ttl, addr = _decode(
+            self.node, wrap_ttl(data, 3), PEER, self.seen.__contains__
+        )
+        self.assertEqual((kind, ttl, addr), (DECODED, 3, PEER))
+        self.assertEqual(decoded[0].data, "hello")
+        self.assertTrue(decoded[1])
+        self.assertEqual(decoded[3], self.node.hash_message(data))
+
+        self.seen.add(decoded[3])
+        self.assertIsNone(_decode(self.node, data, PEER, self.seen.__contains__))
+
+    def test_stateful_frames_forwarded_raw(self):
+        frame = b"\xccFfragment"
+        self.assertEqual(
+            _decode(self.node, frame, PEER, self.seen.__contains__),
+            (RAW, frame, PEER),
+        )
+
+
+class FullOnceQueue:
+    def __init__(self):
+        self.items = []
+        self.full = True
+
+    def put_nowait(self, item):
+        if self.full:
+            self.full = False
+            raise queue.Full
+        self.items.append(item)
+
+    def cancel_join_thread(self):
+        pass
+
+
+@unittest.skipUnless(hasattr(socket, "SO_REUSEPORT"), "requires SO_REUSEPORT")
+class TestWorkerLoop(unittest.TestCase):
+    def test_message_dropped_on_full_queue_is_accepted_again(self):
+        owner = UDPTransport(reuse_port=True)
+        owner.bind("127.0.0.1", 0)
+        node = ChaincraftNode(persistent=False)
+        node.accepted_message_types = [str]
+        node.host, node.port = owner.socket.getsockname()
+        # Once the owner is closed the worker's socket gets every datagram
+        owner.close()
+
+        results = FullOnceQueue()
+        dropped = multiprocessing.Value("i", 0)
+        stop_event = threading.Event()
+        worker = threading.Thread(
+            target=_run_worker, args=(node, results, stop_event, dropped)
+        )
+        worker.start()
+        sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            data = node.compress_message(json.dumps("retransmitted"))
+            deadline = time.time() + 5
+            while not results.items and time.time() < deadline:
+                sender.sendto(data, (node.host, node.port))
+                time.sleep(0.05)
+        finally:
+            stop_event.set()
+            worker.join()
+            sender.close()
+            node.close()
+        self.assertEqual(dropped.value, 1)
+        self.assertEqual(results.items[0][1][3], node.hash_message(data))
+
+
+@unittest.skipUnless(hasattr(socket, "SO_REUSEPORT"), "requires SO_REUSEPORT")
+class TestShardedNode(unittest.TestCase):
+    NUM_SENDERS = 12
+
+    def setUp(self):
+        self.node = ChaincraftNode(persistent=False, receive_processes=2)
+        self.node.accepted_message_types = [str]
+        self.node.start()
+        self.senders = [
+            socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            for _ in range(self.NUM_SENDERS)
+        ]
+
+    def tearDown(self):
+        self.node.close()
+        for sender in self.senders:
+            sender.close()
+
+    def wait_for_store(self, expected_count, timeout=10):
+        start_time = time.time()
+        while time.time() - start_time < timeout:
+            if len(self.node.db) == expected_count:
+                return True
+            time.sleep(0.05)
+        return False
+
+    def test_messages_from_all_shards_are_stored_once(self):
+        receiver = self.node.sharded_receiver
+        self.assertEqual(receiver.stats()["alive"], 2)
+        address = (self.node.host, self.node.port)
+        # Sources are spread over the node's socket and the two workers
+        for i, sender in enumerate(self.senders):
+            sender.sendto(self.node.compress_message(json.dumps(f"msg {i}")), address)
+            # Every message also arrives from a second source
+            self.senders[i - 1].sendto(
+                self.node.compress_message(json.dumps(f"msg {i}")), address
+            )
+
+        self.assertTrue(self.wait_for_store(self.NUM_SENDERS))
+        time.sleep(0.2)
+        self.assertEqual(len(self.node.db), self.NUM_SENDERS)
+        self.assertGreater(receiver.stats()["committed"], 0)
+
+        self.node.close()
+        self.assertEqual(receiver.stats()["alive"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+# tests/test_packet_filter.py
+
+import json
+import os
+import time
+import unittest
+import zlib
+
+from chaincraft import ChaincraftNode
+from chaincraft.packet_filter import PacketFilter
+
+PEER = ("127.0.0.1", 7001)
+OTHER = ("127.0.0.1", 7002)
+
+
+class TestPacketFilter(unittest.TestCase):
+    def test_token_bucket(self):
+        packet_filter = PacketFilter(rate=10, burst=5)
+        self.assertEqual(sum(packet_filter.allow(PEER, 0.0) for _ in range(8)), 5)
+        # Each source has its own bucket
+        self.assertTrue(packet_filter.allow(OTHER, 0.0))
+        # 0.3s refills three tokens
+        self.assertEqual(sum(packet_filter.allow(PEER, 0.3) for _ in range(8)), 3)
+        stats = packet_filter.stats()
+        self.assertEqual(stats["passed"], 9)
+        self.assertEqual(stats["dropped_rate_limited"], 8)
+
+    def test_slow_rate_still_admits_datagrams(self):
+        packet_filter = PacketFilter(rate=0.2)
+        self.assertTrue(packet_filter.allow(PEER, 0.0))
+        self.assertFalse(packet_filter.allow(PEER, 1.0))
+        self.assertTrue(packet_filter.allow(PEER, 5.0))
+        with self.assertRaises(ValueError):
+            PacketFilter(rate=1, burst=0.5)
+
+    def test_sources_are_bounded(self):
+        packet_filter = PacketFilter(rate=1, burst=1, max_sources=2)
+        for port in range(10):
+            packet_filter.allow(("127.0.0.1", port), 0.0)
+        self.assertEqual(packet_filter.stats()["tracked_sources"], 2)
+
+    def test_ban_expires(self):
+        packet_filter = PacketFilter()
+        packet_filter.ban(("127.0.0.1", "7001"), until=10.0)
+        self.assertFalse(packet_filter.allow(PEER, 5.0))
+        self.assertTrue(packet_filter.allow(PEER, 10.0))
+        self.assertEqual(packet_filter.stats()["dropped_banned"], 1)
+        self.assertEqual(packet_filter.stats()["bans"], 0)
+
+
+class TestNodeFilter(unittest.TestCase):
+    def test_banned_peer_dropped_before_hashing(self):
+        node = ChaincraftNode(persistent=False)
+        hashed = []
+        hash_message = node.hash_message
+        node.hash_message = lambda data: hashed.append(data) or hash_message(data)
+        node.ban_peer(PEER)
+
+        data = node.compress_message(json.dumps("hello"))
+        node._receive_view(memoryview(data), PEER)
+        self.assertEqual(hashed, [])
+        self.assertEqual(len(node.db), 0)
+        self.assertEqual(node.packet_filter.stats()["dropped_banned"], 1)
+
+        node._receive_view(memoryview(data), OTHER)
+        self.assertEqual(len(node.db), 1)
+
+    def test_rate_limited_source(self):
+        node = ChaincraftNode(
+            persistent=False, packet_filter=PacketFilter(rate=1, burst=3)
+        )
+        for i in range(10):
+            data = node.compress_message(json.dumps(f"msg {i}"))
+            node._receive_view(memoryview(data), PEER)
+        self.assertEqual(len(node.db), 3)
+        self.assertEqual(node.packet_filter.stats()["dropped_rate_limited"], 7)
+
+    def test_decompression_bomb(self):
+        node = ChaincraftNode(
+            persistent=False,
+            use_compression=True,
+            packet_filter=PacketFilter(max_decompressed_size=1 << 20),
+        )
+        bomb = zlib.compress(json.dumps("a" * (16 << 20)).encode(), 9)
+        self.assertLess(len(bomb), node.RECV_BUFFER_SIZE)
+        node._receive_view(memoryview(bomb), PEER)
+        self.assertEqual(len(node.db), 0)
+        self.assertEqual(node.packet_filter.stats()["dropped_oversized"], 1)
+        self.assertEqual(node.invalid_message_counts[PEER], 1)
+
+        # Messages under the limit still decompress
+        node._receive_view(memoryview(node.compress_message(json.dumps("ok"))), PEER)
+        self.assertEqual(len(node.db), 1)
+
+    def test_persisted_bans_are_loaded(self):
+        node = ChaincraftNode(persistent=True, reset_db=True)
+        node.ban_peer(PEER)
+        node.close()
+        node = ChaincraftNode(persistent=True, port=node.port)
+        try:
+            self.assertIn(PEER, node.banned_peers)
+            self.assertFalse(node.packet_filter.allow(PEER, time.time()))
+        finally:
+            node.close()
+            for suffix in (".db", ".db.dat", ".db.dir", ".db.bak"):
+                if os.path.exists(f"node_{node.port}{suffix}"):
+                    os.remove(f"node_{node.port}{suffix}")
+
+
+class TestFilterBenchmark(unittest.TestCase):
+    NUM_DATAGRAMS = 20000
+
+    def receive_rate(self, node, datagrams, addr):
+        start = time.perf_counter()
+        for data in datagrams:
+            node._receive_view(memoryview(data), addr)
+        return len(datagrams) / (time.perf_counter() - start)
+
+    def test_benchmark_banned_flood(self):
+        node = ChaincraftNode(persistent=False, use_compression=True)
+        datagrams = [
+            node.compress_message(json.dumps({"flood": i}))
+            for i in range(self.NUM_DATAGRAMS)
+        ]
+        node.ban_peer(PEER)
+        banned = self.receive_rate(node, datagrams, PEER)
+        processed = self.receive_rate(node, datagrams, OTHER)
+        print(
+            f"\nbanned source: {banned:,.0f} datagrams/s, "
+            f"processed: {processed:,.0f} datagrams/s"
+        )
+        self.assertGreater(banned, processed)
+
+
+if __name__ == "__main__":
+    unittest.main()
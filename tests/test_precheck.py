@@ -0,0 +1,180 @@
+# tests/test_precheck.py
+
+import json
+import os
+import time
+import unittest
+from typing import List
+
+from chaincraft import ChaincraftNode, SharedMessage, SharedObject
+from chaincraft.shared_object import run_stateless_checks
+from examples.blockchain import BlockchainUtils, Mempool, Transaction
+
+PEER = ("127.0.0.1", 7001)
+
+
+def is_even(data):
+    return isinstance(data, int) and data % 2 == 0
+
+
+class EvenObject(SharedObject):
+    """Accepts even numbers; records which validation entry point was used."""
+
+    def __init__(self):
+        self.full_checks = 0
+        self.stateful_checks = 0
+        self.messages = []
+
+    def is_valid(self, message: SharedMessage) -> bool:
+        self.full_checks += 1
+        return is_even(message.data)
+
+    def stateless_check(self):
+        return is_even
+
+    def is_valid_stateful(self, message: SharedMessage) -> bool:
+        self.stateful_checks += 1
+        return True
+
+    def add_message(self, message: SharedMessage) -> None:
+        self.messages.append(message.data)
+
+    def is_merkelized(self) -> bool:
+        return False
+
+    def get_latest_digest(self) -> str:
+        return ""
+
+    def has_digest(self, hash_digest: str) -> bool:
+        return False
+
+    def is_valid_digest(self, hash_digest: str) -> bool:
+        return False
+
+    def add_digest(self, hash_digest: str) -> bool:
+        return False
+
+    def gossip_object(self, digest) -> List[SharedMessage]:
+        return []
+
+    def get_messages_since_digest(self, digest: str) -> List[SharedMessage]:
+        return []
+
+
+def wait_for_store(node, expected_count, timeout=30):
+    start_time = time.time()
+    while time.time() - start_time < timeout:
+        if len(node.db) >= expected_count:
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class TestStatelessChecks(unittest.TestCase):
+    def test_raising_check_fails(self):
+        self.assertTrue(run_stateless_checks([is_even], 2))
+        self.assertFalse(run_stateless_checks([is_even], 3))
+        self.assertFalse(run_stateless_checks([lambda data: 1 / 0], 2))
+
+    def test_inline_without_pool(self):
+        # Unstarted, as in a receive worker process: checks run inline
+        obj = EvenObject()
+        node = ChaincraftNode(
+            persistent=False, shared_objects=[obj], precheck_processes=2
+        )
+        node._process_datagram(node.compress_message(json.dumps(4)), PEER)
+        node._process_datagram(node.compress_message(json.dumps(5)), PEER)
+        self.assertEqual(obj.messages, [4])
+        self.assertEqual((obj.full_checks, obj.stateful_checks), (0, 1))
+        self.assertEqual(node.invalid_message_counts[PEER], 1)
+
+    def test_inline_without_receive_pipeline(self):
+        obj = EvenObject()
+        node = ChaincraftNode(
+            persistent=False, shared_objects=[obj], precheck_processes=2
+        )
+        node.start()
+        try:
+            self.assertIsNone(node.precheck_pool)
+            node._process_datagram(node.compress_message(json.dumps(4)), PEER)
+            self.assertEqual(obj.messages, [4])
+            self.assertEqual((obj.full_checks, obj.stateful_checks), (0, 1))
+        finally:
+            node.close()
+
+
+class TestPrecheckPool(unittest.TestCase):
+    def setUp(self):
+        self.obj = EvenObject()
+        self.node = ChaincraftNode(
+            persistent=False,
+            shared_objects=[self.obj],
+            precheck_processes=2,
+            validation_workers=2,
+        )
+        self.node.start()
+
+    def tearDown(self):
+        self.node.close()
+
+    def test_only_stateful_part_on_commit(self):
+        for value in range(10):
+            self.node._process_datagram(
+                self.node.compress_message(json.dumps(value)), PEER
+            )
+        self.assertTrue(wait_for_store(self.node, 5))
+        time.sleep(0.2)
+        self.assertEqual(sorted(self.obj.messages), [0, 2, 4, 6, 8])
+        self.assertEqual(self.obj.full_checks, 0)
+        self.assertEqual(self.obj.stateful_checks, 5)
+
+
+class TestSignedIngestionBenchmark(unittest.TestCase):
+    NUM_TRANSACTIONS = 200
+
+    @classmethod
+    def setUpClass(cls):
+        private_key, public_key = BlockchainUtils.generate_keypair()
+        sender = BlockchainUtils.get_address_from_public_key(public_key)
+        cls.messages = [
+            json.dumps(
+                {
+                    "type": "transaction",
+                    "payload": Transaction.create(
+                        sender, f"0x{i:040x}", 1.0, 0.01, private_key, public_key
+                    ).to_dict(),
+                }
+            )
+            for i in range(cls.NUM_TRANSACTIONS)
+        ]
+
+    def ingest(self, **kwargs):
+        node = ChaincraftNode(persistent=False, shared_objects=[Mempool()], **kwargs)
+        node.start()
+        try:
+            datagrams = [node.compress_message(m) for m in self.messages]
+            if node.precheck_pool is not None:
+                # Spawn the pool processes outside the measurement
+                node.precheck_pool.submit(run_stateless_checks, [], None).result()
+            start = time.perf_counter()
+            for datagram in datagrams:
+                node._process_datagram(datagram, PEER)
+            self.assertTrue(wait_for_store(node, self.NUM_TRANSACTIONS))
+            return self.NUM_TRANSACTIONS / (time.perf_counter() - start)
+        finally:
+            node.close()
+
+    def test_benchmark_signed_ingestion(self):
+        cores = os.cpu_count() or 1
+        print()
+        inline = self.ingest()
+        print(f"inline is_valid: {inline:,.0f} tx/s")
+        for processes in sorted({2, cores}):
+            rate = self.ingest(
+                precheck_processes=processes, validation_workers=2 * processes
+            )
+            print(f"precheck_processes={processes}: {rate:,.0f} tx/s ({cores} cores)")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+# tests/test_receive_pipeline.py
+
+import random
+import threading
+import time
+import unittest
+from typing import List
+
+from chaincraft import ChaincraftNode, SharedMessage, SharedObject
+from chaincraft.pipeline import ReceivePipeline
+
+
+class RecordingNode:
+    """Minimal node stand-in whose decode stage takes a random amount of time."""
+
+    def __init__(self):
+        self.committed = []
+        self.lock = threading.Lock()
+
+    def _decode_datagram(self, data):
+        time.sleep(random.uniform(0, 0.01))
+        if data == b"seen":
+            return None
+        return SharedMessage(data.decode()), True, data.decode(), data.decode()
+
+    def _commit_message(self, shared_message, accepted, message, message_hash, addr):
+        with self.lock:
+            self.committed.append(message)
+
+
+class SlowSharedObject(SharedObject):
+    """Accepts everything, but validation is as slow as a signature check."""
+
+    def __init__(self):
+        self.messages = []
+
+    def is_valid(self, message: SharedMessage) -> bool:
+        time.sleep(0.02)
+        return True
+
+    def add_message(self, message: SharedMessage) -> None:
+        self.messages.append(message.data)
+
+    def is_merkelized(self) -> bool:
+        return False
+
+    def get_latest_digest(self) -> str:
+        return ""
+
+    def has_digest(self, hash_digest: str) -> bool:
+        return False
+
+    def is_valid_digest(self, hash_digest: str) -> bool:
+        return False
+
+    def add_digest(self, hash_digest: str) -> bool:
+        return False
+
+    def gossip_object(self, digest) -> List[SharedMessage]:
+        return []
+
+    def get_messages_since_digest(self, digest: str) -> List[SharedMessage]:
+        return []
+
+
+class TestReceivePipeline(unittest.TestCase):
+    def test_commits_in_receive_order(self):
+        node = RecordingNode()
+        pipeline = ReceivePipeline(node, workers=4, queue_size=100)
+        pipeline.start()
+        try:
+            expected = [f"message {i}" for i in range(50)]
+            for message in expected:
+                self.assertTrue(pipeline.submit(message.encode(), ("127.0.0.1", 1)))
+            pipeline.submit(b"seen", ("127.0.0.1", 1))
+
+            deadline = time.time() + 5
+            while pipeline.stats()["committed"] < 50 and time.time() < deadline:
+                time.sleep(0.05)
+            time.sleep(0.1)
+
+            self.assertEqual(node.committed, expected)
+            self.assertEqual(pipeline.stats()["duplicates"], 1)
+        finally:
+            pipeline.stop()
+
+    def test_full_queue_drops_and_counts(self):
+        pipeline = ReceivePipeline(RecordingNode(), workers=1, queue_size=3)
+        # Not started, so nothing drains the queue
+        results = [pipeline.submit(b"x", ("127.0.0.1", 1)) for _ in range(5)]
+
+        self.assertEqual(results, [True, True, True, False, False])
+        stats = pipeline.stats()
+        self.assertEqual(stats["queue_depth"], 3)
+        self.assertEqual(stats["received"], 5)
+        self.assertEqual(stats["dropped"], 2)
+
+    def test_node_with_slow_validation(self):
+        receiver = ChaincraftNode(persistent=False, validation_workers=2)
+        sender = ChaincraftNode(persistent=False)
+        shared_object = SlowSharedObject()
+        receiver.add_shared_object(shared_object)
+        receiver.start()
+        sender.start()
+        try:
+            sender.connect_to_peer(receiver.host, receiver.port)
+            for i in range(20):
+                sender.create_shared_message(f"message {i}")
+
+            deadline = time.time() + 10
+            while len(receiver.db) < 20 and time.time() < deadline:
+                time.sleep(0.1)
+
+            self.assertEqual(len(receiver.db), 20)
+            self.assertEqual(
+                shared_object.messages, [f"message {i}" for i in range(20)]
+            )
+            self.assertEqual(receiver.receive_pipeline.stats()["dropped"], 0)
+        finally:
+            sender.close()
+            receiver.close()
+
+    def test_garbage_datagram_does_not_stop_listener(self):
+        node = ChaincraftNode(persistent=False, use_compression=True)
+        node.start()
+        try:
+            node._process_datagram(b"not zlib", ("127.0.0.1", 1))
+            self.assertEqual(node.invalid_message_counts[("127.0.0.1", 1)], 1)
+        finally:
+            node.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,274 @@
+# tests/test_retention.py
+
+import os
+import unittest
+from typing import List
+
+from chaincraft import ChaincraftNode, SharedMessage, SharedObject
+from chaincraft.retention import RetentionPolicy, RetentionRule, message_type_of
+from chaincraft.simulator import LinkConfig, Simulator, default_node
+from examples.blockchain import Block, BlockchainUtils, Mempool, Transaction
+
+PEER = ("127.0.0.1", 7001)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class SettledObject(SharedObject):
+    """Accepts everything; messages with "settled" set are finalized."""
+
+    def is_valid(self, message: SharedMessage) -> bool:
+        return True
+
+    def add_message(self, message: SharedMessage) -> None:
+        pass
+
+    def is_finalized(self, message: SharedMessage) -> bool:
+        return isinstance(message.data, dict) and message.data.get("settled", False)
+
+    def is_merkelized(self) -> bool:
+        return False
+
+    def get_latest_digest(self) -> str:
+        return ""
+
+    def has_digest(self, hash_digest: str) -> bool:
+        return False
+
+    def is_valid_digest(self, hash_digest: str) -> bool:
+        return False
+
+    def add_digest(self, hash_digest: str) -> bool:
+        return False
+
+    def gossip_object(self, digest) -> List[SharedMessage]:
+        return []
+
+    def get_messages_since_digest(self, digest: str) -> List[SharedMessage]:
+        return []
+
+
+class TestRetentionPolicy(unittest.TestCase):
+    def test_rule_needs_a_limit(self):
+        with self.assertRaises(ValueError):
+            RetentionRule("chat")
+
+    def test_max_age_and_max_count(self):
+        policy = RetentionPolicy(
+            [RetentionRule("chat", max_age=10), RetentionRule("vote", max_count=2)]
+        )
+        policy.record("a", "chat", 0)
+        policy.record("b", "chat", 5)
+        for i, message_hash in enumerate(["v1", "v2", "v3"]):
+            policy.record(message_hash, "vote", i)
+        # No rule for this type and no default rule: kept forever
+        policy.record("x", "other", 0)
+
+        self.assertEqual(policy.expired(12, lambda h: False), ["a", "v1"])
+        policy.forget(["a", "v1"])
+        self.assertTrue(policy.was_removed("a"))
+        self.assertEqual(policy.stats()["tracked"], 3)
+
+    def test_default_rule_and_finalized(self):
+        policy = RetentionPolicy([RetentionRule(until_finalized=True)])
+        policy.record("a", None, 0)
+        policy.record("b", "anything", 1)
+        self.assertEqual(policy.expired(2, lambda h: h == "b"), ["b"])
+
+    def test_tombstones_are_bounded(self):
+        policy = RetentionPolicy([RetentionRule(max_count=1)], tombstones=2)
+        policy.forget(["a", "b", "c"])
+        self.assertFalse(policy.was_removed("a"))
+        self.assertTrue(policy.was_removed("c"))
+
+    def test_message_type_of(self):
+        self.assertEqual(message_type_of({"message_type": "chat"}), "chat")
+        self.assertIsNone(message_type_of({"message_type": 1}))
+        self.assertIsNone(message_type_of("text"))
+        self.assertEqual(message_type_of({"type": "block"}, "type"), "block")
+
+
+class TestNodeCompaction(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.node = ChaincraftNode(
+            persistent=False,
+            gossip_mode="inventory",
+            clock=self.clock,
+            retention=RetentionPolicy(
+                [
+                    RetentionRule("chat", max_age=10),
+                    RetentionRule(until_finalized=True),
+                ],
+                interval=1.0,
+            ),
+            shared_objects=[SettledObject()],
+        )
+
+    def chat(self, i):
+        return self.node.create_shared_message({"message_type": "chat", "n": i})[0]
+
+    def test_expired_messages_are_removed_everywhere(self):
+        old = [self.chat(i) for i in range(3)]
+        self.node.inventory_cursors[PEER] = 2
+        self.clock.now += 8
+        new = self.chat(3)
+        pending = self.node.create_shared_message({"settled": False})[0]
+
+        self.clock.now += 5
+        self.node.gossip_round()
+
+        self.assertEqual(set(self.node.db), {new, pending})
+        self.assertEqual(self.node.inventory_log, [new, pending])
+        # Both announced hashes were removed from before the cursor
+        self.assertEqual(self.node.inventory_cursors[PEER], 0)
+        self.assertNotIn(old[0], self.node.seen_cache.lru)
+        self.assertEqual(self.node.retention.stats()["removed"], 3)
+
+    def test_finalized_messages_are_removed(self):
+        settled = self.node.create_shared_message({"settled": True})[0]
+        kept = self.node.create_shared_message({"settled": False})[0]
+        self.clock.now += 1
+        self.node.gossip_round()
+        self.assertNotIn(settled, self.node.db)
+        self.assertIn(kept, self.node.db)
+
+    def test_compaction_runs_at_most_once_per_interval(self):
+        message_hash = self.chat(0)
+        self.clock.now += 11
+        self.node.last_compaction = self.clock.now - 0.5
+        self.node.gossip_round()
+        self.assertIn(message_hash, self.node.db)
+
+    def test_removed_message_is_not_stored_again(self):
+        message_hash = self.chat(0)
+        message = self.node.db[message_hash]
+        self.clock.now += 11
+        self.node.gossip_round()
+        self.assertNotIn(message_hash, self.node.db)
+
+        self.node._process_datagram(self.node.compress_message(message), PEER)
+        self.assertNotIn(message_hash, self.node.db)
+        self.assertTrue(self.node.has_seen(message_hash))
+
+
+class TestMempoolCompaction(unittest.TestCase):
+    def setUp(self):
+        private_key, public_key = BlockchainUtils.generate_keypair()
+        self.sender = BlockchainUtils.get_address_from_public_key(public_key)
+        self.transactions = [
+            Transaction.create(
+                self.sender, f"0x{i:040x}", 1.0, 0.01, private_key, public_key
+            )
+            for i in range(2)
+        ]
+
+    def block(self, transactions):
+        return Block.create(
+            1, [tx.to_dict() for tx in transactions], "0" * 64, self.sender, 1
+        )
+
+    def test_only_confirmed_transactions_are_compacted(self):
+        clock = FakeClock()
+        node = ChaincraftNode(
+            persistent=False,
+            clock=clock,
+            retention=RetentionPolicy(
+                [RetentionRule("transaction", until_finalized=True)],
+                interval=1.0,
+                type_field="type",
+            ),
+            shared_objects=[Mempool(difficulty=1)],
+        )
+        confirmed, pending = [
+            node.create_shared_message(
+                {"type": "transaction", "payload": tx.to_dict()}
+            )[0]
+            for tx in self.transactions
+        ]
+        block = node.create_shared_message(
+            {"type": "block", "payload": self.block(self.transactions[:1]).to_dict()}
+        )[0]
+
+        clock.now += 1
+        node.gossip_round()
+        self.assertNotIn(confirmed, node.db)
+        self.assertIn(pending, node.db)
+        self.assertIn(block, node.db)
+
+    def test_confirmed_ids_are_bounded(self):
+        mempool = Mempool(difficulty=1, max_confirmed=1)
+        mempool.add_message(
+            SharedMessage(
+                data={
+                    "type": "block",
+                    "payload": self.block(self.transactions).to_dict(),
+                }
+            )
+        )
+        self.assertEqual(list(mempool.confirmed), [self.transactions[1].tx_id])
+
+
+class TestIndexRemoval(unittest.TestCase):
+    def setUp(self):
+        self.node = ChaincraftNode(
+            reset_db=True,
+            persistent=True,
+            indexed=True,
+            retention=RetentionPolicy([RetentionRule("User", max_count=1)]),
+        )
+        self.node.set_indexed_fields("User", ["username"])
+
+    def tearDown(self):
+        self.node.close()
+        if os.path.exists(f"node_{self.node.port}_index.db"):
+            os.remove(f"node_{self.node.port}_index.db")
+
+    def test_index_rows_removed_with_message(self):
+        for name in ("alice", "bob"):
+            self.node.create_shared_message({"message_type": "User", "username": name})
+        self.node.gossip_round()
+
+        self.assertEqual(self.node.search_messages("User", "username", "alice")[1], 0)
+        self.assertEqual(self.node.search_messages("User", "username", "bob")[1], 1)
+        cursor = self.node.index_helper.sqlite_conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM field_values")
+        self.assertEqual(cursor.fetchone()[0], 1)
+
+
+class TestBoundedStore(unittest.TestCase):
+    def test_store_stays_bounded_under_continuous_messages(self):
+        def factory(index, **kwargs):
+            return default_node(
+                index,
+                retention=RetentionPolicy([RetentionRule(max_age=5)], interval=1),
+                **kwargs,
+            )
+
+        simulator = Simulator(
+            4, degree=2, link=LinkConfig(latency=0.01), seed=3, node_factory=factory
+        )
+        sizes = []
+        bytes_sent = []
+        for second in range(60):
+            before = simulator.network.bytes_sent
+            for i in range(10):
+                simulator.publish({"n": second * 10 + i}, origin=i % 4)
+                simulator.run(0.1)
+            sizes.append(max(len(node.db) for node in simulator.nodes))
+            bytes_sent.append(simulator.network.bytes_sent - before)
+
+        # 10 messages per second, each kept for 5 to 6.5 seconds
+        self.assertLessEqual(max(sizes), 70)
+        # Rebroadcasting the store costs the same after a minute as after 10s
+        self.assertLess(sum(bytes_sent[50:]), 1.2 * sum(bytes_sent[10:20]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+# tests/test_seen_cache.py
+
+import hashlib
+import unittest
+
+from chaincraft import ChaincraftNode
+from chaincraft.seen_cache import BloomFilter, SeenCache
+
+
+def h(i):
+    return hashlib.sha256(str(i).encode()).hexdigest()
+
+
+class CountingStore(dict):
+    """dict store that counts membership lookups."""
+
+    lookups = 0
+
+    def __contains__(self, key):
+        CountingStore.lookups += 1
+        return super().__contains__(key)
+
+
+class TestBloomFilter(unittest.TestCase):
+    def test_no_false_negatives_and_bounded_false_positives(self):
+        bloom = BloomFilter(capacity=10000, false_positive_rate=0.01)
+        for i in range(10000):
+            bloom.add(h(i))
+        self.assertTrue(all(h(i) in bloom for i in range(10000)))
+
+        false_positives = sum(h(i) in bloom for i in range(10000, 30000))
+        self.assertLess(false_positives / 20000, 0.02)
+
+
+class TestSeenCache(unittest.TestCase):
+    def test_recent_hashes_answered_from_memory(self):
+        cache = SeenCache(capacity=1000, lru_size=100)
+        calls = []
+
+        def fallback(message_hash):
+            calls.append(message_hash)
+            return False
+
+        cache.add(h(1))
+        self.assertTrue(cache.seen(h(1), fallback))
+        self.assertFalse(cache.seen(h(2), fallback))
+        self.assertEqual(calls, [])
+
+        stats = cache.stats()
+        self.assertEqual(stats["lru_hits"], 1)
+        self.assertEqual(stats["bloom_misses"], 1)
+
+    def test_unverified_bloom_maybe_counts_as_seen(self):
+        cache = SeenCache(capacity=1000, lru_size=10, verify_positives=False)
+        for i in range(100):
+            cache.add(h(i))
+
+        def fallback(message_hash):
+            raise AssertionError("store read")
+
+        # h(0) fell out of the LRU but is still in the filter
+        self.assertTrue(cache.seen(h(0), fallback))
+        self.assertEqual(cache.stats()["bloom_hits"], 1)
+
+    def test_bloom_maybe_falls_back_to_store(self):
+        cache = SeenCache(capacity=1000, lru_size=10)
+        for i in range(100):
+            cache.add(h(i))
+
+        # h(0) fell out of the LRU but is still in the filter
+        store = {h(0)}
+        self.assertTrue(cache.seen(h(0), store.__contains__))
+        self.assertEqual(cache.stats()["fallback_lookups"], 1)
+        # Promoted back into the LRU
+        self.assertTrue(cache.check(h(0)))
+
+    def test_rotation_bounds_memory_and_keeps_answers_correct(self):
+        cache = SeenCache(capacity=100, lru_size=10)
+        store = set()
+        for i in range(1000):
+            store.add(h(i))
+            cache.add(h(i))
+
+        self.assertFalse(cache.complete)
+        self.assertLessEqual(cache.stats()["bloom_bytes"], cache.max_memory_bytes())
+        # Forgotten hashes are resolved by the store, never reported as unseen
+        self.assertIsNone(cache.check(h(0)))
+        self.assertTrue(cache.seen(h(0), store.__contains__))
+        self.assertFalse(cache.seen(h(5000), store.__contains__))
+
+
+class TestNodeDeduplication(unittest.TestCase):
+    def test_duplicate_datagrams_do_not_touch_store(self):
+        node = ChaincraftNode(persistent=False)
+        node.db = CountingStore()
+        node.start()
+        try:
+            data = node.compress_message('"hello"')
+            node._process_datagram(data, ("127.0.0.1", 1))
+            self.assertEqual(len(node.db), 1)
+
+            CountingStore.lookups = 0
+            for _ in range(100):
+                node._process_datagram(data, ("127.0.0.1", 1))
+            self.assertEqual(CountingStore.lookups, 0)
+            self.assertEqual(len(node.db), 1)
+        finally:
+            node.close()
+
+    def test_false_positive_does_not_drop_a_new_message(self):
+        node = ChaincraftNode(persistent=False)
+        # Every hash is now a Bloom "maybe"
+        bits = node.seen_cache.current.bits
+        bits[:] = b"\xff" * len(bits)
+        node.start()
+        try:
+            message_hash = node.hash_message(b'"new"')
+            node._process_datagram(node.compress_message('"new"'), ("127.0.0.1", 1))
+            self.assertIn(message_hash, node.db)
+            self.assertGreater(node.seen_cache.stats()["false_positives"], 0)
+        finally:
+            node.close()
+
+    def test_unverified_repeat_gossip_beyond_the_lru_does_not_touch_store(self):
+        node = ChaincraftNode(
+            persistent=False,
+            seen_cache=SeenCache(lru_size=1, verify_positives=False),
+        )
+        node.db = CountingStore()
+        node.start()
+        try:
+            messages = [node.compress_message(f'"gossip {i}"') for i in range(50)]
+            for data in messages:
+                node._process_datagram(data, ("127.0.0.1", 1))
+            self.assertEqual(len(node.db), 50)
+
+            CountingStore.lookups = 0
+            for _ in range(3):
+                for data in messages:
+                    node._process_datagram(data, ("127.0.0.1", 1))
+            self.assertEqual(CountingStore.lookups, 0)
+            self.assertEqual(node.seen_cache.stats()["bloom_hits"], 147)
+        finally:
+            node.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
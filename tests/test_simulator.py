@@ -0,0 +1,116 @@
+# tests/test_simulator.py
+
+import unittest
+
+from chaincraft.gossip import FanoutStrategy, PushPullStrategy
+from chaincraft.simulator import (
+    LinkConfig,
+    MemoryNetwork,
+    MemoryTransport,
+    Simulator,
+    default_node,
+    percentile,
+)
+
+A = ("127.0.0.1", 10000)
+B = ("127.0.0.1", 10001)
+
+
+class TestMemoryNetwork(unittest.TestCase):
+    def setUp(self):
+        self.network = MemoryNetwork(LinkConfig(latency=0.05, bandwidth=10000))
+        self.sender = MemoryTransport(self.network)
+        self.sender.bind(*A)
+        self.receiver = MemoryTransport(self.network)
+        self.receiver.bind(*B)
+        self.received = []
+        self.receiver.handler = lambda data, addr: self.received.append(
+            (self.network.now, data, addr)
+        )
+
+    def test_latency_and_bandwidth(self):
+        self.sender.sendto(b"x" * 1000, B)
+        self.sender.sendto(b"y" * 1000, B)
+        self.network.run(until=1.0)
+        # 0.1s to transmit each datagram, queued, plus 0.05s latency
+        self.assertEqual(len(self.received), 2)
+        self.assertAlmostEqual(self.received[0][0], 0.15)
+        self.assertAlmostEqual(self.received[1][0], 0.25)
+        self.assertEqual(self.received[0][2], A)
+        self.assertEqual(self.network.now, 1.0)
+
+    def test_loss(self):
+        self.network.set_link(A, B, LinkConfig(loss=1.0))
+        self.sender.sendto(b"lost", B)
+        self.network.run(until=1.0)
+        self.assertEqual(self.received, [])
+        self.assertEqual(self.network.datagrams_lost, 1)
+
+    def test_inbox_without_handler(self):
+        self.receiver.handler = None
+        self.sender.sendto(b"queued", B)
+        self.network.run(until=1.0)
+        self.assertEqual(self.receiver.recvfrom(65535), (b"queued", A))
+        self.receiver.close()
+        with self.assertRaises(OSError):
+            self.receiver.recvfrom(65535)
+
+    def test_address_in_use(self):
+        with self.assertRaises(OSError):
+            MemoryTransport(self.network).bind(*A)
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile(values, 100), 100)
+
+
+class TestSimulator(unittest.TestCase):
+    def simulate(self, seed):
+        simulator = Simulator(
+            50, link=LinkConfig(latency=0.02, jitter=0.01, loss=0.05), seed=seed
+        )
+        message_hash = simulator.publish("hello")
+        simulator.run(3.0)
+        return simulator.report(message_hash)
+
+    def test_flood_reaches_everyone_reproducibly(self):
+        report = self.simulate(seed=7)
+        self.assertEqual(report["coverage"], 1.0)
+        self.assertGreater(report["p50"], 0)
+        self.assertEqual(report, self.simulate(seed=7))
+
+    def test_benchmark_large_network(self):
+        strategies = {
+            "flood": default_node,
+            "fanout": lambda i, **kwargs: default_node(
+                i, gossip_strategy=FanoutStrategy(seed=i), **kwargs
+            ),
+            "push-pull": lambda i, **kwargs: default_node(
+                i, gossip_strategy=PushPullStrategy(seed=i), **kwargs
+            ),
+        }
+        print()
+        for name, factory in strategies.items():
+            simulator = Simulator(
+                1000,
+                link=LinkConfig(latency=0.02, jitter=0.01, loss=0.01),
+                seed=1,
+                node_factory=factory,
+            )
+            message_hash = simulator.publish({"benchmark": name})
+            simulator.run(5.0)
+            report = simulator.report(message_hash)
+            print(
+                f"1000 nodes {name:>9}: coverage={report['coverage']:.3f} "
+                f"p50={report['p50'] * 1000:.0f}ms p90={report['p90'] * 1000:.0f}ms "
+                f"p99={report['p99'] * 1000:.0f}ms bytes={report['bytes']} "
+                f"datagrams={report['datagrams']}"
+            )
+            if name != "fanout":
+                self.assertEqual(report["coverage"], 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+# tests/test_store.py
+
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+
+from chaincraft import ChaincraftNode
+from chaincraft.store import DbmStore, DictStore, MessageStore, SQLiteStore
+
+
+def committed(path):
+    """Keys another connection sees, i.e. the committed ones."""
+    conn = sqlite3.connect(path)
+    try:
+        return [row[0] for row in conn.execute("SELECT key FROM messages")]
+    finally:
+        conn.close()
+
+
+class TestStores(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "messages.db")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_default_stores(self):
+        node = ChaincraftNode(persistent=False)
+        self.assertIsInstance(node.db, dict)
+        self.assertIsInstance(node.db, MessageStore)
+        self.assertFalse(DictStore.persistent)
+
+    def test_sqlite_mapping(self):
+        store = SQLiteStore(self.path)
+        self.addCleanup(store.close)
+        store["b"] = "2"
+        store[b"a"] = b"1"
+        self.assertEqual(store["a"], "1")
+        self.assertIn(b"b", store)
+        self.assertNotIn("c", store)
+        self.assertEqual(list(store), ["b", "a"])
+        self.assertEqual(len(store), 2)
+        del store["b"]
+        with self.assertRaises(KeyError):
+            del store["b"]
+        with self.assertRaises(KeyError):
+            store["b"]
+        store.clear()
+        self.assertEqual(len(store), 0)
+
+    def test_dbm_mapping(self):
+        store = DbmStore(self.path)
+        self.addCleanup(store.close)
+        store["a"] = "1"
+        store.sync()
+        self.assertEqual(store["a"], "1")
+        self.assertEqual(list(store), ["a"])
+
+    def test_group_commit(self):
+        store = SQLiteStore(self.path, max_batch=3, max_delay=60)
+        self.addCleanup(store.close)
+        store["a"] = "1"
+        store["b"] = "2"
+        store.sync()
+        self.assertEqual(committed(self.path), [])
+        store["c"] = "3"
+        self.assertEqual(sorted(committed(self.path)), ["a", "b", "c"])
+        store["d"] = "4"
+        store.flush()
+        self.assertEqual(len(committed(self.path)), 4)
+        self.assertEqual(store.commits, 2)
+
+    def test_idle_batches_are_committed(self):
+        store = SQLiteStore(self.path, max_batch=1000, max_delay=0.02)
+        self.addCleanup(store.close)
+        store["a"] = "1"
+        deadline = time.time() + 2
+        while not committed(self.path) and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(committed(self.path), ["a"])
+
+    def test_full_durability_commits_every_write(self):
+        store = SQLiteStore(self.path, durability="full")
+        self.addCleanup(store.close)
+        store["a"] = "1"
+        self.assertEqual(committed(self.path), ["a"])
+        store["b"] = "2"
+        self.assertEqual(store.commits, 2)
+        with self.assertRaises(ValueError):
+            SQLiteStore(self.path, durability="sometimes")
+
+    def test_node_restarts_from_sqlite_store(self):
+        node = ChaincraftNode(store=SQLiteStore(self.path))
+        self.assertTrue(node.persistent)
+        message_hash, _ = node.create_shared_message({"n": 1})
+        node.peers = [("127.0.0.1", 7001)]
+        node.save_peers()
+        node.close()
+
+        node = ChaincraftNode(store=SQLiteStore(self.path))
+        self.addCleanup(node.close)
+        self.assertEqual(node.inventory_log, [message_hash])
+        self.assertEqual(node.load_peers(), [["127.0.0.1", 7001]])
+        self.assertIn('"n": 1', node._load_db_value(message_hash))
+
+        node = ChaincraftNode(store=SQLiteStore(self.path), reset_db=True)
+        self.addCleanup(node.close)
+        self.assertEqual(len(node.db), 0)
+
+    def test_sustained_write_rate(self):
+        count = 5000
+        node = ChaincraftNode(store=SQLiteStore(self.path))
+        self.addCleanup(node.close)
+        start = time.perf_counter()
+        for i in range(count):
+            node.create_shared_message({"message_type": "bench", "n": i})
+        elapsed = time.perf_counter() - start
+        print(f"\nSQLiteStore group commit: {count / elapsed:.0f} messages/s")
+        self.assertEqual(len(node.db), count)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+# tests/test_sync_manager.py
+
+import time
+import unittest
+
+from chaincraft import ChaincraftNode
+from chaincraft.sync_manager import SyncManager
+from tests.test_shared_object_updates import SimpleChainObject
+
+PEERS = [("127.0.0.1", 7101), ("127.0.0.1", 7102), ("127.0.0.1", 7103)]
+
+
+def known_digests(*digests):
+    return lambda digest: digest in digests
+
+
+class TestSyncManager(unittest.TestCase):
+    def test_one_request_in_flight_with_retries(self):
+        manager = SyncManager(request_timeout=2.0, max_attempts=2)
+        has = known_digests("tip")
+        peer = manager.next_request("Chain", "tip", has, PEERS, now=0.0)
+        self.assertIn(peer, PEERS)
+        self.assertIsNone(manager.next_request("Chain", "tip", has, PEERS, now=1.0))
+        # Timed out: retried to the same peer, then the peer is given up on
+        self.assertEqual(
+            manager.next_request("Chain", "tip", has, PEERS, now=2.5), peer
+        )
+        other = manager.next_request("Chain", "tip", has, PEERS, now=5.0)
+        self.assertNotEqual(other, peer)
+        self.assertEqual(manager.stats()["retries"], 1)
+
+    def test_failed_peer_backs_off(self):
+        manager = SyncManager(request_timeout=1.0, max_attempts=1, failure_backoff=30.0)
+        has = known_digests("tip")
+        peer = PEERS[0]
+        self.assertEqual(
+            manager.next_request("Chain", "tip", has, [peer], now=0.0), peer
+        )
+        self.assertIsNone(manager.next_request("Chain", "tip", has, [peer], now=2.0))
+        self.assertIsNone(manager.next_request("Chain", "tip", has, [peer], now=20.0))
+        self.assertEqual(
+            manager.next_request("Chain", "tip", has, [peer], now=32.0), peer
+        )
+
+    def test_quiet_when_all_peers_report_known_tips(self):
+        manager = SyncManager(tip_ttl=10.0)
+        has = known_digests("old", "tip")
+        for peer in PEERS:
+            manager.on_status("Chain", peer, "tip", True, now=0.0)
+        manager.on_status("Chain", PEERS[0], "old", True, now=0.0)
+        self.assertIsNone(manager.next_request("Chain", "tip", has, PEERS, now=1.0))
+        # Reports expire, and only then is a single peer re-checked
+        self.assertIn(manager.next_request("Chain", "tip", has, PEERS, now=11.0), PEERS)
+
+    def test_sticks_to_peer_that_is_ahead(self):
+        manager = SyncManager()
+        has = known_digests("tip")
+        manager.on_status("Chain", PEERS[0], "tip", True, now=0.0)
+        manager.on_status("Chain", PEERS[1], "new", True, now=0.0)
+        manager.on_status("Chain", PEERS[2], "new", True, now=0.0)
+        peer = manager.next_request("Chain", "tip", has, PEERS, now=0.1)
+        self.assertIn(peer, PEERS[1:])
+        manager.on_status("Chain", peer, "newer", True, now=0.2)
+        self.assertEqual(
+            manager.next_request("Chain", "tip", has, PEERS, now=0.3), peer
+        )
+
+    def test_peer_on_other_branch_is_not_synced_from(self):
+        manager = SyncManager()
+        manager.on_status("Chain", PEERS[0], "fork", False, now=0.0)
+        self.assertIsNone(
+            manager.next_request("Chain", "tip", known_digests(), PEERS[:1], now=1.0)
+        )
+
+
+class TestNodeSync(unittest.TestCase):
+    def setUp(self):
+        self.nodes = []
+        for _ in range(3):
+            node = ChaincraftNode(
+                persistent=False, sync_manager=SyncManager(batch_size=16)
+            )
+            node.add_shared_object(SimpleChainObject())
+            self.nodes.append(node)
+        for node in self.nodes:
+            node.start()
+        for a in self.nodes:
+            for b in self.nodes:
+                if a is not b:
+                    a.connect_to_peer(b.host, b.port)
+
+    def tearDown(self):
+        for node in self.nodes:
+            node.close()
+
+    def test_catch_up_in_batches_then_quiet(self):
+        source = self.nodes[0]
+        chain = source.shared_objects[0]
+        for _ in range(50):
+            chain.add_next_hash()
+
+        deadline = time.time() + 20
+        while time.time() < deadline and not all(
+            len(node.shared_objects[0].chain) == 51 for node in self.nodes
+        ):
+            time.sleep(0.1)
+        for node in self.nodes:
+            self.assertEqual(node.shared_objects[0].chain, chain.chain)
+
+        # Once every peer has reported the shared tip, no more requests
+        time.sleep(3)
+        sent = [node.sync_manager.stats()["requests_sent"] for node in self.nodes]
+        time.sleep(3)
+        self.assertEqual(
+            [node.sync_manager.stats()["requests_sent"] for node in self.nodes], sent
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
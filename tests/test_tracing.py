@@ -0,0 +1,159 @@
+# tests/test_tracing.py
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from chaincraft import ChaincraftNode, SharedMessage, SharedObject
+from chaincraft.tracing import RECEIVE, Tracer
+
+PEER = ("127.0.0.1", 7001)
+
+
+class AcceptAll(SharedObject):
+    def __init__(self):
+        self.messages = []
+
+    def is_valid(self, message: SharedMessage) -> bool:
+        return True
+
+    def add_message(self, message: SharedMessage) -> None:
+        self.messages.append(message)
+
+    def is_merkelized(self) -> bool:
+        return False
+
+    def get_latest_digest(self) -> str:
+        return ""
+
+    def has_digest(self, hash_digest: str) -> bool:
+        return False
+
+    def is_valid_digest(self, hash_digest: str) -> bool:
+        return False
+
+    def add_digest(self, hash_digest: str) -> bool:
+        return False
+
+    def gossip_object(self, digest):
+        return []
+
+    def get_messages_since_digest(self, digest: str):
+        return []
+
+
+def hash_of(i):
+    return hashlib.sha256(str(i).encode()).hexdigest()
+
+
+class TestSampling(unittest.TestCase):
+    def test_rates(self):
+        hashes = [hash_of(i) for i in range(2000)]
+        self.assertTrue(all(Tracer(1.0).sampled(h) for h in hashes))
+        self.assertFalse(any(Tracer(0.0).sampled(h) for h in hashes))
+        sampled = [h for h in hashes if Tracer(0.25).sampled(h)]
+        self.assertAlmostEqual(len(sampled) / len(hashes), 0.25, delta=0.05)
+        # The decision depends only on the hash
+        self.assertEqual(sampled, [h for h in hashes if Tracer(0.25).sampled(h)])
+
+    def test_invalid_rate(self):
+        with self.assertRaises(ValueError):
+            Tracer(1.5)
+
+
+class TestNodeTracing(unittest.TestCase):
+    def setUp(self):
+        self.hooked = []
+        self.tracer = Tracer(hooks=[self.hooked.append])
+        self.node = ChaincraftNode(
+            persistent=False, tracer=self.tracer, shared_objects=[AcceptAll()]
+        )
+
+    def receive(self, data):
+        message = SharedMessage(data=data).to_json()
+        self.node._process_datagram(self.node.compress_message(message), PEER)
+        return hashlib.sha256(message.encode()).hexdigest()
+
+    def test_stages_of_a_message(self):
+        message_hash = self.receive({"message_type": "chat", "text": "hi"})
+        spans = list(self.tracer.spans)
+        self.assertEqual(
+            [span.name for span in spans],
+            [
+                "dedup",
+                "decompress",
+                "accept",
+                "validate:AcceptAll",
+                "add_message:AcceptAll",
+                "store_and_broadcast",
+                "receive",
+            ],
+        )
+        for span in spans:
+            self.assertEqual(span.message_hash, message_hash)
+            self.assertEqual(span.message_type, "chat")
+            self.assertEqual(span.peer, PEER)
+        # Every stage lies within the receive span
+        receive = spans[-1]
+        for span in spans[:-1]:
+            self.assertGreaterEqual(span.start, receive.start)
+            self.assertLessEqual(
+                span.start + span.duration, receive.start + receive.duration
+            )
+        self.assertEqual(len(self.hooked), len(spans))
+
+    def test_duplicate_only_traces_dedup(self):
+        self.receive("once")
+        self.tracer.clear()
+        self.receive("once")
+        self.assertEqual([span.name for span in self.tracer.spans], ["dedup"])
+
+    def test_unsampled_messages_record_nothing(self):
+        self.node.tracer = Tracer(sample_rate=0.0)
+        self.receive("not traced")
+        self.assertEqual(len(self.node.tracer.spans), 0)
+        self.assertEqual(len(self.node.db), 1)
+
+    def test_export_chrome_trace(self):
+        for i in range(3):
+            self.receive({"message_type": "chat", "n": i})
+        summary = self.tracer.summary()
+        self.assertEqual(summary[RECEIVE]["count"], 3)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "trace.json")
+            self.assertEqual(self.tracer.export(path), len(self.tracer.spans))
+            with open(path) as f:
+                trace = json.load(f)
+        event = trace["traceEvents"][0]
+        self.assertEqual(event["ph"], "X")
+        self.assertEqual(event["args"]["peer"], "127.0.0.1:7001")
+        self.assertEqual(event["args"]["message_type"], "chat")
+        self.assertGreater(event["dur"], 0)
+
+
+class TestIndexSpan(unittest.TestCase):
+    def test_index_stage(self):
+        tracer = Tracer()
+        node = ChaincraftNode(
+            reset_db=True, persistent=True, indexed=True, tracer=tracer
+        )
+        try:
+            node.set_indexed_fields("User", ["username"])
+            message = SharedMessage(
+                data={"message_type": "User", "username": str(time.time())}
+            )
+            node._process_datagram(node.compress_message(message.to_json()), PEER)
+            self.assertIn("index", [span.name for span in tracer.spans])
+        finally:
+            node.close()
+            for suffix in ("_index.db", ".db", ".db.dat", ".db.dir", ".db.bak"):
+                if os.path.exists(f"node_{node.port}{suffix}"):
+                    os.remove(f"node_{node.port}{suffix}")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+# tests/test_transport.py
+
+import os
+import socket
+import time
+import unittest
+
+from chaincraft import ChaincraftNode
+from chaincraft.transport import TCPTransport, UDPTransport
+
+from tests.test_shared_object_updates import SimpleChainObject
+
+
+class TestTCPTransport(unittest.TestCase):
+    def setUp(self):
+        self.transports = []
+        for port in (0, 0):
+            transport = TCPTransport()
+            # Bind to an ephemeral port, then record it as our node address
+            transport.bind("127.0.0.1", port)
+            transport.local_addr = transport.listener.getsockname()
+            self.transports.append(transport)
+
+    def tearDown(self):
+        for transport in self.transports:
+            transport.close()
+
+    def test_frames_are_attributed_to_node_address(self):
+        a, b = self.transports
+        a.sendto(b"first", b.local_addr)
+        a.sendto(b"second", b.local_addr)
+
+        self.assertEqual(b.recvfrom(65535), (b"first", a.local_addr))
+        self.assertEqual(b.recvfrom(65535), (b"second", a.local_addr))
+        self.assertEqual(len(a.connections), 1)
+
+    def test_hello_must_match_the_source_address(self):
+        _, b = self.transports
+        conn = socket.create_connection(b.local_addr)
+        self.addCleanup(conn.close)
+        for frame in (b"10.0.0.1:7001", b"spoofed"):
+            conn.sendall(TCPTransport.FRAME_HEADER.pack(len(frame)) + frame)
+        conn.settimeout(5)
+        # The connection is closed (or reset) without the frame being delivered
+        try:
+            self.assertEqual(conn.recv(1), b"")
+        except ConnectionResetError:
+            pass
+        self.assertTrue(b.inbound.empty())
+
+    def test_large_frame(self):
+        a, b = self.transports
+        payload = os.urandom(2 * 1024 * 1024)
+        a.sendto(payload, b.local_addr)
+        self.assertEqual(b.recvfrom(65535)[0], payload)
+
+    def test_reconnects_after_peer_restart(self):
+        a, b = self.transports
+        a.sendto(b"before", b.local_addr)
+        self.assertEqual(b.recvfrom(65535)[0], b"before")
+
+        addr = b.local_addr
+        b.close()
+        restarted = TCPTransport()
+        restarted.bind(*addr)
+        self.transports[1] = restarted
+
+        # The first write on a dead connection may still succeed locally
+        deadline = time.time() + 5
+        while restarted.inbound.empty() and time.time() < deadline:
+            try:
+                a.sendto(b"after", addr)
+            except OSError:
+                pass
+            time.sleep(0.05)
+        self.assertEqual(restarted.recvfrom(65535)[0], b"after")
+
+    def test_closed_transport_unblocks_recvfrom(self):
+        a, _ = self.transports
+        a.close()
+        with self.assertRaises(OSError):
+            a.recvfrom(65535)
+
+
+class TestNodeSyncTransport(unittest.TestCase):
+    def setUp(self):
+        self.nodes = []
+        for _ in range(2):
+            node = ChaincraftNode(persistent=False, sync_transport=TCPTransport())
+            node.add_shared_object(SimpleChainObject())
+            node.start()
+            self.nodes.append(node)
+        self.nodes[0].connect_to_peer(self.nodes[1].host, self.nodes[1].port)
+        self.nodes[1].connect_to_peer(self.nodes[0].host, self.nodes[0].port)
+
+    def tearDown(self):
+        for node in self.nodes:
+            node.close()
+
+    def test_default_transport_is_udp(self):
+        node = ChaincraftNode(persistent=False)
+        self.assertIsInstance(node.transport, UDPTransport)
+        self.assertIsNone(node.sync_transport)
+
+    def test_catch_up_uses_sync_transport(self):
+        ahead, behind = self.nodes
+        chain = ahead.shared_objects[0]
+        # Extend the chain locally only, so the other node must catch up via sync
+        for _ in range(20):
+            chain.add_next_hash()
+
+        deadline = time.time() + 20
+        while time.time() < deadline:
+            if behind.shared_objects[0].chain == chain.chain:
+                break
+            time.sleep(0.1)
+
+        self.assertEqual(behind.shared_objects[0].chain, chain.chain)
+        self.assertIn((behind.host, behind.port), ahead.sync_transport.connections)
+
+
+if __name__ == "__main__":
+    unittest.main()
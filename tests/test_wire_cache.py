@@ -0,0 +1,93 @@
+# tests/test_wire_cache.py
+
+import time
+import unittest
+from unittest import mock
+
+from chaincraft import ChaincraftNode
+from chaincraft import node as node_module
+from chaincraft.wire_cache import CANONICAL, WireCache
+
+PEERS = [("127.0.0.1", 7001), ("127.0.0.1", 7002)]
+
+
+def gossiping_node(count=20):
+    node = ChaincraftNode(persistent=False, use_compression=True)
+    node.peers = list(PEERS)
+    sent = []
+    node._send_datagram = lambda data, addr: sent.append((data, addr))
+    hashes = []
+    for i in range(count):
+        message = {"message_type": "Note", "text": "x" * 200, "n": i}
+        hashes.append(node.create_shared_message(message)[0])
+    return node, hashes, sent
+
+
+class TestWireCache(unittest.TestCase):
+    def test_lru_bounded_by_bytes(self):
+        cache = WireCache(max_bytes=25)
+        cache.put("a", b"x" * 10)
+        cache.put("a", b"y" * 5, "zlib")
+        cache.put("b", b"x" * 10)
+        self.assertEqual(cache.get("a", "zlib"), b"y" * 5)
+        cache.put("c", b"x" * 10)
+        # "b" was least recently used; "a" goes with all its encodings
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.size, 25)
+        cache.discard(["a", "missing"])
+        self.assertEqual((len(cache), cache.size), (1, 10))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+
+class TestNodeWireCache(unittest.TestCase):
+    def test_gossip_rounds_do_not_hash_compress_or_read_the_store(self):
+        node, hashes, sent = gossiping_node()
+        first_round = list(sent)
+        sent.clear()
+        node.hash_message = mock.Mock(side_effect=AssertionError("hashed"))
+        node._load_db_value = mock.Mock(side_effect=AssertionError("loaded"))
+        with mock.patch.object(
+            node_module, "encode_deflated_frame", side_effect=AssertionError("zlib")
+        ):
+            node._gossip_full()
+            node._handle_message_request(hashes[:3], PEERS[0])
+        # Same datagrams as when the messages were first relayed
+        self.assertEqual(sent[: len(first_round)], first_round)
+        self.assertEqual(len(sent), len(first_round) + 3)
+        self.assertEqual(node.wire_cache.get(hashes[0]), node.db.raw(hashes[0]))
+
+    def test_misses_fall_back_to_the_store(self):
+        node, hashes, sent = gossiping_node(3)
+        node.wire_cache = WireCache()
+        sent.clear()
+        node._handle_message_request([hashes[0], "unknown"], PEERS[0])
+        self.assertEqual(len(sent), 1)
+        self.assertIsNotNone(node.wire_cache.get(hashes[0], "zlib"))
+        node.remove_messages([hashes[0]])
+        self.assertIsNone(node.wire_cache.get(hashes[0], CANONICAL))
+
+    def test_steady_state_gossip_round(self):
+        node, hashes, sent = gossiping_node(1000)
+        cached = uncached = float("inf")
+        hits, misses = node.wire_cache.hits, node.wire_cache.misses
+        for _ in range(5):
+            start = time.perf_counter()
+            node._gossip_full()
+            cached = min(cached, time.perf_counter() - start)
+        hits = node.wire_cache.hits - hits
+        misses = node.wire_cache.misses - misses
+        for _ in range(5):
+            node.wire_cache = WireCache()
+            start = time.perf_counter()
+            node._gossip_full()
+            uncached = min(uncached, time.perf_counter() - start)
+        print(
+            f"\nGossip round of {len(hashes)} messages to {len(PEERS)} peers: "
+            f"{cached * 1000:.1f} ms cached, {uncached * 1000:.1f} ms re-encoding"
+        )
+        # Every message and encoding came from the cache
+        self.assertEqual((hits, misses), (5 * len(hashes) * (1 + len(PEERS)), 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+# tests/test_zero_copy.py
+
+import json
+import socket
+import sys
+import time
+import tracemalloc
+import unittest
+from unittest import mock
+
+from chaincraft import ChaincraftNode
+from chaincraft.buffer_ring import BufferRing
+from chaincraft.codec import BinaryCodec, encode_binary_frame
+from chaincraft.gossip import wrap_ttl
+
+PEER = ("127.0.0.1", 7001)
+
+
+class TestBufferRing(unittest.TestCase):
+    def test_slots_rotate(self):
+        ring = BufferRing(slots=3, slot_size=16)
+        views = [ring.next() for _ in range(4)]
+        self.assertEqual(len(ring), 3)
+        self.assertIs(views[0], views[3])
+        self.assertIsNot(views[0], views[1])
+        views[1][:2] = b"ok"
+        self.assertEqual(bytes(ring.buffers[1][:2]), b"ok")
+
+
+class TestReceiveView(unittest.TestCase):
+    def setUp(self):
+        # Unstarted, so only the datagrams fed in below are processed
+        self.node = ChaincraftNode(persistent=False)
+        self.node.accepted_message_types = [str]
+
+    def test_new_message_is_processed(self):
+        data = self.node.compress_message(json.dumps("new"))
+        self.node._receive_view(memoryview(bytearray(data)), PEER)
+        self.assertIn(self.node.hash_message(data), self.node.db)
+        self.assertEqual(self.node.early_duplicates, 0)
+
+    def test_duplicates_dropped_before_copy(self):
+        message_hash, shared_message = self.node.create_shared_message("seen")
+        data = self.node.compress_message(shared_message.to_json())
+        frame = encode_binary_frame(
+            message_hash, BinaryCodec().encode(json.loads(shared_message.to_json()))
+        )
+        self.assertEqual(self.node.hash_message(data), message_hash)
+
+        with mock.patch.object(self.node, "_process_datagram") as process:
+            for datagram in (data, wrap_ttl(data, 3), frame):
+                self.node._receive_view(memoryview(bytearray(datagram)), PEER)
+        process.assert_not_called()
+        self.assertEqual(self.node.early_duplicates, 3)
+        self.assertEqual(self.node.datagrams_received, 3)
+
+    def test_unpeekable_frames_are_passed_on(self):
+        with mock.patch.object(self.node, "_process_datagram") as process:
+            self.node._receive_view(memoryview(bytearray(b"\xccZpayload")), PEER)
+        process.assert_called_once_with(b"\xccZpayload", PEER, None)
+
+
+class TestZeroCopyBenchmark(unittest.TestCase):
+    NUM_DATAGRAMS = 4000
+    BATCH = 100
+
+    def setUp(self):
+        self.node = ChaincraftNode(persistent=False)
+        self.node.accepted_message_types = [str]
+        _, shared_message = self.node.create_shared_message("x" * 1000)
+        self.datagram = self.node.compress_message(shared_message.to_json())
+
+        self.receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.receiver.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+        self.receiver.bind(("127.0.0.1", 0))
+        self.sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.addr = self.receiver.getsockname()
+
+    def tearDown(self):
+        self.receiver.close()
+        self.sender.close()
+
+    def run_path(self, receive_one, measure_allocations=False):
+        """
+        Push duplicate datagrams over loopback in batches and receive each
+        with receive_one. Returns datagrams per second, or with
+        measure_allocations the peak bytes of transient allocations while
+        receiving a batch.
+        """
+        peak: int = 0
+        elapsed: float = 0.0
+        for _ in range(self.NUM_DATAGRAMS // self.BATCH):
+            for _ in range(self.BATCH):
+                self.sender.sendto(self.datagram, self.addr)
+            if measure_allocations:
+                tracemalloc.reset_peak()
+                base: int = tracemalloc.get_traced_memory()[0]
+            start: float = time.perf_counter()
+            for _ in range(self.BATCH):
+                receive_one()
+            elapsed += time.perf_counter() - start
+            if measure_allocations:
+                peak = max(peak, tracemalloc.get_traced_memory()[1] - base)
+        return peak if measure_allocations else self.NUM_DATAGRAMS / elapsed
+
+    def test_benchmark_duplicate_receive(self):
+        node = self.node
+        buffer_size = node.RECV_BUFFER_SIZE
+
+        def copying():
+            data, addr = self.receiver.recvfrom(buffer_size)
+            node._process_datagram(data, addr)
+
+        ring = BufferRing(node.RECV_RING_SLOTS, buffer_size)
+
+        def zero_copy():
+            view = ring.next()
+            nbytes, addr = self.receiver.recvfrom_into(view)
+            node._receive_view(view[:nbytes], addr)
+
+        # Warm up both paths outside the measurement
+        for receive_one in (copying, zero_copy):
+            self.sender.sendto(self.datagram, self.addr)
+            receive_one()
+
+        paths = (("recvfrom", copying), ("recvfrom_into", zero_copy))
+        rates = {name: self.run_path(receive_one) for name, receive_one in paths}
+        print()
+        for name, rate in rates.items():
+            print(f"{name:>13}: {rate:,.0f} datagrams/s")
+        self.assertEqual(node.early_duplicates, self.NUM_DATAGRAMS + 1)
+
+        if sys.version_info < (3, 9):
+            return  # tracemalloc.reset_peak is needed for the per-batch peak
+        peaks = {}
+        for name, receive_one in paths:
+            tracemalloc.start()
+            try:
+                peaks[name] = self.run_path(receive_one, measure_allocations=True)
+            finally:
+                tracemalloc.stop()
+            print(f"{name:>13}: {peaks[name]:,} B peak transient allocation")
+        # The copying path allocates a full-size buffer per datagram
+        self.assertLess(peaks["recvfrom_into"], peaks["recvfrom"])
+
+
+if __name__ == "__main__":
+    unittest.main()